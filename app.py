@@ -1,21 +1,37 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, APIRouter, Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, APIRouter
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, ValidationError
 from typing import Optional, Dict, Any, List
 import os
-from scraper import CraigslistScraper
+from scraper import RESULT_COLUMNS
+from search_index import get_result_index
+from stats import get_result_stats
+from logs import setup_logging, get_logger, LogSampler
+from run_history import get_run_ledger
+from jobs import get_job_store, ACTIVE_STATES
+from job_worker import ensure_workers
+from query_planner import category_urls
 from config import CRAIGSLIST_CITIES, CRAIGSLIST_BASE_URL, KEYWORDS, REMOTE_KEYWORDS, NON_REMOTE_KEYWORDS
+import io
+import csv
 import json
+import sqlite3
 import pandas as pd
 from dotenv import load_dotenv
 import base64
 import asyncio
+import signal
 from datetime import datetime
 
 # Load environment variables
 load_dotenv()
 
+setup_logging()
+logger = get_logger("api")
+# Polled endpoints only log one call in LOG_SAMPLE_EVERY
+poll_sampler = LogSampler()
+
 # Create FastAPI app and router
 app = FastAPI(title="Craigslist Scraper API", 
              description="API for scraping and managing Craigslist job listings",
@@ -33,8 +49,11 @@ app.add_middleware(
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
-# Global variables
-scraper = None
+# Job worker processes started by this API process
+worker_processes = []
+
+# Status fields reported before a job has written its own; jobs and their
+# progress live in the shared job store and run in worker processes
 scraping_status = {
     "is_running": False,
     "progress": 0,
@@ -49,40 +68,75 @@ scraping_status = {
 current_config = {
     "cities": CRAIGSLIST_CITIES,
     "base_url": CRAIGSLIST_BASE_URL,
+    "categories": category_urls(),
     "keywords": KEYWORDS,
     "remote_keywords": REMOTE_KEYWORDS,
     "non_remote_keywords": NON_REMOTE_KEYWORDS,
     "use_headless": os.getenv('USE_HEADLESS', 'false').lower() == 'true',
+    "browser_pool": os.getenv('BROWSER_POOL', 'true').lower() == 'true',
     "batch_size": int(os.getenv('BATCH_SIZE', 10)),
     "max_retries": int(os.getenv('MAX_RETRIES', 3)),
+    "max_pages_per_city": int(os.getenv('MAX_PAGES_PER_CITY', 5)),
+    "max_age_hours": float(os.getenv('MAX_AGE_HOURS', 0)),
+    "pipelined": os.getenv('PIPELINED', 'false').lower() == 'true',
+    "discovery_backend": os.getenv('DISCOVERY_BACKEND', 'browser').lower(),
+    "discovery_plan": os.getenv('DISCOVERY_PLAN', 'auto').lower(),
+    "detail_backend": os.getenv('DETAIL_BACKEND', 'browser').lower(),
+    "scrape_emails": os.getenv('SCRAPE_EMAILS', 'true').lower() == 'true',
+    "stream_details": os.getenv('STREAM_DETAILS', 'false').lower() == 'true',
+    "archive_pages": os.getenv('ARCHIVE_PAGES', 'false').lower() == 'true',
+    "replay_archive": os.getenv('REPLAY_ARCHIVE', 'false').lower() == 'true',
     "min_delay": float(os.getenv('MIN_DELAY', 2)),
     "max_delay": float(os.getenv('MAX_DELAY', 5)),
+    "min_request_interval": float(os.getenv('MIN_REQUEST_INTERVAL', 3)),
     "min_delay_between_cities": float(os.getenv('MIN_DELAY_BETWEEN_CITIES', 5)),
     "max_delay_between_cities": float(os.getenv('MAX_DELAY_BETWEEN_CITIES', 10)),
     "min_delay_between_batches": float(os.getenv('MIN_DELAY_BETWEEN_BATCHES', 15)),
-    "max_delay_between_batches": float(os.getenv('MAX_DELAY_BETWEEN_BATCHES', 30))
+    "max_delay_between_batches": float(os.getenv('MAX_DELAY_BETWEEN_BATCHES', 30)),
+    "job_max_seconds": float(os.getenv('JOB_MAX_SECONDS', 0)),
+    "job_max_pages": int(os.getenv('JOB_MAX_PAGES', 0)),
+    "job_max_retries": int(os.getenv('JOB_MAX_RETRIES', 0)),
+    "job_max_rss_mb": float(os.getenv('JOB_MAX_RSS_MB', 0))
 }
 
 class ConfigUpdate(BaseModel):
     cities: Optional[List[str]] = None
     base_url: Optional[str] = None
+    categories: Optional[List[str]] = None
     keywords: Optional[List[str]] = None
     remote_keywords: Optional[List[str]] = None
     non_remote_keywords: Optional[List[str]] = None
     use_headless: Optional[bool] = None
+    browser_pool: Optional[bool] = None
     batch_size: Optional[int] = None
     max_retries: Optional[int] = None
+    max_pages_per_city: Optional[int] = None
+    max_age_hours: Optional[float] = None
+    pipelined: Optional[bool] = None
+    discovery_backend: Optional[str] = None
+    discovery_plan: Optional[str] = None
+    detail_backend: Optional[str] = None
+    scrape_emails: Optional[bool] = None
+    stream_details: Optional[bool] = None
+    archive_pages: Optional[bool] = None
+    replay_archive: Optional[bool] = None
     min_delay: Optional[float] = None
     max_delay: Optional[float] = None
+    min_request_interval: Optional[float] = None
     min_delay_between_cities: Optional[float] = None
     max_delay_between_cities: Optional[float] = None
     min_delay_between_batches: Optional[float] = None
     max_delay_between_batches: Optional[float] = None
+    job_max_seconds: Optional[float] = None
+    job_max_pages: Optional[int] = None
+    job_max_retries: Optional[int] = None
+    job_max_rss_mb: Optional[float] = None
 
 def update_config_file(config: Dict[str, Any]):
     """Update the config.py file with new configuration values."""
     config_content = f"""CRAIGSLIST_CITIES = {json.dumps(config['cities'], indent=4)}
 CRAIGSLIST_BASE_URL = "{config['base_url']}"
+CRAIGSLIST_CATEGORIES = {json.dumps(config['categories'], indent=4)}
 KEYWORDS = {json.dumps(config['keywords'], indent=4)}
 REMOTE_KEYWORDS = {json.dumps(config['remote_keywords'], indent=4)}
 NON_REMOTE_KEYWORDS = {json.dumps(config['non_remote_keywords'], indent=4)}
@@ -90,19 +144,58 @@ NON_REMOTE_KEYWORDS = {json.dumps(config['non_remote_keywords'], indent=4)}
     with open('config.py', 'w') as f:
         f.write(config_content)
 
-def reset_status():
-    """Reset the scraping status to default values."""
-    global scraping_status
-    scraping_status = {
-        "is_running": False,
-        "progress": 0,
-        "total_listings": 0,
-        "processed_listings": 0,
-        "current_phase": "Not Started",
-        "last_completed": None,
-        "no_results": False,
-        "error": None
-    }
+def shared_config():
+    """Return the configuration, including updates made through any API process."""
+    current_config.update(get_job_store().get_settings())
+    return current_config
+
+def apply_config_update(update_dict):
+    """Apply validated config changes: share them, rewrite config.py and reload the config module."""
+    global CRAIGSLIST_CITIES, CRAIGSLIST_BASE_URL, KEYWORDS, REMOTE_KEYWORDS, NON_REMOTE_KEYWORDS
+    
+    # Start from the settings other API processes may have changed
+    shared_config()
+    
+    # A single-category setup follows its base URL, as before categories existed
+    if ('base_url' in update_dict and 'categories' not in update_dict
+            and current_config["categories"] == [current_config["base_url"]]):
+        update_dict['categories'] = [update_dict['base_url']]
+    
+    # Update the current config, and share it with the other API processes
+    current_config.update(update_dict)
+    get_job_store().save_settings(current_config)
+    
+    # Update the config file
+    update_config_file(current_config)
+    
+    # Reload the config module to get updated values
+    import importlib
+    import config
+    importlib.reload(config)
+    
+    # Update the global variables with new values
+    CRAIGSLIST_CITIES = config.CRAIGSLIST_CITIES
+    CRAIGSLIST_BASE_URL = config.CRAIGSLIST_BASE_URL
+    KEYWORDS = config.KEYWORDS
+    REMOTE_KEYWORDS = config.REMOTE_KEYWORDS
+    NON_REMOTE_KEYWORDS = config.NON_REMOTE_KEYWORDS
+
+def start_worker_processes():
+    """Start any missing job workers, first forgetting workers of this process that have exited."""
+    # poll() also reaps exited workers, so they don't linger as zombies
+    worker_processes[:] = [process for process in worker_processes if process.poll() is None]
+    worker_processes.extend(ensure_workers())
+
+def job_status(job):
+    """Return the scraping status of a job as the API reports it."""
+    status = dict(scraping_status)
+    if job is None:
+        status["current_phase"] = "Not Started"
+        return status
+    status.update(job["status"])
+    status["job_id"] = job["job_id"]
+    status["is_running"] = job["state"] in ACTIVE_STATES
+    return status
 
 @router.get("/")
 async def root():
@@ -114,145 +207,64 @@ async def root():
         "endpoints": {
             "GET /api": "This information",
             "POST /api/start-scraping": "Start the scraping process",
+            "POST /api/stop-scraping": "Stop the running job cleanly, keeping partial results",
             "GET /api/scraping-status": "Get current scraping status",
             "GET /api/download-results": "Download scraped results as CSV",
+            "GET /api/search": "Search scraped results by text, city, remote status and post date",
+            "GET /api/results/changes": "Stream results added or changed since a cursor, as NDJSON or CSV",
+            "GET /api/stats": "Get aggregate statistics over scraped results",
+            "GET /api/runs": "List recent runs with their performance reports",
+            "GET /api/runs/{run_id}/compare": "Compare a run against the rolling baseline and flag regressions",
             "POST /api/update-config": "Update scraper configuration",
             "GET /api/current-config": "Get current configuration",
             "POST /api/cleanup": "Clean up resources and stop scraping"
         }
     }
-    print("\n=== Root Endpoint Response ===")
-    print(json.dumps(response, indent=2))
+    logger.debug("Root endpoint served")
     return response
 
 @router.post("/start-scraping")
-async def start_scraping(background_tasks: BackgroundTasks):
-    """Start the scraping process in the background."""
-    global scraper, scraping_status
+async def start_scraping():
+    """Queue a scraping job for a worker process to run."""
+    store = get_job_store()
     
-    if scraping_status["is_running"]:
-        print("\n=== Start Scraping Error ===")
-        print("Scraping is already running")
-        raise HTTPException(status_code=400, detail="Scraping is already running")
+    # Jobs whose worker died would otherwise block new ones forever
+    await asyncio.to_thread(store.reap)
     
     try:
-        # Reset status if not in no_results state
-        if not scraping_status["no_results"]:
-            reset_status()
-        
-        scraper = CraigslistScraper()
-        scraping_status["is_running"] = True
-        scraping_status["progress"] = 0
-        scraping_status["current_phase"] = None
-        scraping_status["last_completed"] = None
-        
-        background_tasks.add_task(run_scraper)
+        settings = await asyncio.to_thread(shared_config)
+        job_id = await asyncio.to_thread(store.create, dict(settings), {
+            "is_running": True,
+            "progress": 0,
+            "total_listings": 0,
+            "processed_listings": 0,
+            "current_phase": "Queued",
+            "last_completed": None,
+            "no_results": False,
+            "error": None
+        })
+        if job_id is None:
+            logger.warning("Start scraping rejected: scraping is already running")
+            raise HTTPException(status_code=400, detail="Scraping is already running")
+        await asyncio.to_thread(start_worker_processes)
         response = {
             "message": "Scraping started successfully",
-            "status": "running"
+            "status": "running",
+            "job_id": job_id
         }
-        print("\n=== Start Scraping Response ===")
-        print(json.dumps(response, indent=2))
+        logger.info("Scraping started", extra={"fields": {"job_id": job_id}})
         return JSONResponse(content=response)
+    except HTTPException:
+        raise
     except Exception as e:
-        print("\n=== Start Scraping Error ===")
-        print(f"Error: {str(e)}")
-        scraping_status["is_running"] = False
-        scraping_status["progress"] = 0
-        scraping_status["current_phase"] = None
-        scraping_status["last_completed"] = None
-        scraper = None
+        logger.exception("Failed to start scraping")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def run_scraper():
-    """Run the scraper process."""
-    global scraper, scraping_status
-    
-    try:
-        # Phase 1: Scrape listings
-        scraping_status.update({
-            "is_running": True,
-            "progress": 0,
-            "current_phase": "Phase 1: Scraping listings",
-            "last_completed": "Starting Phase 1",
-            "completed": False,
-            "error": False,
-            "no_results": False
-        })
-        
-        df = scraper.scrape_listings()
-        
-        if df.empty:
-            scraping_status.update({
-                "is_running": False,
-                "progress": 0,
-                "current_phase": "Completed",
-                "last_completed": "No listings found",
-                "completed": True,
-                "error": False,
-                "no_results": True
-            })
-            return
-            
-        # Phase 2 - Step 1: Clean listings
-        scraping_status.update({
-            "is_running": True,
-            "progress": 30,
-            "current_phase": "Phase 2: Cleaning listings",
-            "last_completed": f"Found {len(df)} listings",
-            "completed": False,
-            "error": False,
-            "no_results": False
-        })
-        
-        df = scraper.clean_listings(df)
-        
-        # Phase 2 - Step 2: Scrape details
-        scraping_status.update({
-            "is_running": True,
-            "progress": 50,
-            "current_phase": "Phase 2: Scraping details",
-            "last_completed": f"Processing {len(df)} listings",
-            "completed": False,
-            "error": False,
-            "no_results": False
-        })
-        
-        results_df = scraper.scrape_details(df)
-        
-        # Update final status
-        scraping_status.update({
-            "is_running": False,
-            "progress": 100,
-            "current_phase": "Completed",
-            "last_completed": "Scraping Complete",
-            "completed": True,
-            "error": False,
-            "no_results": False
-        })
-        
-    except Exception as e:
-        scraping_status.update({
-            "is_running": False,
-            "progress": 0,
-            "current_phase": "Error",
-            "last_completed": "Error during scraping",
-            "completed": False,
-            "error": True,
-            "no_results": False
-        })
-        scraping_status["error"] = str(e)
-        raise
-    finally:
-        if scraper:
-            scraper.close()
-            scraper = None
-
 @router.get("/scraping-status")
 async def get_scraping_status():
     """Get the current status of the scraping process."""
-    # Create a copy of the status to avoid race conditions
-    status = scraping_status.copy()
+    # Progress, host, budget and retry numbers are written by the worker running the job
+    status = job_status(await asyncio.to_thread(get_job_store().latest))
     
     # Update the completed flag based on current state
     status["completed"] = (
@@ -273,10 +285,41 @@ async def get_scraping_status():
         status["last_completed"] == "No listings found"
     )
     
-    print("\n=== Scraping Status Response ===")
-    print(json.dumps(status, indent=2))
+    if poll_sampler.should_log("scraping-status"):
+        logger.debug("Scraping status polled", extra={"fields": {
+            "job_id": status.get("job_id"),
+            "phase": status["current_phase"],
+            "progress": status["progress"]
+        }})
     return status
 
+async def stop_running_job(reason, timeout):
+    """Ask the worker to stop the active job and wait for it to flush its results and release the browser."""
+    store = get_job_store()
+    job = await asyncio.to_thread(store.active)
+    if job is None:
+        return True
+    await asyncio.to_thread(store.request_cancel, job["job_id"], reason)
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        await asyncio.to_thread(store.reap)
+        job = await asyncio.to_thread(store.get, job["job_id"])
+        if job is None or job["state"] not in ACTIVE_STATES:
+            return True
+        await asyncio.sleep(0.5)
+    return False
+
+@router.post("/stop-scraping")
+async def stop_scraping():
+    """Stop the running job at its next checkpoint, keeping the results written so far."""
+    store = get_job_store()
+    job = await asyncio.to_thread(store.active)
+    if job is None:
+        raise HTTPException(status_code=400, detail="Scraping is not running")
+    await asyncio.to_thread(store.request_cancel, job["job_id"], "stopped by user")
+    logger.info("Stop requested", extra={"fields": {"job_id": job["job_id"]}})
+    return {"message": "Stop requested", "status": "stopping"}
+
 @router.get("/download-results")
 async def download_results():
     """Download scraped results as CSV."""
@@ -284,8 +327,7 @@ async def download_results():
         output_file = os.getenv('OUTPUT_FILE', 'output/results.csv')
         
         if not os.path.exists(output_file):
-            print("\n=== Download Results Error ===")
-            print("No results found. Please run the scraper first.")
+            logger.info("Download requested but no results file exists")
             raise HTTPException(
                 status_code=404,
                 detail="No results found. Please run the scraper first."
@@ -306,36 +348,136 @@ async def download_results():
             "size": len(file_content)
         }
         
-        # Log only the size and filename for debugging
-        print("\n=== Download Results Response ===")
-        print(f"Filename: {response['filename']}")
-        print(f"Size: {response['size']} bytes")
-        print(f"Base64 length: {len(response['content'])} characters")
-        
+        logger.info("Results downloaded", extra={"fields": {"size": response['size']}})
         return response
         
     except Exception as e:
-        print("\n=== Download Results Error ===")
-        print(f"Error: {str(e)}")
+        logger.exception("Error downloading results")
         raise HTTPException(
             status_code=500,
             detail=f"Error downloading results: {str(e)}"
         )
 
+@router.get("/search")
+async def search_results(q: Optional[str] = None, city: Optional[str] = None, remote: Optional[str] = None,
+                         posted_after: Optional[str] = None, posted_before: Optional[str] = None,
+                         limit: int = 50, cursor: Optional[str] = None):
+    """Search scraped results. Pass the returned next_cursor to get the next page."""
+    try:
+        return await asyncio.to_thread(
+            get_result_index().search,
+            query=q,
+            city=city,
+            remote=remote,
+            posted_after=posted_after,
+            posted_before=posted_before,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor or limit")
+    except sqlite3.OperationalError as e:
+        # FTS5 rejects some queries it can't parse
+        if q and "fts5" in str(e):
+            raise HTTPException(status_code=400, detail=f"Invalid search query: {str(e)}")
+        logger.exception("Error searching results")
+        raise HTTPException(status_code=500, detail=f"Error searching results: {str(e)}")
+    except Exception as e:
+        logger.exception("Error searching results")
+        raise HTTPException(status_code=500, detail=f"Error searching results: {str(e)}")
+
+def _stream_changes(records, fmt):
+    """Encode (seq, record) pairs as NDJSON lines or CSV rows, in chunks of about 64 KB."""
+    buffer = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=["Seq"] + RESULT_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+    for seq, record in records:
+        if writer:
+            writer.writerow({"Seq": seq, **record})
+        else:
+            buffer.write(json.dumps({"Seq": seq, **record}, default=str) + "\n")
+        if buffer.tell() >= 65536:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+@router.get("/results/changes")
+async def result_changes(since: str = "0", format: str = "ndjson", limit: Optional[int] = None):
+    """
+    Stream only the results added or changed since a cursor, as NDJSON or CSV.
+    
+    Start with since=0 for a full sync, then pass the X-Cursor header of each
+    response as the next since. X-Has-More is true when limit cut the changes short.
+    """
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    try:
+        since = int(since)
+        if since < 0 or (limit is not None and limit < 1):
+            raise ValueError(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor or limit")
+    
+    try:
+        changes = await asyncio.to_thread(get_result_index().changes, since=since, limit=limit)
+    except Exception as e:
+        logger.exception("Error reading result changes")
+        raise HTTPException(status_code=500, detail=f"Error reading result changes: {str(e)}")
+    
+    logger.info("Result changes requested", extra={"fields": {"since": since, "cursor": changes["cursor"]}})
+    return StreamingResponse(
+        _stream_changes(changes["records"], format),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={
+            "X-Cursor": str(changes["cursor"]),
+            "X-Has-More": "true" if changes["has_more"] else "false"
+        }
+    )
+
+@router.get("/stats")
+async def get_stats():
+    """Get aggregate counts, email availability rates and phase throughput."""
+    try:
+        return await asyncio.to_thread(get_result_stats().snapshot)
+    except Exception as e:
+        logger.exception("Error reading statistics")
+        raise HTTPException(status_code=500, detail=f"Error reading statistics: {str(e)}")
+
+@router.get("/runs")
+async def list_runs(limit: int = 20):
+    """List recent runs, newest first, with per-phase timings and resource usage."""
+    try:
+        return {"runs": await asyncio.to_thread(get_run_ledger().recent, limit)}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid limit")
+    except Exception as e:
+        logger.exception("Error reading run history")
+        raise HTTPException(status_code=500, detail=f"Error reading run history: {str(e)}")
+
+@router.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    """Get one run's performance report. Use "latest" for the most recent run."""
+    run = await asyncio.to_thread(get_run_ledger().get, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Run not found: {run_id}")
+    return run
+
+@router.get("/runs/{run_id}/compare")
+async def compare_run(run_id: str, window: Optional[int] = None, threshold: Optional[float] = None):
+    """Compare a run against the median of the runs before it and flag slowdowns."""
+    comparison = await asyncio.to_thread(get_run_ledger().compare, run_id, window, threshold)
+    if comparison is None:
+        raise HTTPException(status_code=404, detail=f"Run not found: {run_id}")
+    return comparison
+
 @router.post("/update-config")
-async def update_config(request: Request, config_update: ConfigUpdate):
+async def update_config(config_update: ConfigUpdate):
     """Update the configuration values."""
-    global current_config, CRAIGSLIST_CITIES, CRAIGSLIST_BASE_URL, KEYWORDS, REMOTE_KEYWORDS, NON_REMOTE_KEYWORDS
-    
     try:
-        # Log the raw request body
-        body = await request.body()
-        print("\n=== Update Config Request ===")
-        print("Raw request body:", body.decode())
-        
-        # Log the parsed config update
-        print("\nParsed config update:", json.dumps(config_update.dict(), indent=2))
-        
         # Update only the provided fields
         update_dict = config_update.dict(exclude_unset=True)
         
@@ -343,6 +485,11 @@ async def update_config(request: Request, config_update: ConfigUpdate):
         if 'cities' in update_dict and not isinstance(update_dict['cities'], list):
             raise HTTPException(status_code=422, detail="Cities must be a list")
             
+        if 'categories' in update_dict and (
+            not update_dict['categories'] or not all('{}' in url for url in update_dict['categories'])
+        ):
+            raise HTTPException(status_code=422, detail="Categories must be search URLs with a {} for the city")
+            
         if 'keywords' in update_dict and not isinstance(update_dict['keywords'], list):
             raise HTTPException(status_code=422, detail="Keywords must be a list")
             
@@ -355,61 +502,42 @@ async def update_config(request: Request, config_update: ConfigUpdate):
         if 'max_retries' in update_dict and not isinstance(update_dict['max_retries'], int):
             raise HTTPException(status_code=422, detail="max_retries must be an integer")
         
-        # Update the current config
-        current_config.update(update_dict)
-        
-        # Update the config file
-        update_config_file(current_config)
-        
-        # Reload the config module to get updated values
-        import importlib
-        import config
-        importlib.reload(config)
-        
-        # Update the global variables with new values
-        CRAIGSLIST_CITIES = config.CRAIGSLIST_CITIES
-        CRAIGSLIST_BASE_URL = config.CRAIGSLIST_BASE_URL
-        KEYWORDS = config.KEYWORDS
-        REMOTE_KEYWORDS = config.REMOTE_KEYWORDS
-        NON_REMOTE_KEYWORDS = config.NON_REMOTE_KEYWORDS
+        # The job store, config.py rewrite and module reload all block
+        await asyncio.to_thread(apply_config_update, update_dict)
         
         response = {
             "message": "Configuration updated successfully",
             "config": current_config
         }
         
-        print("\n=== Update Config Response ===")
-        print(json.dumps(response, indent=2))
+        # Only the names of the changed settings are logged, never their values
+        logger.info("Configuration updated", extra={"fields": {"keys": sorted(update_dict)}})
         return response
         
     except ValidationError as e:
-        print("\n=== Update Config Validation Error ===")
-        print("Validation error:", json.dumps(e.errors(), indent=2))
+        logger.warning("Invalid configuration update", extra={"fields": {"errors": len(e.errors())}})
         raise HTTPException(status_code=422, detail=e.errors())
     except HTTPException as he:
         raise he
     except Exception as e:
-        print("\n=== Update Config Error ===")
-        print(f"Error: {str(e)}")
+        logger.exception("Error updating configuration")
         raise HTTPException(status_code=500, detail=f"Error updating configuration: {str(e)}")
 
 @router.get("/current-config")
 async def get_current_config():
     """Get the current configuration values."""
-    print("\n=== Current Config Response ===")
-    print(json.dumps(current_config, indent=2))
-    return current_config
+    if poll_sampler.should_log("current-config"):
+        logger.debug("Current config read")
+    return await asyncio.to_thread(shared_config)
 
 @router.post("/cleanup")
 async def cleanup():
     """Clean up resources and stop any running scraping process."""
-    global scraping_status, scraper
-    
     try:
-        # Close the scraper if it's running
-        if scraper:
-            scraper.close()
-            scraper = None
+        # Stop a running job cleanly before touching its files
+        stopped = await stop_running_job("stopped by cleanup", float(os.getenv('CLEANUP_WAIT_SECONDS', 60)))
+        if not stopped:
+            raise HTTPException(status_code=409, detail="Scraping is still stopping; try cleanup again shortly")
         
         # Clean up output files
         output_dir = "output"
@@ -420,39 +548,49 @@ async def cleanup():
                     if os.path.isfile(file_path):
                         os.remove(file_path)
                 except Exception as e:
-                    print(f"Error deleting {file_path}: {str(e)}")
+                    logger.warning(f"Error deleting {file_path}: {str(e)}")
         
-        # Reset status to default values
-        scraping_status = {
-            "is_running": False,
-            "progress": 0,
-            "total_listings": 0,
-            "processed_listings": 0,
-            "current_phase": "Not Started",
-            "last_completed": None,
-            "no_results": False,
-            "error": None
-        }
+        # Reset status to default values by forgetting finished jobs
+        await asyncio.to_thread(get_job_store().clear_finished)
         
-        print("\n=== Cleanup Response ===")
-        print("Files cleaned from output directory")
-        print("Status reset to default values")
-        print(json.dumps(scraping_status, indent=2))
+        logger.info("Cleanup finished: output files removed and status reset")
         
         return {
             "message": "Cleanup completed successfully",
             "files_cleaned": True,
             "status_reset": True
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        print("\n=== Cleanup Error ===")
-        print(f"Error during cleanup: {str(e)}")
+        logger.exception("Error during cleanup")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.on_event("startup")
+async def start_workers():
+    """Start the job workers, so they can warm their browsers before the first job."""
+    await asyncio.to_thread(get_job_store().reap)
+    await asyncio.to_thread(start_worker_processes)
+
+@app.on_event("shutdown")
+async def stop_workers():
+    """Stop the workers this process started; each stops its job cleanly first."""
+    for process in worker_processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGTERM)
+    for process in worker_processes:
+        try:
+            await asyncio.to_thread(process.wait, float(os.getenv('CLEANUP_WAIT_SECONDS', 60)))
+        except Exception:
+            process.kill()
+
 # Include the router in the app
 app.include_router(router)
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv('PORT', 8000))
-    uvicorn.run("app:app", host="0.0.0.0", port=port, reload=True) 
\ No newline at end of file
+    # Jobs run in worker processes, so the API can serve from several processes
+    reload = os.getenv('API_RELOAD', 'false').lower() == 'true'
+    workers = None if reload else int(os.getenv('API_WORKERS', 1))
+    uvicorn.run("app:app", host="0.0.0.0", port=port, reload=reload, workers=workers) 
\ No newline at end of file
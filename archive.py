@@ -0,0 +1,246 @@
+import os
+import gzip
+import time
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class PageArchive:
+    """
+    Compressed, content-addressed store of fetched pages.
+
+    Page bodies are stored once per SHA-256 digest under ``blobs/`` (zstd when
+    the zstandard package is installed, gzip otherwise). A small SQLite index
+    maps each URL and fetch time to the digest it returned.
+    """
+
+    def __init__(self, root=None):
+        if root is None:
+            root = os.getenv('PAGE_ARCHIVE_DIR', 'archive')
+        self.root = root
+        self.blob_dir = os.path.join(root, 'blobs')
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, 'index.sqlite'), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT NOT NULL, fetched_at REAL NOT NULL, digest TEXT NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_url ON pages (url, fetched_at)")
+        self._db.commit()
+
+    def _blob_path(self, digest):
+        ext = '.zst' if zstandard else '.gz'
+        return os.path.join(self.blob_dir, digest[:2], digest + ext)
+
+    def _find_blob(self, digest):
+        for ext in ('.zst', '.gz'):
+            path = os.path.join(self.blob_dir, digest[:2], digest + ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, url, content, fetched_at=None):
+        """Store a page body (str or bytes) for the URL and return its digest."""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        if fetched_at is None:
+            fetched_at = time.time()
+
+        digest = hashlib.sha256(content).hexdigest()
+        if self._find_blob(digest) is None:
+            path = self._blob_path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if zstandard:
+                data = zstandard.ZstdCompressor(level=10).compress(content)
+            else:
+                data = gzip.compress(content, compresslevel=6)
+            # Write to a temp file first so a crash never leaves a partial blob; the
+            # unique name keeps threads storing the same page from sharing one
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO pages (url, fetched_at, digest, size) VALUES (?, ?, ?, ?)",
+                (url, fetched_at, digest, len(content))
+            )
+            self._db.commit()
+        return digest
+
+    def read_blob(self, digest):
+        """Return the decompressed bytes stored under a digest."""
+        path = self._find_blob(digest)
+        if path is None:
+            raise KeyError(digest)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if path.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read .zst archive blobs")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def lookup(self, url, before=None):
+        """Return the digest of the latest fetch of the URL, optionally before a timestamp."""
+        query = "SELECT digest FROM pages WHERE url = ?"
+        params = [url]
+        if before is not None:
+            query += " AND fetched_at <= ?"
+            params.append(before)
+        query += " ORDER BY fetched_at DESC LIMIT 1"
+        with self._lock:
+            row = self._db.execute(query, params).fetchone()
+        return row[0] if row else None
+
+    def get(self, url, before=None):
+        """Return the archived body of the URL as bytes, or None if it was never fetched."""
+        digest = self.lookup(url, before)
+        if digest is None:
+            return None
+        return self.read_blob(digest)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_shared_archive = None
+_shared_lock = threading.Lock()
+
+
+def get_page_archive():
+    """Return the process-wide page archive, so scrapers don't each open the index."""
+    global _shared_archive
+    with _shared_lock:
+        if _shared_archive is None:
+            _shared_archive = PageArchive()
+        return _shared_archive
+
+
+class ReplayElementMissing(Exception):
+    """
+    Raised when a selector matches nothing in an archived page.
+
+    Deliberately not a NoSuchElementException, so WebDriverWait gives up at
+    once instead of polling a page that will never change.
+    """
+
+
+class ReplayElement:
+    """Read-only stand-in for a WebElement backed by a parsed archive page."""
+
+    def __init__(self, driver, node):
+        self._driver = driver
+        self._node = node
+
+    @property
+    def text(self):
+        return self._node.get_text("\n", strip=True)
+
+    def get_attribute(self, name):
+        value = self._node.get(name)
+        if isinstance(value, list):
+            value = " ".join(value)
+        if value and name in ('href', 'src'):
+            value = urljoin(self._driver.current_url, value)
+        return value
+
+    def find_element(self, by=By.CSS_SELECTOR, value=None):
+        return self._driver._first(self._node, by, value)
+
+    def find_elements(self, by=By.CSS_SELECTOR, value=None):
+        return self._driver._all(self._node, by, value)
+
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+    def click(self):
+        pass
+
+
+class ReplayDriver:
+    """
+    Minimal WebDriver replacement that serves pages from a PageArchive.
+
+    Supports the calls the scraper makes while reading pages; interactive
+    steps such as clicking reply buttons are no-ops.
+    """
+
+    def __init__(self, archive, before=None):
+        self.archive = archive
+        self.before = before
+        self.current_url = None
+        self.page_source = ""
+        self._soup = None
+
+    def get(self, url):
+        content = self.archive.get(url, self.before)
+        if content is None:
+            raise ReplayElementMissing(f"No archived page for {url}")
+        self.current_url = url
+        self.page_source = content.decode('utf-8', errors='replace')
+        self._soup = BeautifulSoup(self.page_source, "lxml")
+
+    def execute_script(self, script, *args):
+        if "document.readyState" in script:
+            return "complete"
+        return None
+
+    def _select(self, node, by, value):
+        if node is None:
+            return []
+        if by == By.CSS_SELECTOR:
+            return node.select(value)
+        if by == By.CLASS_NAME:
+            return node.select("." + value)
+        if by == By.ID:
+            return node.select("#" + value)
+        if by == By.TAG_NAME:
+            return node.find_all(value)
+        raise ReplayElementMissing(f"Unsupported locator in replay: {by}")
+
+    def _first(self, node, by, value):
+        nodes = self._select(node, by, value)
+        if not nodes:
+            raise ReplayElementMissing(f"{by}={value}")
+        return ReplayElement(self, nodes[0])
+
+    def _all(self, node, by, value):
+        return [ReplayElement(self, n) for n in self._select(node, by, value)]
+
+    def find_element(self, by=By.CSS_SELECTOR, value=None):
+        return self._first(self._soup, by, value)
+
+    def find_elements(self, by=By.CSS_SELECTOR, value=None):
+        return self._all(self._soup, by, value)
+
+    def set_page_load_timeout(self, timeout):
+        pass
+
+    def save_screenshot(self, filename):
+        return False
+
+    def quit(self):
+        pass
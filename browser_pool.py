@@ -0,0 +1,304 @@
+import os
+import time
+import uuid
+import threading
+from scraper import create_chrome_driver
+from run_history import process_tree_rss_mb
+from logs import get_logger
+
+logger = get_logger("browser_pool")
+
+
+class BrowserSession:
+    """A pooled browser and the usage it has accumulated since it started."""
+
+    def __init__(self, pool, driver, headless):
+        self.pool = pool
+        self.driver = driver
+        self.headless = headless
+        self.id = uuid.uuid4().hex[:8]
+        self.created_at = time.time()
+        # Incremented by the scraper for every page it loads
+        self.pages = 0
+        self.leases = 0
+
+    def rss_mb(self):
+        """Return the memory of the driver and its browser processes, or None if unknown."""
+        try:
+            return process_tree_rss_mb(self.driver.service.process.pid)
+        except Exception:
+            return None
+
+    def alive(self):
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def release(self):
+        """Hand the session back to its pool."""
+        self.pool.release(self)
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error quitting browser {self.id}: {str(e)}")
+
+
+class BrowserPool:
+    """
+    Long-lived, pre-started browsers leased to scraping jobs.
+
+    Starting Chrome takes seconds, so the pool keeps up to ``size`` browsers
+    running between jobs. A released browser has its cookies, cache, storage
+    and extra tabs cleared before the next lease. Browsers are recycled after
+    ``max_pages`` page loads or once their process tree uses more than
+    ``max_rss_mb`` (0 disables either limit): on release, with a replacement
+    started in the background, or mid-job through ``renew``.
+    """
+
+    def __init__(self, size=None, max_pages=None, max_rss_mb=None, lease_timeout=None, factory=None):
+        if size is None:
+            size = int(os.getenv('BROWSER_POOL_SIZE', 2))
+        if max_pages is None:
+            max_pages = int(os.getenv('BROWSER_MAX_PAGES', 200))
+        if max_rss_mb is None:
+            max_rss_mb = float(os.getenv('BROWSER_MAX_RSS_MB', 1500))
+        if lease_timeout is None:
+            lease_timeout = float(os.getenv('BROWSER_LEASE_TIMEOUT', 120))
+
+        self.size = max(int(size), 1)
+        self.max_pages = max(int(max_pages), 0)
+        self.max_rss_mb = max(float(max_rss_mb), 0.0)
+        self.lease_timeout = lease_timeout
+        self.factory = factory or create_chrome_driver
+        self._cond = threading.Condition()
+        self._idle = []
+        self._leased = set()
+        self._starting = 0
+        self._closed = False
+        self.stats = {"started": 0, "recycled": 0, "leases": 0, "warm_leases": 0}
+
+    def _total(self):
+        return len(self._idle) + len(self._leased) + self._starting
+
+    def _start(self, headless):
+        started = time.monotonic()
+        session = BrowserSession(self, self.factory(headless), headless)
+        with self._cond:
+            self.stats["started"] += 1
+        logger.info(f"Browser {session.id} started in {time.monotonic() - started:.1f}s")
+        return session
+
+    def warm(self, headless=False):
+        """Start browsers until the pool is full. Blocks while they start."""
+        while True:
+            with self._cond:
+                if self._closed or self._total() >= self.size:
+                    return
+                self._starting += 1
+            try:
+                session = self._start(headless)
+            except Exception as e:
+                logger.warning(f"Could not warm a browser: {str(e)}")
+                return
+            finally:
+                with self._cond:
+                    self._starting -= 1
+                    self._cond.notify_all()
+            with self._cond:
+                if self._closed:
+                    retire = True
+                else:
+                    retire = False
+                    self._idle.append(session)
+                    self._cond.notify_all()
+            if retire:
+                session.quit()
+
+    def _warm_in_background(self, headless):
+        threading.Thread(target=self.warm, args=(headless,), daemon=True).start()
+
+    def lease(self, headless=False, timeout=None):
+        """
+        Return a browser started with the given options, waiting up to ``timeout`` for one.
+
+        Idle browsers started with other options are replaced. Raises
+        TimeoutError if every browser stays leased.
+        """
+        timeout = self.lease_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            retire = None
+            session = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Browser pool is closed")
+                    matching = [s for s in self._idle if s.headless == headless]
+                    if matching:
+                        session = matching[0]
+                        self._idle.remove(session)
+                        self._leased.add(session)
+                        break
+                    if self._idle and self._total() >= self.size:
+                        # Make room by retiring a browser started with other options
+                        retire = self._idle.pop(0)
+                    if self._total() < self.size:
+                        self._starting += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No browser became free within {timeout:g}s")
+                    self._cond.wait(remaining)
+
+            if retire is not None:
+                retire.quit()
+            if session is not None:
+                # An idle browser may have crashed since it was released
+                if not session.alive():
+                    with self._cond:
+                        self._leased.discard(session)
+                        self.stats["recycled"] += 1
+                    session.quit()
+                    continue
+                warm = True
+            else:
+                try:
+                    session = self._start(headless)
+                except BaseException:
+                    with self._cond:
+                        self._starting -= 1
+                        self._cond.notify_all()
+                    raise
+                with self._cond:
+                    self._starting -= 1
+                    self._leased.add(session)
+                warm = False
+
+            with self._cond:
+                session.leases += 1
+                self.stats["leases"] += 1
+                if warm:
+                    self.stats["warm_leases"] += 1
+            return session
+
+    def _recycle_reason(self, session):
+        if self.max_pages and session.pages >= self.max_pages:
+            return f"served {session.pages} pages"
+        if self.max_rss_mb:
+            rss = session.rss_mb()
+            if rss is not None and rss >= self.max_rss_mb:
+                return f"using {rss:.0f} MB"
+        return None
+
+    def renew(self, session):
+        """
+        Return the session, or a fresh browser in its place if it is over a recycle limit.
+
+        Called by a job between page loads, so a long job can't hold on to a
+        browser past its page or memory cap. The replacement keeps the lease.
+        If it can't be started, the old browser is kept.
+        """
+        reason = self._recycle_reason(session)
+        if reason is None:
+            return session
+        with self._cond:
+            if self._closed:
+                return session
+        try:
+            replacement = self._start(session.headless)
+        except Exception as e:
+            logger.warning(f"Could not replace browser {session.id} ({reason}): {str(e)}")
+            return session
+
+        with self._cond:
+            self._leased.discard(session)
+            self._leased.add(replacement)
+            replacement.leases = 1
+            self.stats["recycled"] += 1
+        session.quit()
+        logger.info(f"Recycled browser {session.id} mid-job: {reason}")
+        return replacement
+
+    def _reset(self, session):
+        """Clear the state a job left behind, so the next lease starts clean."""
+        driver = session.driver
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        try:
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        except Exception:
+            pass  # Pages without storage access, e.g. error pages
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        driver.get("about:blank")
+
+    def release(self, session):
+        """Take a browser back, clearing its state or recycling it."""
+        reason = self._recycle_reason(session)
+        if reason is None:
+            try:
+                self._reset(session)
+            except Exception as e:
+                reason = f"reset failed: {str(e)}"
+
+        with self._cond:
+            self._leased.discard(session)
+            keep = reason is None and not self._closed
+            if keep:
+                self._idle.append(session)
+            elif reason is not None:
+                self.stats["recycled"] += 1
+            closed = self._closed
+            self._cond.notify_all()
+
+        if not keep:
+            session.quit()
+        if reason is not None:
+            logger.info(f"Recycled browser {session.id}: {reason}")
+            if not closed:
+                # Replace it now, so the next job doesn't pay for the start
+                self._warm_in_background(session.headless)
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "leased": len(self._leased),
+                "starting": self._starting,
+                "sessions": [
+                    {"id": s.id, "pages": s.pages, "leases": s.leases, "headless": s.headless,
+                     "leased": s in self._leased}
+                    for s in list(self._idle) + list(self._leased)
+                ],
+                **self.stats,
+            }
+
+    def close(self):
+        """Quit the idle browsers; leased ones are quit when they come back."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for session in idle:
+            session.quit()
+
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def get_browser_pool():
+    """Return the process-wide browser pool."""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = BrowserPool()
+        return _shared_pool
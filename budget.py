@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+from run_history import get_fetch_counters, process_tree_rss_mb
+
+
+class JobCancelled(BaseException):
+    """
+    A job was stopped, by request or because it went over its budget.
+
+    Derived from BaseException so the scraper's broad ``except Exception``
+    handlers let it through to the run's top level.
+    """
+
+    def __init__(self, reason, budget=False):
+        super().__init__(reason)
+        self.reason = reason
+        self.budget = budget
+
+
+class JobBudget:
+    """Per-job limits on wall time, pages fetched, retries and memory. Zero means no limit."""
+
+    def __init__(self, max_seconds=None, max_pages=None, max_retries=None, max_rss_mb=None):
+        if max_seconds is None:
+            max_seconds = float(os.getenv('JOB_MAX_SECONDS', 0))
+        if max_pages is None:
+            max_pages = int(os.getenv('JOB_MAX_PAGES', 0))
+        if max_retries is None:
+            max_retries = int(os.getenv('JOB_MAX_RETRIES', 0))
+        if max_rss_mb is None:
+            max_rss_mb = float(os.getenv('JOB_MAX_RSS_MB', 0))
+
+        self.max_seconds = max(float(max_seconds), 0.0)
+        self.max_pages = max(int(max_pages), 0)
+        self.max_retries = max(int(max_retries), 0)
+        self.max_rss_mb = max(float(max_rss_mb), 0.0)
+
+    def limits(self):
+        return {
+            "max_seconds": self.max_seconds,
+            "max_pages": self.max_pages,
+            "max_retries": self.max_retries,
+            "max_rss_mb": self.max_rss_mb,
+        }
+
+
+class CancelToken:
+    """
+    Cooperative stop signal for one job, checked inside the scraping loops.
+
+    ``check`` raises JobCancelled once ``cancel`` has been called or the
+    job's budget is used up. Memory is the resident size of this process and
+    its children (the browsers), sampled at most every ``rss_interval`` seconds.
+    """
+
+    def __init__(self, budget=None, rss_interval=5.0):
+        self.budget = budget or JobBudget()
+        self.rss_interval = rss_interval
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self.reason = None
+        self.over_budget = False
+        self._started = time.monotonic()
+        self._pages_at_start = self._pages()
+        self._rss_checked = 0.0
+        self.usage = {"seconds": 0.0, "pages": 0, "retries": 0, "rss_mb": None}
+
+    @staticmethod
+    def _pages():
+        counts = get_fetch_counters().snapshot()
+        return counts.get("pages", 0) + counts.get("feeds", 0)
+
+    def cancel(self, reason="cancelled", budget=False):
+        """Ask the job to stop. The first reason given is kept."""
+        with self._lock:
+            if self.reason is None:
+                self.reason = reason
+                self.over_budget = budget
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def wait(self, seconds):
+        """Sleep for up to ``seconds``, waking early on cancel. Returns True if cancelled."""
+        return self._event.wait(seconds) if seconds > 0 else self._event.is_set()
+
+    def _over_budget(self, retries):
+        budget = self.budget
+        now = time.monotonic()
+        self.usage["seconds"] = round(now - self._started, 1)
+        self.usage["pages"] = self._pages() - self._pages_at_start
+        if retries is not None:
+            self.usage["retries"] = retries
+
+        if budget.max_seconds and self.usage["seconds"] >= budget.max_seconds:
+            return f"wall time budget of {budget.max_seconds:.0f}s used up"
+        if budget.max_pages and self.usage["pages"] >= budget.max_pages:
+            return f"page budget of {budget.max_pages} used up"
+        if budget.max_retries and self.usage["retries"] >= budget.max_retries:
+            return f"retry budget of {budget.max_retries} used up"
+        if budget.max_rss_mb and now - self._rss_checked >= self.rss_interval:
+            self._rss_checked = now
+            rss = process_tree_rss_mb()
+            self.usage["rss_mb"] = None if rss is None else round(rss, 1)
+            if rss is not None and rss >= budget.max_rss_mb:
+                return f"memory budget of {budget.max_rss_mb:.0f} MB exceeded ({rss:.0f} MB)"
+        return None
+
+    def check(self, retries=None):
+        """Raise JobCancelled if the job was cancelled or is over budget."""
+        if not self._event.is_set():
+            reason = self._over_budget(retries)
+            if reason:
+                self.cancel(reason, budget=True)
+        if self._event.is_set():
+            raise JobCancelled(self.reason, self.over_budget)
+
+    def snapshot(self):
+        return {
+            "cancelled": self.cancelled,
+            "reason": self.reason,
+            "over_budget": self.over_budget,
+            "usage": dict(self.usage),
+            "limits": self.budget.limits(),
+        }
@@ -20,6 +20,9 @@ CRAIGSLIST_CITIES = [
     "watertown"
 ]
 CRAIGSLIST_BASE_URL = "https://{}.craigslist.org/d/computer-gigs/search/cpg"
+CRAIGSLIST_CATEGORIES = [
+    "https://{}.craigslist.org/d/computer-gigs/search/cpg"
+]
 KEYWORDS = [
     "website development",
     "wordpress",
@@ -0,0 +1,45 @@
+from lxml import etree
+from bs4 import BeautifulSoup
+
+
+def _local_name(tag):
+    """Strip the namespace from an lxml tag name."""
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ""
+
+
+def _html_to_text(html):
+    """Turn the HTML fragment in a feed description into plain text."""
+    if not html:
+        return ""
+    return BeautifulSoup(html, "lxml").get_text(" ", strip=True)
+
+
+def iter_feed_items(stream):
+    """
+    Stream items out of an RSS/RDF feed with lxml iterparse.
+
+    Yields dicts with title, link, date and description. Each item element is
+    cleared once read, so memory stays flat however large the feed is.
+    """
+    for _, element in etree.iterparse(stream, events=("end",), recover=True, huge_tree=True):
+        if _local_name(element.tag) != "item":
+            continue
+
+        fields = {}
+        for child in element:
+            name = _local_name(child.tag)
+            if name in ("title", "link", "description", "date", "pubDate"):
+                fields[name] = (child.text or "").strip()
+
+        link = fields.get("link") or element.get("{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about", "")
+        yield {
+            "title": fields.get("title", ""),
+            "link": link,
+            "date": fields.get("date") or fields.get("pubDate") or "Unknown",
+            "description": _html_to_text(fields.get("description", "")),
+        }
+
+        # Free the parsed item and any already-processed siblings
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
@@ -0,0 +1,331 @@
+import os
+import sys
+import signal
+import argparse
+import threading
+import subprocess
+import config
+import scraper as scraper_module
+from scraper import CraigslistScraper
+from pipeline import ListingPipeline
+from pacing import get_shared_pacer, get_shared_breaker
+from query_planner import get_query_planner, PLAN_MODES
+from browser_pool import get_browser_pool
+from budget import CancelToken, JobBudget, JobCancelled
+from run_history import RunRecorder, get_run_ledger
+from jobs import get_job_store
+from logs import setup_logging, get_logger, log_context
+from dotenv import load_dotenv
+
+logger = get_logger("job_worker")
+
+# API settings that live in config.py rather than in environment variables
+CONFIG_MODULE_SETTINGS = {
+    "cities": "CRAIGSLIST_CITIES",
+    "base_url": "CRAIGSLIST_BASE_URL",
+    "categories": "CRAIGSLIST_CATEGORIES",
+    "keywords": "KEYWORDS",
+    "remote_keywords": "REMOTE_KEYWORDS",
+    "non_remote_keywords": "NON_REMOTE_KEYWORDS",
+}
+
+
+def apply_settings(settings):
+    """
+    Make a job's settings the ones the scraper reads.
+
+    List settings replace the config module's values (and the scraper
+    module's copies of them); every other setting is exported as the
+    environment variable of the same name in upper case. The process-wide
+    pacer and query planner read their settings once, when first created,
+    so they are updated here too.
+    """
+    for key, value in settings.items():
+        name = CONFIG_MODULE_SETTINGS.get(key)
+        if name:
+            setattr(config, name, value)
+            if hasattr(scraper_module, name):
+                setattr(scraper_module, name, value)
+        elif isinstance(value, bool):
+            os.environ[key.upper()] = "true" if value else "false"
+        elif value is not None and not isinstance(value, (list, dict)):
+            os.environ[key.upper()] = str(value)
+
+    mode = os.getenv('DISCOVERY_PLAN', 'auto').lower()
+    if mode not in PLAN_MODES:
+        raise ValueError(f"DISCOVERY_PLAN must be one of {', '.join(PLAN_MODES)}, not {mode!r}")
+    get_query_planner().mode = mode
+    get_shared_pacer().min_interval = max(float(os.getenv('MIN_REQUEST_INTERVAL', 3)), 0.0)
+
+
+class JobWorker:
+    """
+    Process that claims scraping jobs from the job store and runs them one at a time.
+
+    Progress is written to the store for the API to read, and a heartbeat
+    thread keeps the worker registered, passes on stop requests and publishes
+    live budget, retry and host numbers. The worker keeps its browser pool
+    warm between jobs.
+    """
+
+    def __init__(self, store=None, worker_id=None, scraper_factory=None, poll_interval=None,
+                 heartbeat_interval=None):
+        if poll_interval is None:
+            poll_interval = float(os.getenv('JOB_POLL_SECONDS', 1))
+        if heartbeat_interval is None:
+            heartbeat_interval = float(os.getenv('JOB_HEARTBEAT_SECONDS', 2))
+        self.store = store or get_job_store()
+        self.worker_id = worker_id or f"worker-{os.getpid()}"
+        self.scraper_factory = scraper_factory
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._stop = threading.Event()
+        self._job_id = None
+        self._token = None
+        self._scrapers = []
+
+    def stop(self, reason="worker stopped"):
+        """Stop after the current job, cancelling it at its next checkpoint."""
+        self._stop.set()
+        token = self._token
+        if token is not None:
+            token.cancel(reason)
+
+    def _new_scraper(self, settings):
+        """Return a scraper on a warm pooled browser, or on its own browser when the pool is off."""
+        if self.scraper_factory is not None:
+            scraper = self.scraper_factory()
+        elif not settings.get("browser_pool") or settings.get("replay_archive"):
+            scraper = CraigslistScraper()
+        else:
+            browser = get_browser_pool().lease(headless=settings.get("use_headless", False))
+            try:
+                scraper = CraigslistScraper(browser=browser)
+            except Exception:
+                browser.release()
+                raise
+        scraper.cancel_token = self._token
+        self._scrapers.append(scraper)
+        return scraper
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            job_id, token = self._job_id, self._token
+            try:
+                self.store.heartbeat(self.worker_id, job_id)
+                if job_id is None:
+                    continue
+                reason = self.store.cancel_reason(job_id)
+                if reason and token is not None:
+                    token.cancel(reason)
+                live = {"hosts": get_shared_breaker().snapshot()}
+                if token is not None:
+                    live["budget"] = token.snapshot()
+                if self._scrapers:
+                    live["retries"] = self._scrapers[0].retry.snapshot()
+                if self.scraper_factory is None and os.getenv('BROWSER_POOL', 'true').lower() == 'true':
+                    live["browsers"] = get_browser_pool().snapshot()
+                self.store.update(job_id, **live)
+            except Exception as e:
+                logger.warning(f"Heartbeat failed: {str(e)}")
+
+    def _status(self, state=None, **fields):
+        self.store.update(self._job_id, state=state, **fields)
+
+    def _run_pipelined(self, scraper, settings, recorder):
+        """Run discovery, cleaning and detail scraping concurrently."""
+        self._status(
+            is_running=True,
+            progress=0,
+            current_phase="Pipelined: Scraping listings and details",
+            last_completed="Starting pipeline",
+            completed=False,
+            error=False,
+            no_results=False
+        )
+
+        def on_progress(counts):
+            self._status(
+                total_listings=counts["unique"],
+                processed_listings=counts["processed"],
+                last_completed=f"Processed {counts['processed']} of {counts['unique']} listings"
+            )
+
+        detail_scraper = self._new_scraper(settings)
+        pipeline = ListingPipeline(discovery_scraper=scraper, detail_scraper=detail_scraper, on_progress=on_progress)
+        pipeline.detail_scraper.phase_hooks.append(recorder.on_phase)
+        try:
+            counts = pipeline.run()
+        finally:
+            pipeline.close()
+        return counts["unique"] > 0
+
+    def _run_phases(self, scraper, settings, recorder):
+        """Run the phases one after another. Returns False if no listings were found."""
+        if settings.get("pipelined"):
+            return self._run_pipelined(scraper, settings, recorder)
+
+        # Phase 1: Scrape listings
+        self._status(
+            is_running=True,
+            progress=0,
+            current_phase="Phase 1: Scraping listings",
+            last_completed="Starting Phase 1",
+            completed=False,
+            error=False,
+            no_results=False
+        )
+        df = scraper.scrape_listings()
+        if df.empty:
+            return False
+
+        # Phase 2 - Step 1: Clean listings
+        self._status(
+            progress=30,
+            current_phase="Phase 2: Cleaning listings",
+            last_completed=f"Found {len(df)} listings"
+        )
+        df = scraper.clean_listings(df)
+
+        # Phase 2 - Step 2: Scrape details
+        self._status(
+            progress=50,
+            current_phase="Phase 2: Scraping details",
+            last_completed=f"Processing {len(df)} listings"
+        )
+        if settings.get("stream_details"):
+            scraper.stream_details(resume=False)
+        else:
+            scraper.scrape_details(df)
+        return True
+
+    def run_job(self, job):
+        """Run one claimed job to the end, recording its outcome in the store and the run ledger."""
+        settings = job["config"]
+        self._job_id = job["job_id"]
+        self._token = CancelToken(JobBudget(
+            max_seconds=settings.get("job_max_seconds"),
+            max_pages=settings.get("job_max_pages"),
+            max_retries=settings.get("job_max_retries"),
+            max_rss_mb=settings.get("job_max_rss_mb")
+        ))
+        if self._stop.is_set():
+            self._token.cancel("worker stopped")
+        recorder = RunRecorder("api", settings=settings, ledger=get_run_ledger(), run_id=job["job_id"])
+
+        state = "failed"
+        retries = 0
+        with log_context(job_id=job["job_id"], worker_id=self.worker_id):
+            logger.info("Scraping job running")
+            recorder.start()
+            try:
+                apply_settings(settings)
+                scraper = self._new_scraper(settings)
+                scraper.phase_hooks.append(recorder.on_phase)
+                if self._run_phases(scraper, settings, recorder):
+                    state = "completed"
+                    self._status(progress=100, current_phase="Completed", last_completed="Scraping Complete",
+                                 completed=True, no_results=False)
+                else:
+                    state = "no_results"
+                    self._status(progress=0, current_phase="Completed", last_completed="No listings found",
+                                 completed=True, no_results=True)
+            except JobCancelled as e:
+                # Partial results were flushed by the scraper before it stopped
+                state = "budget_exceeded" if e.budget else "cancelled"
+                self._status(current_phase="Stopped", last_completed=f"Stopped: {e.reason}",
+                             completed=False, error=False, no_results=False)
+                logger.warning(f"Scraping job stopped: {e.reason}")
+            except Exception as e:
+                self._status(progress=0, current_phase="Error", last_completed="Error during scraping",
+                             completed=False, error=str(e), no_results=False)
+                logger.exception("Scraping job failed")
+            finally:
+                if self._scrapers:
+                    retries = self._scrapers[0].retry.snapshot()
+                for scraper in self._scrapers:
+                    try:
+                        scraper.close()
+                    except Exception as e:
+                        logger.warning(f"Error closing scraper: {str(e)}")
+                self._scrapers = []
+                report = recorder.finish(state, retries=retries["retries"] if retries else 0)
+                self._status(state=state, is_running=False, run_id=report["run_id"], retries=retries or {},
+                             budget=self._token.snapshot())
+                self._job_id = None
+                self._token = None
+                logger.info("Run recorded", extra={"fields": {
+                    "status": state,
+                    "seconds": report["seconds"],
+                    "rows": report["rows"],
+                    "pages": report["pages"]
+                }})
+
+    def run(self):
+        """Claim and run jobs until stopped."""
+        self.store.heartbeat(self.worker_id)
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        if self.scraper_factory is None and os.getenv('BROWSER_POOL', 'true').lower() == 'true' \
+                and os.getenv('REPLAY_ARCHIVE', 'false').lower() != 'true':
+            # Start the pooled browsers now, so the first job doesn't wait for Chrome
+            pool = get_browser_pool()
+            threading.Thread(target=pool.warm, args=(os.getenv('USE_HEADLESS', 'false').lower() == 'true',),
+                             daemon=True).start()
+
+        logger.info(f"Worker {self.worker_id} waiting for jobs")
+        try:
+            while not self._stop.is_set():
+                job = self.store.claim(self.worker_id)
+                if job is None:
+                    self._stop.wait(self.poll_interval)
+                    continue
+                self.run_job(job)
+        finally:
+            self._stop.set()
+            heartbeat.join(timeout=self.heartbeat_interval + 1)
+            self.store.remove_worker(self.worker_id)
+            if self.scraper_factory is None:
+                get_browser_pool().close()
+            logger.info(f"Worker {self.worker_id} stopped")
+
+
+def ensure_workers(count=None, store=None, command=None):
+    """
+    Start worker processes until ``count`` are alive. Returns the started processes.
+
+    Workers run this module (or ``command``) with the reserved worker id
+    appended, in their own session so a crashing worker can't take the API
+    process with it.
+    """
+    if count is None:
+        count = int(os.getenv('JOB_WORKERS', 1))
+    store = store or get_job_store()
+    if command is None:
+        command = [sys.executable, os.path.abspath(__file__)]
+    processes = []
+    for worker_id in store.reserve_workers(count):
+        processes.append(subprocess.Popen(
+            command + ["--worker-id", worker_id],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            start_new_session=True
+        ))
+        logger.info(f"Started worker {worker_id}")
+    return processes
+
+
+def main(argv=None):
+    load_dotenv()
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Run scraping jobs queued through the API")
+    parser.add_argument("--worker-id", default=None, help="Id to register the worker under")
+    args = parser.parse_args(argv)
+
+    worker = JobWorker(worker_id=args.worker_id)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop("worker terminated"))
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop("worker interrupted"))
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+# Job states; a job is active while queued or running
+ACTIVE_STATES = ("queued", "running")
+
+
+class JobStore:
+    """
+    SQLite store of scraping jobs, their progress and the workers running them.
+
+    Shared by every API process and every worker process, so the HTTP layer
+    keeps no job state of its own. Each process opens its own connection;
+    state changes that read before they write run in ``BEGIN IMMEDIATE``
+    transactions. Workers heartbeat into ``job_workers``; a worker that stops
+    heartbeating for ``worker_timeout`` seconds is presumed dead and its
+    running job is failed by ``reap``.
+    """
+
+    def __init__(self, path=None, worker_timeout=None):
+        if path is None:
+            path = os.getenv('JOB_STORE_DB', os.getenv('RESULTS_DB', 'data/results.sqlite'))
+        if worker_timeout is None:
+            worker_timeout = float(os.getenv('JOB_WORKER_TIMEOUT', 30))
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.worker_timeout = worker_timeout
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._lock:
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    worker_id TEXT,
+                    config TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT '{}',
+                    cancel_reason TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at);
+
+                CREATE TABLE IF NOT EXISTS job_workers (
+                    worker_id TEXT PRIMARY KEY,
+                    pid INTEGER,
+                    job_id TEXT,
+                    heartbeat REAL NOT NULL,
+                    started_at REAL NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS job_settings (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    config TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+            """)
+
+    @staticmethod
+    def _job(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["config"] = json.loads(job["config"])
+        job["status"] = json.loads(job["status"])
+        return job
+
+    def create(self, config, status=None):
+        """
+        Queue a job with a snapshot of the settings it runs with. Returns its id.
+
+        Returns None instead when a job is already queued or running. The
+        check and the insert share one transaction, so concurrent starts
+        can't both queue a job.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                active = self._db.execute(
+                    "SELECT 1 FROM jobs WHERE state IN ('queued', 'running') LIMIT 1"
+                ).fetchone()
+                if active is None:
+                    self._db.execute(
+                        "INSERT INTO jobs (job_id, state, config, status, created_at, updated_at) "
+                        "VALUES (?, 'queued', ?, ?, ?, ?)",
+                        (job_id, json.dumps(config, default=str), json.dumps(status or {}, default=str), now, now)
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return None if active else job_id
+
+    def claim(self, worker_id):
+        """Start the oldest queued job on this worker. Returns the job, or None if there is none."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT job_id FROM jobs WHERE state = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                self._db.execute(
+                    "UPDATE jobs SET state = 'running', worker_id = ?, started_at = ?, updated_at = ? WHERE job_id = ?",
+                    (worker_id, now, now, row["job_id"])
+                )
+                self._db.execute("UPDATE job_workers SET job_id = ? WHERE worker_id = ?", (row["job_id"], worker_id))
+                job = self._db.execute("SELECT * FROM jobs WHERE job_id = ?", (row["job_id"],)).fetchone()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return self._job(job)
+
+    def update(self, job_id, state=None, **fields):
+        """Merge fields into a job's progress status, and optionally change its state."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return
+                status = json.loads(row["status"])
+                status.update(fields)
+                if state is None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?",
+                        (json.dumps(status, default=str), now, job_id)
+                    )
+                else:
+                    finished = None if state in ACTIVE_STATES else now
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, state = ?, finished_at = ?, updated_at = ? WHERE job_id = ?",
+                        (json.dumps(status, default=str), state, finished, now, job_id)
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def request_cancel(self, job_id, reason):
+        """Ask the worker running a job to stop it. A queued job is cancelled straight away."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET cancel_reason = COALESCE(cancel_reason, ?), updated_at = ? "
+                "WHERE job_id = ? AND state IN ('queued', 'running')",
+                (reason, now, job_id)
+            )
+        job = self.get(job_id)
+        if job and job["state"] == "queued":
+            self.update(job_id, state="cancelled", is_running=False, current_phase="Stopped",
+                        last_completed=f"Stopped: {reason}")
+
+    def cancel_reason(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT cancel_reason FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row["cancel_reason"] if row else None
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._job(row)
+
+    def latest(self):
+        """Return the most recently created job, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT 1").fetchone()
+        return self._job(row)
+
+    def active(self):
+        """Return the queued or running job, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE state IN ('queued', 'running') ORDER BY created_at LIMIT 1"
+            ).fetchone()
+        return self._job(row)
+
+    def clear_finished(self):
+        """Delete finished jobs, so the status reads as not started. Returns the number deleted."""
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM jobs WHERE state NOT IN ('queued', 'running')")
+        return cursor.rowcount
+
+    def heartbeat(self, worker_id, job_id=None):
+        """Record that a worker is alive, registering it on first call."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO job_workers (worker_id, pid, job_id, heartbeat, started_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (worker_id) DO UPDATE SET pid = excluded.pid, job_id = excluded.job_id, "
+                "heartbeat = excluded.heartbeat",
+                (worker_id, os.getpid(), job_id, now, now)
+            )
+
+    def remove_worker(self, worker_id):
+        with self._lock:
+            self._db.execute("DELETE FROM job_workers WHERE worker_id = ?", (worker_id,))
+
+    def reserve_workers(self, count):
+        """
+        Return ids for the workers to start so ``count`` are alive.
+
+        Reserved ids count as alive until they time out, so API processes
+        calling this at the same time don't both start the missing workers.
+        """
+        now = time.time()
+        reserved = []
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                alive = self._db.execute(
+                    "SELECT COUNT(*) FROM job_workers WHERE heartbeat >= ?", (now - self.worker_timeout,)
+                ).fetchone()[0]
+                for _ in range(max(count - alive, 0)):
+                    worker_id = f"worker-{uuid.uuid4().hex[:8]}"
+                    self._db.execute(
+                        "INSERT INTO job_workers (worker_id, heartbeat, started_at) VALUES (?, ?, ?)",
+                        (worker_id, now, now)
+                    )
+                    reserved.append(worker_id)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return reserved
+
+    def workers(self):
+        """Return the registered workers with whether each is still heartbeating."""
+        cutoff = time.time() - self.worker_timeout
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM job_workers ORDER BY started_at").fetchall()
+        return [{**dict(row), "alive": row["heartbeat"] >= cutoff} for row in rows]
+
+    def reap(self):
+        """
+        Fail the running jobs of workers that stopped heartbeating and forget those workers.
+
+        Returns the ids of the failed jobs.
+        """
+        now = time.time()
+        cutoff = now - self.worker_timeout
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT j.job_id FROM jobs j LEFT JOIN job_workers w ON w.worker_id = j.worker_id "
+                    "WHERE j.state = 'running' AND (w.worker_id IS NULL OR w.heartbeat < ?)",
+                    (cutoff,)
+                ).fetchall()
+                failed = [row["job_id"] for row in rows]
+                for job_id in failed:
+                    status = json.loads(self._db.execute(
+                        "SELECT status FROM jobs WHERE job_id = ?", (job_id,)
+                    ).fetchone()["status"])
+                    status.update({
+                        "is_running": False,
+                        "progress": 0,
+                        "current_phase": "Error",
+                        "last_completed": "Error during scraping",
+                        "error": "Worker stopped responding"
+                    })
+                    self._db.execute(
+                        "UPDATE jobs SET state = 'failed', status = ?, finished_at = ?, updated_at = ? WHERE job_id = ?",
+                        (json.dumps(status, default=str), now, now, job_id)
+                    )
+                self._db.execute("DELETE FROM job_workers WHERE heartbeat < ?", (cutoff,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return failed
+
+    def get_settings(self):
+        """Return the shared configuration overrides, or an empty dict."""
+        with self._lock:
+            row = self._db.execute("SELECT config FROM job_settings WHERE id = 1").fetchone()
+        return json.loads(row["config"]) if row else {}
+
+    def save_settings(self, config):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO job_settings (id, config, updated_at) VALUES (1, ?, ?)",
+                (json.dumps(config, default=str), time.time())
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_job_store():
+    """Return the process-wide job store."""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = JobStore()
+        return _shared_store
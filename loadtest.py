@@ -0,0 +1,368 @@
+import os
+import sys
+import csv
+import json
+import math
+import time
+import random
+import signal
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import requests
+import pandas as pd
+from retry import RetryPolicy
+from utils import get_free_port
+
+ENDPOINTS = {
+    "scraping-status": ("GET", "/api/scraping-status"),
+    "download-results": ("GET", "/api/download-results"),
+    "current-config": ("GET", "/api/current-config"),
+    "start-scraping": ("POST", "/api/start-scraping"),
+}
+# start-scraping answers 400 while a run is active, which is expected under load
+EXPECTED_STATUS = {"start-scraping": (200, 400)}
+SYNTHETIC_COLUMNS = ["City", "Title", "Link", "Post Date", "Processed", "Description", "Remote", "Email"]
+
+
+def write_results(path, rows, description_size=800):
+    """Write a synthetic results file, so downloads are as large as a real run's."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    rng = random.Random(0)
+    words = ["python", "developer", "remote", "hybrid", "data", "engineer", "office", "team", "senior"]
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=SYNTHETIC_COLUMNS)
+        writer.writeheader()
+        for i in range(rows):
+            text = " ".join(rng.choice(words) for _ in range(description_size // 7))
+            writer.writerow({
+                "City": rng.choice(["newyork", "sfbay", "chicago"]),
+                "Title": f"Software engineer {i}",
+                "Link": f"https://example.org/job/{i}.html",
+                "Post Date": "2024-01-01 10:00",
+                "Processed": True,
+                "Description": text,
+                "Remote": rng.choice(["Remote", "Not Remote", "Not Specified"]),
+                "Email": "Not Available",
+            })
+
+
+class StubScraper:
+    """
+    Stand-in for CraigslistScraper that never starts a browser.
+
+    Runs in the job worker processes the API starts. Each phase blocks for
+    ``phase_seconds`` with time.sleep, standing in for the real scraper's
+    work, and the details phase writes a results file of ``rows`` rows.
+    """
+
+    def __init__(self):
+        self.phase_seconds = float(os.getenv('STUB_PHASE_SECONDS', 2))
+        self.rows = int(os.getenv('STUB_ROWS', 1000))
+        self.output_file = os.getenv('OUTPUT_FILE', 'output/results.csv')
+        self.retry = RetryPolicy()
+        self.result_hooks = []
+        self.phase_hooks = []
+
+    def _report_phase(self, phase, items, started):
+        for hook in self.phase_hooks:
+            hook(phase, items, time.monotonic() - started)
+
+    def scrape_listings(self, max_listings=None, max_pages=None):
+        started = time.monotonic()
+        time.sleep(self.phase_seconds)
+        df = pd.DataFrame({"Title": [f"Software engineer {i}" for i in range(self.rows)]})
+        self._report_phase("listings", len(df), started)
+        return df
+
+    def clean_listings(self, df=None):
+        started = time.monotonic()
+        time.sleep(self.phase_seconds / 4)
+        self._report_phase("clean", len(df), started)
+        return df
+
+    def scrape_details(self, df=None, start_index=0, max_listings=None):
+        started = time.monotonic()
+        time.sleep(self.phase_seconds)
+        write_results(self.output_file, self.rows)
+        self._report_phase("details", self.rows, started)
+        return df
+
+    def stream_details(self, links_file=None, max_listings=None, resume=True):
+        self.scrape_details()
+        return self.rows
+
+    def close(self):
+        pass
+
+
+def serve(port):
+    """Run the API with stub-scraper job workers (the server side of a load test)."""
+    import uvicorn
+    import functools
+    import app as app_module
+    from job_worker import ensure_workers
+
+    app_module.ensure_workers = functools.partial(
+        ensure_workers, command=[sys.executable, os.path.abspath(__file__), "--worker"]
+    )
+    app_module.current_config["pipelined"] = False
+    app_module.current_config["browser_pool"] = False
+    uvicorn.run(app_module.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def work(worker_id):
+    """Run a job worker with the stub scraper."""
+    from job_worker import JobWorker
+
+    worker = JobWorker(worker_id=worker_id, scraper_factory=StubScraper)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop("worker terminated"))
+    worker.run()
+
+
+def stop_workers(db_path, timeout=10):
+    """
+    Stop the job workers the server left running.
+
+    Workers run in their own sessions, so stopping the server doesn't reach
+    them; they are found through the pids they registered in the job store.
+    """
+    from jobs import JobStore
+
+    store = JobStore(path=db_path)
+    try:
+        pids = [worker["pid"] for worker in store.workers() if worker["pid"]]
+    finally:
+        store.close()
+
+    def signal_all(signum):
+        alive = []
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+                alive.append(pid)
+            except ProcessLookupError:
+                pass
+        return alive
+
+    deadline = time.monotonic() + timeout
+    pids = signal_all(signal.SIGTERM)
+    while pids and time.monotonic() < deadline:
+        time.sleep(0.2)
+        pids = signal_all(0)
+    signal_all(signal.SIGKILL)
+
+
+def server_rss_mb(pid):
+    """Return a process's resident memory in MB, or None where /proc isn't available."""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class LoadTest:
+    """Drive the API's endpoints from concurrent keep-alive clients and collect latencies."""
+
+    def __init__(self, base_url, server_pid, endpoints, concurrency, duration):
+        self.base_url = base_url
+        self.server_pid = server_pid
+        self.endpoints = endpoints
+        self.concurrency = max(int(concurrency), 1)
+        self.duration = duration
+
+    def _client(self, endpoint, deadline, samples, errors):
+        method, path = ENDPOINTS[endpoint]
+        expected = EXPECTED_STATUS.get(endpoint, (200,))
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                response = session.request(method, self.base_url + path, timeout=60)
+                ok = response.status_code in expected
+            except requests.RequestException:
+                ok = False
+            samples.append(time.perf_counter() - started)
+            if not ok:
+                errors.append(endpoint)
+        session.close()
+
+    def _keep_running(self, deadline):
+        """Start a new scraping run whenever the previous one finishes."""
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            try:
+                session.post(self.base_url + "/api/start-scraping", timeout=60)
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        session.close()
+
+    def run(self, scenario, active):
+        """Run one scenario and return its per-endpoint report."""
+        deadline = time.monotonic() + self.duration
+        samples = {endpoint: [] for endpoint in self.endpoints}
+        errors = []
+        memory = []
+
+        threads = []
+        if active:
+            threads.append(threading.Thread(target=self._keep_running, args=(deadline,), daemon=True))
+        for i in range(self.concurrency):
+            endpoint = self.endpoints[i % len(self.endpoints)]
+            threads.append(threading.Thread(
+                target=self._client, args=(endpoint, deadline, samples[endpoint], errors), daemon=True
+            ))
+
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        while time.monotonic() < deadline:
+            rss = server_rss_mb(self.server_pid)
+            if rss is not None:
+                memory.append(rss)
+            time.sleep(0.25)
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        report = {
+            "scenario": scenario,
+            "concurrency": self.concurrency,
+            "seconds": round(elapsed, 2),
+            "server_rss_mb": {
+                "peak": round(max(memory), 1) if memory else None,
+                "end": round(memory[-1], 1) if memory else None,
+            },
+            "endpoints": {},
+        }
+        for endpoint, latencies in samples.items():
+            failed = errors.count(endpoint)
+            report["endpoints"][endpoint] = {
+                "requests": len(latencies),
+                "errors": failed,
+                "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+                "p50_ms": None if not latencies else round(percentile(latencies, 50) * 1000, 1),
+                "p99_ms": None if not latencies else round(percentile(latencies, 99) * 1000, 1),
+                "max_ms": None if not latencies else round(max(latencies) * 1000, 1),
+            }
+        return report
+
+
+def print_report(report):
+    memory = report["server_rss_mb"]
+    print(f"\n{report['scenario']}: {report['concurrency']} clients for {report['seconds']}s, "
+          f"server memory peak {memory['peak']} MB, end {memory['end']} MB")
+    print(f"{'endpoint':<18} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"{endpoint:<18} {stats['requests']:>9} {stats['errors']:>7} {str(stats['throughput_rps']):>8} "
+              f"{str(stats['p50_ms']):>9} {str(stats['p99_ms']):>9} {str(stats['max_ms']):>9}")
+
+
+def wait_for_server(base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("API server exited during startup")
+        try:
+            requests.get(base_url + "/api/", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("API server did not start in time")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Load test the API endpoints against a stubbed scraper, idle and with a run active"
+    )
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients per scenario")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per scenario")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        help="Comma-separated endpoints to drive: " + ", ".join(ENDPOINTS))
+    parser.add_argument("--rows", type=int, default=5000, help="Rows in the results file served by downloads")
+    parser.add_argument("--phase-seconds", type=float, default=2,
+                        help="How long each stubbed scraper phase blocks")
+    parser.add_argument("--scenarios", default="idle,active", help="Scenarios to run: idle, active")
+    parser.add_argument("--output", default=None, help="Also write the reports to this JSON file")
+    parser.add_argument("--serve", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-id", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.serve is not None:
+        serve(args.serve)
+        return None
+    if args.worker:
+        work(args.worker_id)
+        return None
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = [e for e in endpoints if e not in ENDPOINTS]
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    env = dict(os.environ)
+    env.update({
+        "OUTPUT_FILE": os.path.join(workdir, "results.csv"),
+        "LINKS_FILE": os.path.join(workdir, "links.csv"),
+        "RESULTS_DB": os.path.join(workdir, "results.sqlite"),
+        "STUB_ROWS": str(args.rows),
+        "STUB_PHASE_SECONDS": str(args.phase_seconds),
+        # Keep the server's own worker shutdown within the time it is given to exit
+        "CLEANUP_WAIT_SECONDS": "5",
+        "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+    })
+    write_results(env["OUTPUT_FILE"], args.rows)
+    print(f"Results file: {os.path.getsize(env['OUTPUT_FILE']) / (1024 * 1024):.1f} MB ({args.rows} rows)")
+
+    port = get_free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    # The server runs in its own process so its memory and event loop are measured on their own
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(port)],
+                               env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    reports = []
+    try:
+        wait_for_server(base_url, process)
+        test = LoadTest(base_url, process.pid, endpoints, args.concurrency, args.duration)
+        for scenario in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+            active = scenario == "active"
+            # Without an active run, start-scraping would start one; leave it to the active scenario
+            test.endpoints = endpoints if active else [e for e in endpoints if e != "start-scraping"] or endpoints
+            report = test.run(scenario, active)
+            print_report(report)
+            reports.append(report)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        stop_workers(env.get("JOB_STORE_DB", env["RESULTS_DB"]))
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+        print(f"\nReports written to {args.output}")
+    return reports
+
+
+if __name__ == "__main__":
+    main()
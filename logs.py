@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+LOGGER_NAME = "craigslist"
+
+# Fields attached to every log line written while they are bound, e.g. the job id
+_context = contextvars.ContextVar("log_context", default={})
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def get_logger(name=None):
+    """Return a logger under the scraper's namespace."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+
+def current_context():
+    """Return the context fields bound in the current thread or task."""
+    return dict(_context.get())
+
+
+@contextmanager
+def log_context(**fields):
+    """Attach fields to every log line written inside the block."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def bind_context(**fields):
+    """Attach fields to every later log line in the current thread or task."""
+    _context.set({**_context.get(), **fields})
+
+
+class ContextFilter(logging.Filter):
+    """Copy the bound context fields onto the record before it leaves the calling thread."""
+
+    def filter(self, record):
+        record.context = current_context()
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the writer falls behind."""
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Render the message and traceback here, keeping the context and fields separate
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "context", {}))
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Format records as plain text with key=value fields, for reading in a terminal."""
+
+    def format(self, record):
+        line = f"{self.formatTime(record)} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        fields = {**getattr(record, "context", {}), **getattr(record, "fields", {})}
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class LogSampler:
+    """Let through one in every ``every`` events per key, for high-frequency log lines."""
+
+    def __init__(self, every=None):
+        if every is None:
+            every = int(os.getenv('LOG_SAMPLE_EVERY', 100))
+        self.every = max(int(every), 1)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def should_log(self, key):
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        return count % self.every == 0
+
+
+def setup_logging(level=None, fmt=None, stream=None):
+    """
+    Route the scraper's loggers through a queue to a background writer thread.
+
+    Callers only enqueue records, so a slow stdout never blocks request
+    handling or scraping. Safe to call more than once; later calls are no-ops.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return get_logger()
+
+        if level is None:
+            level = os.getenv('LOG_LEVEL', 'INFO')
+        if fmt is None:
+            fmt = os.getenv('LOG_FORMAT', 'json').lower()
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+        records = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+        handler = DroppingQueueHandler(records)
+        handler.addFilter(ContextFilter())
+
+        logger = get_logger()
+        logger.setLevel(level.upper() if isinstance(level, str) else level)
+        logger.handlers = [handler]
+        logger.propagate = False
+
+        _listener = QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return logger
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
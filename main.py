@@ -1,47 +1,236 @@
 import os
+import sys
 import argparse
 import traceback
+import cProfile
+import pstats
+import signal
 from scraper import CraigslistScraper
+from pipeline import ListingPipeline
+from phases import PhaseRunner, PHASES, EXPORT_FORMATS, export_results, phase_config
+from work_queue import WorkQueue, QueueWorker, seed_cities, merge_results
+from logs import setup_logging
+from run_history import RunRecorder, get_run_ledger
+from budget import CancelToken, JobCancelled
 from dotenv import load_dotenv
 
-def main():
+def parse_args(argv=None):
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description="Craigslist job listings scraper")
+
+    # Options shared by every subcommand
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--force", action="store_true",
+                        help="Re-run phases even if their artifacts are up to date")
+    common.add_argument("--max-listings", type=int, default=None,
+                        help="Stop discovery after this many matching listings")
+    common.add_argument("--workers", type=int, default=int(os.getenv('DETAIL_WORKERS', 1)),
+                        help="Number of browsers scraping listing details in parallel")
+    common.add_argument("--format", choices=EXPORT_FORMATS, default="csv",
+                        help="Also export the results in this format")
+    common.add_argument("--profile", action="store_true",
+                        help="Profile the run with cProfile and print the hottest functions")
+    common.add_argument("--profile-output", default="output/profile.pstats",
+                        help="Where to write the cProfile stats")
+
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("run", parents=[common],
+                          help="Run all phases as a DAG, skipping unchanged ones (default)")
+    subparsers.add_parser("listings", parents=[common], help="Phase 1: scrape job listings")
+    subparsers.add_parser("clean", parents=[common], help="Phase 2: remove duplicate listings")
+    subparsers.add_parser("details", parents=[common],
+                          help="Phase 3: scrape listing details (runs stale upstream phases first)")
+    subparsers.add_parser("pipeline", parents=[common],
+                          help="Run all phases concurrently with bounded queues (no caching)")
+
+    # Distributed mode: workers on any node share one queue database
+    distributed = argparse.ArgumentParser(add_help=False, parents=[common])
+    distributed.add_argument("--queue", default=None,
+                             help="Path of the shared work queue database (default: WORK_QUEUE_DB)")
+    distributed.add_argument("--lease", type=float, default=None,
+                             help="Seconds a claimed task stays leased before other workers may take it")
+    distributed.add_argument("--worker-id", default=None,
+                             help="Name of this worker in the queue (default: host and process id)")
+    subparsers.add_parser("seed", parents=[distributed], help="Publish one discovery task per city to the queue")
+    subparsers.add_parser("worker", parents=[distributed],
+                          help="Claim and run queued city and detail tasks until the queue is drained")
+    subparsers.add_parser("merge", parents=[distributed],
+                          help="Write every finished detail result in the queue to the results file")
+    subparsers.add_parser("queue-status", parents=[distributed], help="Show task counts in the queue")
+
+    if argv is None:
+        argv = sys.argv[1:]
+    # Without a subcommand, behave like "run"
+    if not argv or (argv[0] not in subparsers.choices and argv[0] not in ("-h", "--help")):
+        argv = ["run"] + list(argv)
+    return parser.parse_args(argv)
+
+def run_settings(args):
+    """Return the settings that identify a run's configuration in the run history."""
+    settings = {phase: phase_config(phase) for phase in PHASES}
+    settings["command"] = args.command
+    settings["max_listings"] = args.max_listings
+    settings["workers"] = args.workers
+    return settings
+
+def report_run(report):
+    """Print a finished run's report and any regressions against recent runs."""
+    print(f"Run {report['run_id']}: {report['rows']} rows, {report['pages']} pages, "
+          f"{report['retries']} retries, {report['timeouts']} timeouts in {report['seconds']}s, "
+          f"peak memory {report['peak_rss_mb']} MB")
+    try:
+        comparison = get_run_ledger().compare(report['run_id'])
+    except Exception as e:
+        print(f"Could not compare run against history: {str(e)}")
+        return
+    if comparison and comparison["regressions"]:
+        print(f"Slower than the last {comparison['baseline_runs']} runs on: " + ", ".join(comparison["regressions"]))
+
+def job_token():
+    """Return a cancel token for this run; SIGTERM stops the run cleanly, keeping partial results."""
+    token = CancelToken()
+    try:
+        signal.signal(signal.SIGTERM, lambda signum, frame: token.cancel("terminated"))
+    except ValueError:  # Not on the main thread
+        pass
+    return token
+
+def cancelled_status(error):
+    return "budget_exceeded" if error.budget else "cancelled"
+
+def run_pipelined(args):
+    """Run discovery, cleaning and detail scraping concurrently."""
+    print("Initializing Craigslist Scraper...")
+    scraper = CraigslistScraper()
+    scraper.cancel_token = job_token()
+    pipeline = ListingPipeline(discovery_scraper=scraper)
+    recorder = RunRecorder("cli-pipeline", settings=run_settings(args), ledger=get_run_ledger())
+    pipeline.detail_scraper.phase_hooks.append(recorder.on_phase)
+    recorder.start()
+    status = "failed"
+    counts = {"processed": 0}
+    try:
+        print("Starting pipelined scraping process...")
+        counts = pipeline.run(max_listings=args.max_listings)
+        status = "completed"
+    except JobCancelled as e:
+        status = cancelled_status(e)
+        raise
+    finally:
+        report = recorder.finish(status, rows=counts["processed"], retries=scraper.retry.snapshot()["retries"])
+        print("Closing browser...")
+        pipeline.close()
+        scraper.close()
+    report_run(report)
+
+    print("Scraping completed successfully!")
+    print(f"Found {counts['discovered']} listings, {counts['unique']} unique")
+    print(f"Total results saved: {counts['processed']}")
+    if counts['deferred']:
+        print(f"Skipped {counts['deferred']} listings on paused hosts")
+    return scraper.output_file
+
+def run_distributed(args):
+    """Run one of the shared-queue commands."""
+    work_queue = WorkQueue(path=args.queue, lease_seconds=args.lease)
+    try:
+        if args.command == "seed":
+            added = seed_cities(work_queue)
+            print(f"Published {added} new city tasks")
+        elif args.command == "worker":
+            worker = QueueWorker(work_queue, worker_id=args.worker_id, max_listings=args.max_listings,
+                                 cancel_token=job_token())
+            try:
+                print(f"Worker {worker.worker_id} claiming tasks from {work_queue.path}...")
+                counts = worker.run()
+            finally:
+                worker.close()
+            print(f"Worker finished: {counts}")
+        elif args.command == "merge":
+            output_file = os.getenv('OUTPUT_FILE', 'output/results.csv')
+            rows = merge_results(work_queue, output_file)
+            print(f"Merged {rows} results into {output_file}")
+            return output_file
+        else:
+            reclaimed = work_queue.reclaim_expired()
+            if reclaimed:
+                print(f"Reclaimed {reclaimed} expired leases")
+            for kind, counts in sorted(work_queue.counts().items()):
+                print(f"{kind}: " + ", ".join(f"{status}={count}" for status, count in sorted(counts.items())))
+    finally:
+        work_queue.close()
+    return None
+
+def run_phases(args):
+    """Run the requested phases, skipping those whose artifacts are up to date."""
+    targets = ["details"] if args.command == "run" else [args.command]
+    recorder = RunRecorder(f"cli-{args.command}", settings=run_settings(args), ledger=get_run_ledger())
+    runner = PhaseRunner(force=args.force, max_listings=args.max_listings, workers=args.workers,
+                         recorder=recorder, cancel_token=job_token())
+    recorder.start()
+    status = "failed"
+    try:
+        summary = runner.run(targets, only=args.command in ("listings", "clean"))
+        # Runs that only found cached artifacts would drag the baseline down
+        status = "completed" if any(r["status"] == "ran" for r in summary.values()) else "up_to_date"
+    except JobCancelled as e:
+        status = cancelled_status(e)
+        raise
+    finally:
+        report = recorder.finish(status, retries=runner.retries())
+        runner.close()
+    report_run(report)
+
+    for phase, result in summary.items():
+        if result["status"] == "ran":
+            print(f"{phase}: {result['rows']} rows in {result['seconds']}s")
+        else:
+            print(f"{phase}: up to date")
+
+    if "details" in summary:
+        return runner.artifacts["details"]
+    return None
+
+def main(argv=None):
     try:
         # Load environment variables
         load_dotenv()
-        
-        print("Initializing Craigslist Scraper...")
-        scraper = CraigslistScraper()
-        
-        print("Starting scraping process...")
-        # Phase 1: Scrape job listings
-        print("Phase 1: Scraping job listings...")
-        listings_df = scraper.scrape_listings()
-        
-        if listings_df.empty:
-            print("No listings found. Exiting...")
-            return
-            
-        print(f"Found {len(listings_df)} listings")
-        
-        # Phase 2: Clean listings
-        print("Phase 2: Cleaning listings...")
-        cleaned_df = scraper.clean_listings(listings_df)
-        print(f"Cleaned {len(cleaned_df)} listings")
-        
-        # Phase 3: Scrape details
-        print("Phase 3: Scraping details...")
-        results_df = scraper.scrape_details(cleaned_df)
-        
-        print("Scraping completed successfully!")
-        print(f"Total results saved: {len(results_df)}")
-        
+        # The CLI is read in a terminal, so default to plain text lines
+        setup_logging(fmt=os.getenv('LOG_FORMAT', 'text').lower())
+        args = parse_args(argv)
+
+        if os.getenv('PIPELINED', 'false').lower() == 'true' and args.command == "run":
+            args.command = "pipeline"
+
+        profiler = cProfile.Profile() if args.profile else None
+        if profiler:
+            profiler.enable()
+        try:
+            if args.command == "pipeline":
+                results_file = run_pipelined(args)
+            elif args.command in ("seed", "worker", "merge", "queue-status"):
+                results_file = run_distributed(args)
+            else:
+                results_file = run_phases(args)
+        finally:
+            if profiler:
+                profiler.disable()
+                os.makedirs(os.path.dirname(args.profile_output) or '.', exist_ok=True)
+                profiler.dump_stats(args.profile_output)
+                print(f"Profile written to {args.profile_output}")
+                pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+
+        if results_file and args.format != "csv" and os.path.exists(results_file):
+            exported = export_results(results_file, args.format)
+            print(f"Results exported to {exported}")
+
+    except JobCancelled as e:
+        print(f"Run stopped: {e.reason}. Results scraped so far were saved.")
+        sys.exit(1)
     except Exception as e:
         print(f"An error occurred: {str(e)}")
+        traceback.print_exc()
         raise
-    finally:
-        if 'scraper' in locals():
-            print("Closing browser...")
-            scraper.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
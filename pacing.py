@@ -0,0 +1,152 @@
+import os
+import time
+import random
+import threading
+from urllib.parse import urlparse
+from logs import get_logger
+
+logger = get_logger("pacing")
+
+
+class HostPacer:
+    """
+    Per-host token bucket that gates outgoing requests.
+
+    Only network requests should go through the pacer; parsing and other local
+    work run unthrottled. Each host refills one token every ``min_interval``
+    seconds and can hold up to ``burst`` tokens.
+    """
+
+    def __init__(self, min_interval=None, burst=None, jitter=None):
+        if min_interval is None:
+            min_interval = float(os.getenv('MIN_REQUEST_INTERVAL', 3))
+        if burst is None:
+            burst = int(os.getenv('REQUEST_BURST', 1))
+        if jitter is None:
+            jitter = float(os.getenv('REQUEST_JITTER', 1))
+
+        self.min_interval = max(float(min_interval), 0.0)
+        self.burst = max(int(burst), 1)
+        self.jitter = max(float(jitter), 0.0)
+        self._buckets = {}  # host -> [tokens, last_refill]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_for(url):
+        """Return the host part of a URL (or the URL itself if it has none)."""
+        return urlparse(url).netloc.lower() or url
+
+    def _reserve(self, host):
+        """Take a token for the host and return how long the caller must wait."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(host, (float(self.burst), now))
+
+            if self.min_interval > 0:
+                tokens = min(float(self.burst), tokens + (now - last) / self.min_interval)
+            else:
+                tokens = float(self.burst)
+
+            tokens -= 1
+            wait = 0.0
+            if tokens < 0:
+                wait = -tokens * self.min_interval
+                if self.jitter:
+                    wait += random.uniform(0, self.jitter)
+
+            self._buckets[host] = (tokens, now)
+            return wait
+
+    def wait(self, url):
+        """Block until a request to the URL's host is allowed. Returns the time slept."""
+        delay = self._reserve(self.host_for(url))
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+_shared_pacer = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_pacer():
+    """Return the process-wide pacer, so every browser respects the same per-host limits."""
+    global _shared_pacer
+    with _shared_lock:
+        if _shared_pacer is None:
+            _shared_pacer = HostPacer()
+        return _shared_pacer
+
+
+class HostCircuitBreaker:
+    """
+    Per-host circuit breaker for hosts that signal blocking or throttling.
+
+    A blocked host is paused with exponential backoff (``base_backoff``,
+    doubling per consecutive block up to ``max_backoff``) while requests to
+    other hosts carry on. The first request after the pause acts as a probe:
+    success closes the breaker, another block re-opens it for longer.
+    """
+
+    def __init__(self, base_backoff=None, max_backoff=None):
+        if base_backoff is None:
+            base_backoff = float(os.getenv('BLOCK_BACKOFF_BASE', 120))
+        if max_backoff is None:
+            max_backoff = float(os.getenv('BLOCK_BACKOFF_MAX', 3600))
+
+        self.base_backoff = max(float(base_backoff), 0.0)
+        self.max_backoff = max(float(max_backoff), self.base_backoff)
+        self._hosts = {}  # host -> {"failures", "open_until", "reason"}
+        self._lock = threading.Lock()
+
+    def is_open(self, url):
+        """Return True while requests to the URL's host should be skipped."""
+        host = HostPacer.host_for(url)
+        with self._lock:
+            state = self._hosts.get(host)
+            return bool(state) and time.monotonic() < state["open_until"]
+
+    def record_block(self, url, reason="blocked"):
+        """Open the breaker for the URL's host. Returns the pause in seconds."""
+        host = HostPacer.host_for(url)
+        with self._lock:
+            state = self._hosts.setdefault(host, {"failures": 0, "open_until": 0.0, "reason": None})
+            state["failures"] += 1
+            backoff = min(self.base_backoff * (2 ** (state["failures"] - 1)), self.max_backoff)
+            state["open_until"] = time.monotonic() + backoff
+            state["reason"] = reason
+        logger.warning(f"Host {host} signalled {reason}, pausing it for {backoff:.0f}s",
+                       extra={"fields": {"host": host, "reason": reason, "backoff": round(backoff)}})
+        return backoff
+
+    def record_success(self, url):
+        """Close the breaker for the URL's host."""
+        host = HostPacer.host_for(url)
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def snapshot(self):
+        """Return the state of every host that has tripped the breaker."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: {
+                    "state": "open" if now < state["open_until"] else "half-open",
+                    "consecutive_blocks": state["failures"],
+                    "retry_in_seconds": round(max(state["open_until"] - now, 0.0), 1),
+                    "reason": state["reason"]
+                }
+                for host, state in self._hosts.items()
+            }
+
+
+_shared_breaker = None
+
+
+def get_shared_breaker():
+    """Return the process-wide circuit breaker."""
+    global _shared_breaker
+    with _shared_lock:
+        if _shared_breaker is None:
+            _shared_breaker = HostCircuitBreaker()
+        return _shared_breaker
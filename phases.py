@@ -0,0 +1,333 @@
+import os
+import json
+import time
+import queue
+import hashlib
+import threading
+import pandas as pd
+import config
+from scraper import CraigslistScraper, RESULT_COLUMNS
+from utils import CsvRecordWriter, fill_empty, iter_csv_records
+from budget import JobCancelled
+from query_planner import category_urls
+from logs import get_logger
+
+logger = get_logger("phases")
+
+# Phase -> phases it reads from
+PHASES = {
+    "listings": [],
+    "clean": ["listings"],
+    "details": ["clean"],
+}
+
+EXPORT_FORMATS = ["csv", "jsonl", "xlsx", "parquet"]
+LINK_COLUMNS = ["City", "Title", "Link", "Post Date", "Processed"]
+
+
+def file_digest(path):
+    """Return the SHA-256 of a file's contents, or None if it doesn't exist."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def phase_config(phase):
+    """Return the settings that affect a phase's output."""
+    if phase == "listings":
+        return {
+            "cities": config.CRAIGSLIST_CITIES,
+            "base_url": config.CRAIGSLIST_BASE_URL,
+            "categories": category_urls(),
+            "keywords": config.KEYWORDS,
+            "max_pages": os.getenv('MAX_PAGES_PER_CITY', '5'),
+            "max_age_hours": os.getenv('MAX_AGE_HOURS', '0'),
+            "backend": os.getenv('DISCOVERY_BACKEND', 'browser'),
+            "plan": os.getenv('DISCOVERY_PLAN', 'auto'),
+            "query_batch_size": os.getenv('QUERY_BATCH_SIZE', '6'),
+        }
+    if phase == "details":
+        return {
+            "remote_keywords": config.REMOTE_KEYWORDS,
+            "non_remote_keywords": config.NON_REMOTE_KEYWORDS,
+            "scrape_emails": os.getenv('SCRAPE_EMAILS', 'true'),
+            "backend": os.getenv('DETAIL_BACKEND', 'browser'),
+        }
+    return {}
+
+
+def _put_unless(q, item, stop):
+    """Put an item on a bounded queue unless ``stop`` is set first. Returns True if it was put."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def scrape_details_parallel(scrapers, links_file, output_file):
+    """Scrape listing details with one thread per scraper, writing every finished record to one file."""
+    rows = queue.Queue(maxsize=len(scrapers) * 2)
+    write_lock = threading.Lock()
+    errors = []
+    stop = threading.Event()
+
+    if os.path.exists(output_file):
+        os.remove(output_file)
+
+    with CsvRecordWriter(output_file, RESULT_COLUMNS, flush_every=scrapers[0].batch_size) as writer:
+        def work(scraper):
+            while True:
+                # Time out so a worker notices when another one was cancelled
+                try:
+                    row = rows.get(timeout=0.5)
+                except queue.Empty:
+                    if stop.is_set():
+                        return
+                    continue
+                if row is None:
+                    return
+                try:
+                    listing_data = scraper.scrape_listing(row)
+                    # Deferred because the host is paused; a resumed run retries it
+                    if not listing_data.get('Processed'):
+                        continue
+                    record = fill_empty(listing_data)
+                    with write_lock:
+                        writer.write(record)
+                except JobCancelled as e:
+                    errors.append(e)
+                    stop.set()
+                    return
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(scraper,), daemon=True) for scraper in scrapers]
+        for thread in threads:
+            thread.start()
+
+        for row in iter_csv_records(links_file):
+            if not _put_unless(rows, row, stop):
+                break
+        for _ in threads:
+            _put_unless(rows, None, stop)
+        for thread in threads:
+            thread.join()
+
+    # A cancelled job stops every worker; the rows written so far are kept
+    cancelled = [e for e in errors if isinstance(e, JobCancelled)]
+    if cancelled:
+        raise cancelled[0]
+    if errors:
+        logger.warning(f"{len(errors)} listings failed in parallel detail scraping; first error: {errors[0]}")
+    return writer.count
+
+
+def export_results(source, fmt):
+    """Convert the results CSV to another format next to it. Returns the new path."""
+    if fmt == "csv":
+        return source
+
+    base, _ = os.path.splitext(source)
+    target = f"{base}.{fmt}"
+    df = pd.read_csv(source)
+    if fmt == "jsonl":
+        df.to_json(target, orient="records", lines=True)
+    elif fmt == "xlsx":
+        df.to_excel(target, index=False)
+    elif fmt == "parquet":
+        try:
+            df.to_parquet(target, index=False)
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow or fastparquet installed")
+    else:
+        raise ValueError(f"Unknown output format: {fmt}")
+    return target
+
+
+class PhaseRunner:
+    """
+    Run scraper phases as a DAG with fingerprinted artifacts.
+
+    Each phase's fingerprint covers its settings and the digests of the
+    artifacts it reads. A phase is skipped when its artifact is still the one
+    recorded for the same fingerprint. Listings also expire after
+    ``listings_ttl`` hours, since the site changes even when our config doesn't.
+    The browser is only started once a phase actually has to run.
+    """
+
+    def __init__(self, force=False, max_listings=None, workers=1, listings_ttl=None, manifest_dir=None,
+                 recorder=None, cancel_token=None):
+        if listings_ttl is None:
+            listings_ttl = float(os.getenv('LISTINGS_TTL_HOURS', 24))
+        if manifest_dir is None:
+            manifest_dir = os.getenv('MANIFEST_DIR', 'output/.manifests')
+
+        self.force = force
+        self.max_listings = max_listings
+        self.workers = max(int(workers), 1)
+        self.listings_ttl = listings_ttl
+        self.manifest_dir = manifest_dir
+        self.recorder = recorder
+        self.cancel_token = cancel_token
+        self._scrapers = []
+
+        links_file = os.getenv('LINKS_FILE', 'output/links.csv')
+        self.artifacts = {
+            "listings": links_file,
+            # Cleaning must not overwrite its own input, or listings would never look fresh
+            "clean": os.getenv('CLEANED_LINKS_FILE', os.path.splitext(links_file)[0] + "_clean.csv"),
+            "details": os.getenv('OUTPUT_FILE', 'output/results.csv'),
+        }
+
+    @property
+    def scraper(self):
+        """The primary scraper, started on first use."""
+        if not self._scrapers:
+            self._scrapers.append(self._new_scraper())
+        return self._scrapers[0]
+
+    def _new_scraper(self):
+        scraper = CraigslistScraper()
+        scraper.links_file = self.artifacts["listings"]
+        scraper.cleaned_file = self.artifacts["clean"]
+        scraper.output_file = self.artifacts["details"]
+        if self._scrapers:
+            # Every browser in the run shares one retry budget
+            scraper.retry.share_budget(self._scrapers[0].retry)
+        scraper.cancel_token = self.cancel_token
+        return scraper
+
+    def retries(self):
+        """Return how many retries the run's shared retry policy has spent."""
+        if not self._scrapers:
+            return 0
+        return self._scrapers[0].retry.snapshot()["retries"]
+
+    def _manifest_path(self, phase):
+        return os.path.join(self.manifest_dir, f"{phase}.json")
+
+    def _load_manifest(self, phase):
+        try:
+            with open(self._manifest_path(phase)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def fingerprint(self, phase):
+        """Return the fingerprint of a phase's settings and inputs."""
+        payload = {
+            "phase": phase,
+            "config": phase_config(phase),
+            "params": {"max_listings": self.max_listings} if phase == "listings" else {},
+            "inputs": {dep: file_digest(self.artifacts[dep]) for dep in PHASES[phase]},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def is_fresh(self, phase):
+        """Return True if the phase's artifact is up to date with its inputs and settings."""
+        manifest = self._load_manifest(phase)
+        if not manifest or manifest.get("fingerprint") != self.fingerprint(phase):
+            return False
+        if manifest.get("artifact_digest") != file_digest(self.artifacts[phase]):
+            return False
+        if phase == "listings" and self.listings_ttl:
+            return time.time() - manifest.get("created_at", 0) < self.listings_ttl * 3600
+        return True
+
+    def _write_empty(self, phase, columns):
+        """Replace a phase's artifact with a header-only file when it produced no rows."""
+        path = self.artifacts[phase]
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        pd.DataFrame(columns=columns).to_csv(path, index=False)
+
+    def _execute(self, phase):
+        """Run one phase and return the number of rows it produced."""
+        if phase == "listings":
+            rows = len(self.scraper.scrape_listings(max_listings=self.max_listings))
+            columns = LINK_COLUMNS
+        elif phase == "clean":
+            rows = len(self.scraper.clean_listings())
+            columns = LINK_COLUMNS
+        elif phase == "details":
+            if self.workers > 1:
+                scrapers = [self.scraper] + [self._new_scraper() for _ in range(self.workers - 1)]
+                self._scrapers = scrapers
+                rows = scrape_details_parallel(scrapers, self.artifacts["clean"], self.artifacts["details"])
+            elif os.getenv('STREAM_DETAILS', 'false').lower() == 'true':
+                rows = self.scraper.stream_details(resume=False)
+            else:
+                rows = len(self.scraper.scrape_details())
+            columns = RESULT_COLUMNS
+        else:
+            raise ValueError(f"Unknown phase: {phase}")
+
+        # The scraper leaves old files alone when there is nothing to write
+        if rows == 0:
+            self._write_empty(phase, columns)
+        return rows
+
+    def plan(self, targets):
+        """Return the phases needed for the targets, dependencies first."""
+        order = []
+
+        def visit(phase):
+            if phase not in PHASES:
+                raise ValueError(f"Unknown phase: {phase}")
+            for dep in PHASES[phase]:
+                visit(dep)
+            if phase not in order:
+                order.append(phase)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def run(self, targets, only=False):
+        """
+        Run the target phases (and, unless ``only``, their stale dependencies).
+
+        Returns a summary per phase: whether it ran or was skipped, rows and seconds.
+        """
+        summary = {}
+        for phase in (targets if only else self.plan(targets)):
+            if not self.force and self.is_fresh(phase):
+                print(f"Skipping {phase}: artifact is up to date ({self.artifacts[phase]})")
+                summary[phase] = {"status": "skipped"}
+                continue
+
+            print(f"Running {phase}...")
+            started = time.monotonic()
+            rows = self._execute(phase)
+            elapsed = time.monotonic() - started
+            if self.recorder is not None:
+                self.recorder.on_phase(phase, rows, elapsed)
+
+            os.makedirs(self.manifest_dir, exist_ok=True)
+            manifest = {
+                "phase": phase,
+                "fingerprint": self.fingerprint(phase),
+                "artifact": self.artifacts[phase],
+                "artifact_digest": file_digest(self.artifacts[phase]),
+                "rows": rows,
+                "seconds": round(elapsed, 3),
+                "created_at": time.time(),
+            }
+            with open(self._manifest_path(phase), 'w') as f:
+                json.dump(manifest, f, indent=2)
+
+            print(f"Finished {phase}: {rows} rows in {elapsed:.1f}s")
+            summary[phase] = {"status": "ran", "rows": rows, "seconds": round(elapsed, 3)}
+        return summary
+
+    def close(self):
+        """Close every browser the runner started."""
+        for scraper in self._scrapers:
+            scraper.close()
+        self._scrapers = []
@@ -0,0 +1,188 @@
+import os
+import queue
+import threading
+import contextvars
+import time
+from scraper import CraigslistScraper
+from utils import append_to_csv, fill_empty
+from budget import JobCancelled
+
+# Sentinel that marks the end of a stage's output
+_DONE = object()
+
+
+class ListingPipeline:
+    """
+    Run Phase 1, cleaning and Phase 2 concurrently, connected by bounded queues.
+
+    Discovery and detail scraping each drive their own browser. Listings are
+    deduplicated as they arrive, so detail scraping starts on the first unique
+    listing instead of waiting for every city to be discovered.
+    """
+
+    def __init__(self, discovery_scraper=None, detail_scraper=None, queue_size=None, on_progress=None):
+        if queue_size is None:
+            queue_size = int(os.getenv('PIPELINE_QUEUE_SIZE', 50))
+
+        self._owned = []
+        if discovery_scraper is None:
+            discovery_scraper = CraigslistScraper()
+            self._owned.append(discovery_scraper)
+        if detail_scraper is None:
+            detail_scraper = CraigslistScraper()
+            self._owned.append(detail_scraper)
+
+        self.discovery_scraper = discovery_scraper
+        self.detail_scraper = detail_scraper
+        # Both stages draw from one retry budget for the run
+        self.detail_scraper.retry.share_budget(self.discovery_scraper.retry)
+        # ...and stop together when the job is cancelled or over budget
+        self.detail_scraper.cancel_token = self.discovery_scraper.cancel_token
+        self.queue_size = queue_size
+        self.on_progress = on_progress
+        self.counts = {"discovered": 0, "unique": 0, "processed": 0, "deferred": 0}
+
+        self._stop = threading.Event()
+        self._errors = []
+
+    def _report(self, key):
+        self.counts[key] += 1
+        if self.on_progress:
+            try:
+                self.on_progress(dict(self.counts))
+            except Exception:
+                pass
+
+    def _put(self, q, item):
+        """Put an item on a bounded queue, giving up if the pipeline is stopping."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _finish(self, q):
+        """Signal the next stage that no more items are coming."""
+        while True:
+            try:
+                q.put(_DONE, timeout=0.5)
+                return
+            except queue.Full:
+                if self._stop.is_set():
+                    return
+
+    def _discover(self, out_q, max_listings):
+        """Stage 1: stream listings from the search pages."""
+        try:
+            for listing in self.discovery_scraper.iter_listings(max_listings=max_listings):
+                if self._stop.is_set():
+                    break
+                self._report("discovered")
+                if not self._put(out_q, listing):
+                    break
+        except (Exception, JobCancelled) as e:
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            self._finish(out_q)
+
+    def _dedupe(self, in_q, out_q):
+        """Stage 2: drop listings whose normalized title was already seen."""
+        seen_titles = set()
+        links_file = self.discovery_scraper.links_file
+        try:
+            while True:
+                listing = in_q.get()
+                if listing is _DONE or self._stop.is_set():
+                    break
+
+                key = CraigslistScraper.normalize_title(listing['Title'])
+                if key in seen_titles:
+                    continue
+                seen_titles.add(key)
+
+                append_to_csv([listing], links_file)
+                self._report("unique")
+                if not self._put(out_q, listing):
+                    break
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            self._finish(out_q)
+
+    def run(self, max_listings=None):
+        """Run all phases and return the per-stage counts."""
+        listings_q = queue.Queue(maxsize=self.queue_size)
+        unique_q = queue.Queue(maxsize=self.queue_size)
+
+        # Phase outputs are appended as they are produced, so start from empty files
+        for path in (self.discovery_scraper.links_file, self.detail_scraper.output_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+        # Stage threads keep the caller's log context, such as the job id
+        stages = [
+            threading.Thread(target=contextvars.copy_context().run,
+                             args=(self._discover, listings_q, max_listings), daemon=True),
+            threading.Thread(target=contextvars.copy_context().run,
+                             args=(self._dedupe, listings_q, unique_q), daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+
+        started = time.monotonic()
+        batch = []
+        batch_size = self.detail_scraper.batch_size
+        try:
+            # Stage 3: scrape details on the calling thread
+            while True:
+                listing = unique_q.get()
+                if listing is _DONE or self._stop.is_set():
+                    break
+
+                listing_data = self.detail_scraper.scrape_listing(listing)
+                # Deferred because its host is paused; writing it would store a row of empty columns
+                if not listing_data.get('Processed'):
+                    self._report("deferred")
+                    continue
+                batch.append(fill_empty(listing_data))
+                self._report("processed")
+
+                # Save progress after each batch
+                if len(batch) >= batch_size:
+                    append_to_csv(batch, self.detail_scraper.output_file)
+                    batch = []
+                    self.detail_scraper._batch_delay()
+        except BaseException:
+            self._stop.set()
+            raise
+        finally:
+            if batch:
+                append_to_csv(batch, self.detail_scraper.output_file)
+            self._stop.set()
+            for stage in stages:
+                stage.join(timeout=5)
+
+        if self._errors:
+            raise self._errors[0]
+
+        self.detail_scraper._report_phase("pipeline", self.counts["processed"], started)
+        return dict(self.counts)
+
+    def close(self):
+        """Close the browsers created by the pipeline."""
+        for scraper in self._owned:
+            scraper.close()
+        self._owned = []
+
+
+def run_pipeline(max_listings=None, on_progress=None):
+    """Run the pipelined scraper with its own browsers and return the per-stage counts."""
+    pipeline = ListingPipeline(on_progress=on_progress)
+    try:
+        return pipeline.run(max_listings=max_listings)
+    finally:
+        pipeline.close()
@@ -0,0 +1,226 @@
+import os
+import json
+import math
+import time
+import sqlite3
+import threading
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+import config
+
+PLAN_MODES = ("auto", "crawl", "query")
+
+
+def category_urls():
+    """
+    Return the category search URL templates crawled for every city.
+
+    Read from the config module on each call, so updated settings apply to
+    the next run. Configs without CRAIGSLIST_CATEGORIES crawl the base URL.
+    """
+    categories = getattr(config, 'CRAIGSLIST_CATEGORIES', None) or [config.CRAIGSLIST_BASE_URL]
+    # Keep the first of any duplicates, so each category is crawled once
+    return list(dict.fromkeys(categories))
+
+
+def category_name(base_url):
+    """Return a category's short code, the last segment of its search path (e.g. ``cpg``)."""
+    path = urlparse(base_url.format("city")).path.rstrip("/")
+    return path.rsplit("/", 1)[-1] or path
+
+
+def query_groups(keywords, batch_size):
+    """Split keywords into groups of at most ``batch_size``, one search query each."""
+    keywords = [keyword for keyword in keywords if keyword.strip()]
+    return [keywords[i:i + batch_size] for i in range(0, len(keywords), batch_size)]
+
+
+def query_text(group):
+    """Return a Craigslist search query matching any keyword of the group; phrases are quoted."""
+    terms = [f'"{keyword}"' if " " in keyword else keyword for keyword in group]
+    return "|".join(terms) if len(terms) > 1 else terms[0]
+
+
+def search_url(city, group, base_url=None):
+    """Return the category search URL for a city, restricted to titles matching the group."""
+    parts = urlparse((base_url or config.CRAIGSLIST_BASE_URL).format(city))
+    query = dict(parse_qsl(parts.query))
+    # srchType=T searches titles only, the same field our keyword filter checks
+    query.update({"query": query_text(group), "srchType": "T"})
+    return urlunparse(parts._replace(query=urlencode(query)))
+
+
+class QueryPlanner:
+    """
+    Choose per city and category between crawling the whole category and server-side keyword searches.
+
+    The cost of each plan is the number of result pages it is expected to
+    fetch. Crawl cost comes from the city's last observed category volume;
+    query cost from how many listings each keyword matched before. A category
+    that was never crawled is assumed to fit on one page, so the first run
+    crawls it and learns its size; each query is assumed to need one page.
+    Since only crawls measure volume, a target that has been on queries for
+    ``recrawl_hours`` is crawled once more. Client-side keyword filtering
+    still applies to both plans.
+
+    History is kept per target, a city and category pair such as
+    ``albany/cpg``, in the table's ``city`` column.
+    """
+
+    def __init__(self, path=None, mode=None, batch_size=None, page_size=None, recrawl_hours=None):
+        if path is None:
+            path = os.getenv('RESULTS_DB', 'data/results.sqlite')
+        if mode is None:
+            mode = os.getenv('DISCOVERY_PLAN', 'auto').lower()
+        if batch_size is None:
+            batch_size = int(os.getenv('QUERY_BATCH_SIZE', 6))
+        if page_size is None:
+            page_size = int(os.getenv('RESULTS_PAGE_SIZE', 120))
+        if recrawl_hours is None:
+            recrawl_hours = float(os.getenv('QUERY_RECRAWL_HOURS', 168))
+        if mode not in PLAN_MODES:
+            raise ValueError(f"DISCOVERY_PLAN must be one of {', '.join(PLAN_MODES)}, not {mode!r}")
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.mode = mode
+        self.batch_size = max(int(batch_size), 1)
+        self.page_size = max(int(page_size), 1)
+        # 0 never re-crawls a target once it is on queries
+        self.recrawl_hours = max(float(recrawl_hours), 0.0)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._lock:
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS query_plan_history (
+                    city TEXT PRIMARY KEY,
+                    volume INTEGER,
+                    page_size REAL,
+                    keyword_hits TEXT NOT NULL DEFAULT '{}',
+                    last_strategy TEXT,
+                    last_pages INTEGER,
+                    crawl_pages INTEGER,
+                    crawled_at REAL,
+                    updated_at REAL NOT NULL
+                );
+            """)
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(query_plan_history)")}
+            if "crawled_at" not in columns:
+                self._db.execute("ALTER TABLE query_plan_history ADD COLUMN crawl_pages INTEGER")
+                self._db.execute("ALTER TABLE query_plan_history ADD COLUMN crawled_at REAL")
+            self._db.commit()
+
+    def _history(self, city):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT volume, page_size, keyword_hits, crawl_pages, crawled_at FROM query_plan_history "
+                "WHERE city = ?", (city,)
+            ).fetchone()
+        if not row:
+            return {"volume": None, "page_size": None, "keyword_hits": {}, "crawl_pages": None, "crawled_at": None}
+        return {"volume": row[0], "page_size": row[1], "keyword_hits": json.loads(row[2]),
+                "crawl_pages": row[3], "crawled_at": row[4]}
+
+    @staticmethod
+    def target(city, base_url=None):
+        """Return the history key of a city's crawl of one category."""
+        return f"{city}/{category_name(base_url or config.CRAIGSLIST_BASE_URL)}"
+
+    def estimate(self, city, keywords, max_pages, base_url=None):
+        """Return the expected page count of each plan for a city's category."""
+        history = self._history(self.target(city, base_url))
+        page_size = history["page_size"] or self.page_size
+
+        if history["volume"] is not None:
+            crawl = min(max_pages, max(1, math.ceil(history["volume"] / page_size)))
+        elif history["crawl_pages"]:
+            # Crawls that stopped early still cost at least the pages they fetched
+            crawl = min(max_pages, history["crawl_pages"])
+        else:
+            crawl = 1
+
+        query = 0
+        for group in query_groups(keywords, self.batch_size):
+            # Overlap between keywords only makes this an overestimate
+            expected = sum(history["keyword_hits"].get(keyword, 0) for keyword in group)
+            query += min(max_pages, max(1, math.ceil(expected / page_size)))
+
+        return {"crawl": crawl, "query": query}
+
+    def _recrawl_due(self, key):
+        """Return True if the target's volume is old enough to be measured again with a crawl."""
+        if not self.recrawl_hours:
+            return False
+        crawled_at = self._history(key)["crawled_at"]
+        return crawled_at is None or time.time() - crawled_at >= self.recrawl_hours * 3600
+
+    def plan(self, city, keywords, max_pages, base_url=None):
+        """Return the plan for a city's category: its strategy, start URLs and the cost estimate."""
+        base_url = base_url or config.CRAIGSLIST_BASE_URL
+        estimate = self.estimate(city, keywords, max_pages, base_url)
+        if self.mode == "auto":
+            strategy = "query" if estimate["query"] < estimate["crawl"] else "crawl"
+            if strategy == "query" and self._recrawl_due(self.target(city, base_url)):
+                strategy = "crawl"
+        else:
+            strategy = self.mode
+
+        if strategy == "query":
+            urls = [search_url(city, group, base_url) for group in query_groups(keywords, self.batch_size)]
+        else:
+            urls = [base_url.format(city)]
+        return {"strategy": strategy, "urls": urls, "estimate": estimate}
+
+    def record(self, city, strategy, pages, listings, keyword_hits, base_url=None, complete=True):
+        """
+        Store what a finished crawl of a city's category cost and found.
+
+        A category crawl updates the city's volume and page size; both plans
+        update the per-keyword match counts. A crawl that stopped early
+        (``complete`` False: page cap, age cutoff or a failed load) saw only
+        part of the category, so it keeps the stored volume and only raises
+        keyword counts. Every crawl records the pages it fetched and when.
+        """
+        key = self.target(city, base_url)
+        history = self._history(key)
+        hits = dict(history["keyword_hits"])
+        volume = history["volume"]
+        page_size = history["page_size"]
+        crawl_pages = history["crawl_pages"]
+        crawled_at = history["crawled_at"]
+        now = time.time()
+        if strategy == "crawl" and complete:
+            # Keywords that matched nothing in a full crawl really have no listings
+            hits = dict(keyword_hits)
+            volume = int(listings)
+        elif complete:
+            hits.update(keyword_hits)
+        else:
+            for keyword, count in keyword_hits.items():
+                hits[keyword] = max(hits.get(keyword, 0), count)
+        if strategy == "crawl":
+            crawl_pages = int(pages)
+            crawled_at = now
+            if pages and listings:
+                page_size = listings / pages
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO query_plan_history "
+                "(city, volume, page_size, keyword_hits, last_strategy, last_pages, crawl_pages, crawled_at, "
+                "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, volume, page_size, json.dumps(hits), strategy, int(pages), crawl_pages, crawled_at, now)
+            )
+            self._db.commit()
+
+
+_shared_planner = None
+_shared_lock = threading.Lock()
+
+
+def get_query_planner():
+    """Return the process-wide query planner."""
+    global _shared_planner
+    with _shared_lock:
+        if _shared_planner is None:
+            _shared_planner = QueryPlanner()
+        return _shared_planner
@@ -0,0 +1,158 @@
+import sys
+from collections.abc import MutableMapping
+import pandas as pd
+
+# Column name -> attribute name, in results file order
+FIELDS = {
+    "City": "city",
+    "Title": "title",
+    "Link": "link",
+    "Post Date": "post_date",
+    "Processed": "processed",
+    "Description": "description",
+    "Remote": "remote",
+    "Email": "email",
+    "Default Mail": "default_mail",
+    "Gmail": "gmail",
+    "Yahoo": "yahoo",
+    "Outlook": "outlook",
+    "AOL": "aol",
+}
+
+# Values returned for fields that were never set
+DEFAULTS = {
+    "processed": False,
+    "remote": "Not Specified",
+    "email": "Not Available",
+    "default_mail": "",
+    "gmail": "",
+    "yahoo": "",
+    "outlook": "",
+    "aol": "",
+}
+
+# Low-cardinality fields whose strings are shared between records
+INTERNED = {"city", "remote", "post_date"}
+
+
+class ListingRecord(MutableMapping):
+    """
+    Compact listing record with one slot per results column.
+
+    Behaves like the dicts it replaces (``record['Email'] = ...``) but avoids
+    the per-row hash table. Columns that were never set are not stored and
+    read back as their default; columns outside FIELDS go to a small overflow
+    dict that is only created when needed.
+    """
+
+    __slots__ = tuple(FIELDS.values()) + ("_extra",)
+
+    def __init__(self, data=None, **fields):
+        if data is not None:
+            self.update(data)
+        if fields:
+            self.update(fields)
+
+    @classmethod
+    def from_mapping(cls, data):
+        """Build a record from a dict, a pandas row or another record."""
+        if isinstance(data, cls):
+            return data.copy()
+        return cls(data)
+
+    def __getattr__(self, name):
+        # Only reached for unset slots
+        if name in DEFAULTS:
+            return DEFAULTS[name]
+        if name in FIELDS.values():
+            return None
+        raise AttributeError(name)
+
+    def _is_set(self, attr):
+        try:
+            object.__getattribute__(self, attr)
+            return True
+        except AttributeError:
+            return False
+
+    def _overflow(self, create=False):
+        try:
+            return object.__getattribute__(self, "_extra")
+        except AttributeError:
+            if not create:
+                return None
+            self._extra = {}
+            return self._extra
+
+    def __getitem__(self, key):
+        attr = FIELDS.get(key)
+        if attr is not None:
+            if attr in DEFAULTS or self._is_set(attr):
+                return getattr(self, attr)
+            raise KeyError(key)
+        extra = self._overflow()
+        if extra is None:
+            raise KeyError(key)
+        return extra[key]
+
+    def __setitem__(self, key, value):
+        attr = FIELDS.get(key)
+        if attr is None:
+            self._overflow(create=True)[key] = value
+            return
+        if attr in INTERNED and isinstance(value, str):
+            value = sys.intern(value)
+        setattr(self, attr, value)
+
+    def __delitem__(self, key):
+        attr = FIELDS.get(key)
+        if attr is None:
+            extra = self._overflow()
+            if extra is None:
+                raise KeyError(key)
+            del extra[key]
+            return
+        if not self._is_set(attr):
+            raise KeyError(key)
+        delattr(self, attr)
+
+    def __contains__(self, key):
+        attr = FIELDS.get(key)
+        if attr is not None:
+            return self._is_set(attr)
+        extra = self._overflow()
+        return extra is not None and key in extra
+
+    def __iter__(self):
+        for key, attr in FIELDS.items():
+            if self._is_set(attr):
+                yield key
+        extra = self._overflow()
+        if extra:
+            yield from extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"ListingRecord({dict(self.items())!r})"
+
+    def copy(self):
+        return ListingRecord(self)
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+def records_to_dataframe(records):
+    """Build a DataFrame column by column from records (or dicts) at the sink."""
+    columns = {}
+    count = 0
+    for record in records:
+        for key in record:
+            if key not in columns:
+                columns[key] = [None] * count
+        for key, values in columns.items():
+            values.append(record[key] if key in record else None)
+        count += 1
+    return pd.DataFrame(columns)
@@ -0,0 +1,131 @@
+import os
+import time
+import random
+import threading
+
+
+class PermanentError(Exception):
+    """Fetch failure that retrying can't fix, such as a 404 or a removed posting."""
+
+
+class BlockedError(Exception):
+    """The host is blocking or throttling us; the circuit breaker handles the pause."""
+
+
+def classify_error(exc):
+    """
+    Classify a fetch error as 'permanent', 'blocked' or 'transient'.
+
+    HTTP 4xx responses (other than 408/425/429) are permanent. Anything else,
+    such as timeouts, driver and connection errors or 5xx responses, is
+    treated as transient.
+    """
+    if isinstance(exc, PermanentError):
+        return "permanent"
+    if isinstance(exc, BlockedError):
+        return "blocked"
+
+    response = getattr(exc, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is not None:
+        if status in (408, 425, 429) or status >= 500:
+            return "transient"
+        if 400 <= status < 500:
+            return "permanent"
+
+    return "transient"
+
+
+class RetryPolicy:
+    """
+    Single retry engine for every fetch path.
+
+    Only transient errors are retried, with capped exponential backoff and
+    full jitter. All retries in a run draw from one shared ``budget``, so a
+    run full of dead links can't spend its time retrying them.
+    """
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None, budget=None, sleep=time.sleep):
+        if max_attempts is None:
+            max_attempts = int(os.getenv('MAX_RETRIES', 3))
+        if base_delay is None:
+            base_delay = float(os.getenv('RETRY_BASE_DELAY', 2))
+        if max_delay is None:
+            max_delay = float(os.getenv('RETRY_MAX_DELAY', 30))
+        if budget is None:
+            budget = int(os.getenv('RETRY_BUDGET', 100))
+
+        self.max_attempts = max(int(max_attempts), 1)
+        self.base_delay = max(float(base_delay), 0.0)
+        self.max_delay = max(float(max_delay), self.base_delay)
+        self.budget = max(int(budget), 0)
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self.stats = {
+            "calls": 0,
+            "succeeded": 0,
+            "retries": 0,
+            "retried_successes": 0,
+            "failed": {"permanent": 0, "blocked": 0, "transient": 0},
+            "budget_exhausted": 0
+        }
+
+    def backoff(self, attempt):
+        """Return the delay before the given retry (1-based), with full jitter."""
+        cap = min(self.base_delay * (2 ** (attempt - 1)), self.max_delay)
+        return random.uniform(0, cap)
+
+    def _take_retry(self):
+        with self._lock:
+            if self.stats["retries"] >= self.budget:
+                self.stats["budget_exhausted"] += 1
+                return False
+            self.stats["retries"] += 1
+            return True
+
+    def run(self, fn, *args, max_attempts=None, **kwargs):
+        """Call fn until it succeeds, fails permanently, runs out of attempts or the budget runs out."""
+        if max_attempts is None:
+            max_attempts = self.max_attempts
+        with self._lock:
+            self.stats["calls"] += 1
+
+        attempt = 1
+        while True:
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                kind = classify_error(e)
+                if kind != "transient" or attempt >= max_attempts or not self._take_retry():
+                    with self._lock:
+                        self.stats["failed"][kind] += 1
+                    raise
+                self.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+
+            with self._lock:
+                self.stats["succeeded"] += 1
+                if attempt > 1:
+                    self.stats["retried_successes"] += 1
+            return result
+
+    def share_budget(self, other):
+        """
+        Count this policy's calls and retries against another policy's budget.
+
+        Each policy keeps its own attempts and backoff sleep, so a scraper's
+        waits still go through that scraper.
+        """
+        self.budget = other.budget
+        self.stats = other.stats
+        self._lock = other._lock
+
+    def snapshot(self):
+        """Return the retry counters, including the remaining budget."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["failed"] = dict(self.stats["failed"])
+        stats["budget"] = self.budget
+        stats["budget_remaining"] = max(self.budget - stats["retries"], 0)
+        return stats
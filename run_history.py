@@ -0,0 +1,373 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+import statistics
+from logs import get_logger
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = get_logger("run_history")
+
+
+class FetchCounters:
+    """Process-wide counts of pages fetched and fetch timeouts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"pages": 0, "feeds": 0, "timeouts": 0}
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+_shared_counters = None
+_shared_lock = threading.Lock()
+
+
+def get_fetch_counters():
+    """Return the process-wide fetch counters."""
+    global _shared_counters
+    with _shared_lock:
+        if _shared_counters is None:
+            _shared_counters = FetchCounters()
+        return _shared_counters
+
+
+def current_rss_mb():
+    """Return this process's resident memory in MB, or None if it can't be read."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        # Peak rather than current, but the best we have without /proc (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if peak > 1 << 30 else peak / 1024
+    return None
+
+
+def process_tree_rss_mb(pid=None):
+    """
+    Return the resident memory in MB of a process and all its descendants.
+
+    This includes the browsers a scraper started. Falls back to
+    current_rss_mb() where /proc isn't available.
+    """
+    pid = os.getpid() if pid is None else pid
+    try:
+        children = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # The command name may contain spaces, so split after its closing paren
+                    parent = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, ValueError, IndexError):
+                continue
+            children.setdefault(parent, []).append(int(entry))
+
+        total = 0.0
+        pending = [pid]
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        while pending:
+            current = pending.pop()
+            try:
+                with open(f'/proc/{current}/statm') as f:
+                    total += int(f.read().split()[1]) * page_size
+            except (OSError, ValueError):
+                pass
+            pending.extend(children.get(current, []))
+        return total / (1024 * 1024)
+    except (OSError, AttributeError):
+        return current_rss_mb()
+
+
+def config_version(settings):
+    """Return a short, stable hash of the settings a run used."""
+    payload = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:12]
+
+
+class RunLedger:
+    """
+    Persisted history of scraper runs, one row per run.
+
+    Each row keeps the headline numbers as columns and the full report,
+    including per-phase timings, as JSON.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.getenv('RUN_HISTORY_DB', os.getenv('RESULTS_DB', 'data/results.sqlite'))
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._lock:
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id TEXT NOT NULL UNIQUE,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    config_version TEXT,
+                    started_at REAL NOT NULL,
+                    finished_at REAL,
+                    seconds REAL,
+                    rows INTEGER,
+                    pages INTEGER,
+                    retries INTEGER,
+                    timeouts INTEGER,
+                    peak_rss_mb REAL,
+                    report TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+            """)
+            self._db.commit()
+
+    def record(self, report):
+        """Store a finished run's report."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO runs (run_id, kind, status, config_version, started_at, finished_at, "
+                "seconds, rows, pages, retries, timeouts, peak_rss_mb, report) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    report["run_id"], report["kind"], report["status"], report["config_version"],
+                    report["started_at"], report["finished_at"], report["seconds"], report["rows"],
+                    report["pages"], report["retries"], report["timeouts"], report["peak_rss_mb"],
+                    json.dumps(report, default=str),
+                )
+            )
+            self._db.commit()
+
+    def get(self, run_id):
+        """Return a run's report, or None. ``latest`` returns the most recent run."""
+        with self._lock:
+            if run_id == "latest":
+                row = self._db.execute("SELECT report FROM runs ORDER BY started_at DESC LIMIT 1").fetchone()
+            else:
+                row = self._db.execute("SELECT report FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def recent(self, limit=20, status=None, before=None, config_version=None):
+        """Return the most recent run reports, newest first."""
+        clauses = []
+        params = []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if before is not None:
+            clauses.append("started_at < ?")
+            params.append(before)
+        if config_version:
+            clauses.append("config_version = ?")
+            params.append(config_version)
+
+        sql = "SELECT report FROM runs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY started_at DESC LIMIT ?"
+        params.append(max(1, min(int(limit), 500)))
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def compare(self, run_id="latest", window=None, threshold=None):
+        """
+        Compare a run against the median of the completed runs before it.
+
+        The baseline prefers runs with the same config version and falls back
+        to any completed runs. A metric is flagged when it is worse than the
+        baseline by more than ``threshold`` (a fraction, 0.2 = 20%).
+        """
+        if window is None:
+            window = int(os.getenv('BASELINE_RUNS', 10))
+        if threshold is None:
+            threshold = float(os.getenv('REGRESSION_THRESHOLD', 0.2))
+
+        run = self.get(run_id)
+        if run is None:
+            return None
+
+        baseline_runs = self.recent(window, status="completed", before=run["started_at"],
+                                    config_version=run["config_version"])
+        same_config = bool(baseline_runs)
+        if not baseline_runs:
+            baseline_runs = self.recent(window, status="completed", before=run["started_at"])
+
+        metrics = {}
+        for name, higher_is_better in _metric_directions(run).items():
+            current = _metric(run, name)
+            history = [value for value in (_metric(past, name) for past in baseline_runs) if value is not None]
+            if current is None or not history:
+                continue
+            baseline = statistics.median(history)
+            change = (current - baseline) / baseline if baseline else None
+            worse = change is not None and (-change if higher_is_better else change) > threshold
+            metrics[name] = {
+                "current": round(current, 3),
+                "baseline": round(baseline, 3),
+                "change": None if change is None else round(change, 3),
+                "regression": worse,
+            }
+
+        return {
+            "run_id": run["run_id"],
+            "config_version": run["config_version"],
+            "baseline_runs": len(baseline_runs),
+            "baseline_same_config": same_config,
+            "threshold": threshold,
+            "regressions": sorted(name for name, metric in metrics.items() if metric["regression"]),
+            "metrics": metrics,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _metric_directions(run):
+    """Return the comparable metrics of a run, mapped to whether higher is better."""
+    directions = {
+        "seconds": False,
+        "pages_per_second": True,
+        "retries_per_page": False,
+        "timeouts": False,
+        "peak_rss_mb": False,
+    }
+    for phase in run.get("phases", {}):
+        directions[f"{phase}.seconds"] = False
+        directions[f"{phase}.rows_per_second"] = True
+    return directions
+
+
+def _metric(run, name):
+    if "." in name:
+        phase, field = name.split(".", 1)
+        return run.get("phases", {}).get(phase, {}).get(field)
+    if name == "pages_per_second":
+        return run["pages"] / run["seconds"] if run.get("seconds") else None
+    if name == "retries_per_page":
+        return run["retries"] / run["pages"] if run.get("pages") else None
+    return run.get(name)
+
+
+class RunRecorder:
+    """
+    Collect one run's performance numbers and write them to the ledger.
+
+    Register ``on_phase`` as a phase hook (or call it directly) for per-phase
+    timings. Pages and timeouts come from the process-wide fetch counters and
+    peak memory from a background sampler.
+    """
+
+    def __init__(self, kind, settings=None, ledger=None, run_id=None, sample_interval=None):
+        if sample_interval is None:
+            sample_interval = float(os.getenv('MEMORY_SAMPLE_SECONDS', 1))
+        self.kind = kind
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.settings = settings or {}
+        self.ledger = ledger
+        self.sample_interval = max(sample_interval, 0.1)
+        self.phases = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self.peak_rss_mb = None
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self._counters_at_start = get_fetch_counters().snapshot()
+        self._sample()
+        self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+        self._sampler.start()
+        return self
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak_rss_mb is None or rss > self.peak_rss_mb):
+            self.peak_rss_mb = rss
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.sample_interval):
+            self._sample()
+
+    def on_phase(self, phase, items, seconds):
+        """Phase hook: add a finished phase's item count and duration."""
+        with self._lock:
+            entry = self.phases.setdefault(phase, {"rows": 0, "seconds": 0.0})
+            entry["rows"] += int(items)
+            entry["seconds"] += float(seconds)
+            entry["rows_per_second"] = round(entry["rows"] / entry["seconds"], 3) if entry["seconds"] else None
+
+    def finish(self, status="completed", rows=None, retries=None, error=None):
+        """Stop sampling, build the report and store it. Returns the report."""
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join(timeout=self.sample_interval + 1)
+        self._sample()
+
+        counters = get_fetch_counters().snapshot()
+        fetched = {name: counters.get(name, 0) - self._counters_at_start.get(name, 0) for name in counters}
+        with self._lock:
+            phases = {phase: dict(entry) for phase, entry in self.phases.items()}
+        if rows is None:
+            # Results rows when details ran, else the largest phase output
+            rows = phases.get("details", {}).get("rows")
+            if rows is None:
+                rows = max((entry["rows"] for entry in phases.values()), default=0)
+
+        report = {
+            "run_id": self.run_id,
+            "kind": self.kind,
+            "status": status,
+            "error": None if error is None else str(error),
+            "config_version": config_version(self.settings),
+            "config": self.settings,
+            "started_at": self.started_at,
+            "finished_at": time.time(),
+            "seconds": round(time.monotonic() - self._started, 3),
+            "phases": phases,
+            "rows": int(rows),
+            "pages": fetched.get("pages", 0) + fetched.get("feeds", 0),
+            "retries": int(retries or 0),
+            "timeouts": fetched.get("timeouts", 0),
+            "peak_rss_mb": None if self.peak_rss_mb is None else round(self.peak_rss_mb, 1),
+        }
+        if self.ledger is not None:
+            try:
+                self.ledger.record(report)
+            except Exception as e:
+                logger.warning(f"Could not record run {self.run_id}: {str(e)}")
+        return report
+
+
+_shared_ledger = None
+
+
+def get_run_ledger():
+    """Return the process-wide run ledger."""
+    global _shared_ledger
+    with _shared_lock:
+        if _shared_ledger is None:
+            _shared_ledger = RunLedger()
+        return _shared_ledger
@@ -1,6 +1,8 @@
 import re
 import time
 import os
+import io
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
@@ -13,112 +15,452 @@ from bs4 import BeautifulSoup
 import requests
 import pandas as pd
 from config import CRAIGSLIST_CITIES, CRAIGSLIST_BASE_URL, KEYWORDS, REMOTE_KEYWORDS, NON_REMOTE_KEYWORDS
-from utils import random_delay, save_to_csv, load_from_csv, remove_duplicates, get_random_user_agent
-import traceback
+from utils import (random_delay, save_to_csv, load_from_csv, remove_duplicates, get_random_user_agent, get_free_port,
+                   is_empty, fill_empty, iter_csv_records, CsvRecordWriter, normalize_post_date, is_stale)
+from pacing import HostPacer, get_shared_pacer, get_shared_breaker
+from feeds import iter_feed_items
+from records import ListingRecord, records_to_dataframe
+from archive import get_page_archive, ReplayDriver
+from retry import RetryPolicy, PermanentError, BlockedError, classify_error
+from budget import JobCancelled
+from search_index import get_result_index
+from stats import get_result_stats
+from query_planner import get_query_planner, category_urls
+from logs import get_logger
+from run_history import get_fetch_counters
+from datetime import datetime, timedelta
+
+logger = get_logger("scraper")
+
+# Signs that Craigslist is blocking or throttling us
+BLOCK_STATUS_CODES = {403, 429, 503}
+BLOCK_INDICATORS = [
+    "ip has been automatically blocked",
+    "please solve the captcha below",
+    "your connection has been limited",
+    "detected unusual activity"
+]
+REMOVED_INDICATORS = [
+    "this posting has been deleted",
+    "this posting has expired",
+    "this posting has been flagged for removal"
+]
+BLOCK_PROBE_CHARS = 5000
+BLOCK_PROBE_SCRIPT = f"""
+var nav = (performance.getEntriesByType && performance.getEntriesByType('navigation')[0]) || {{}};
+return {{
+    status: nav.responseStatus || 0,
+    title: document.title || '',
+    text: document.body ? document.body.textContent.slice(0, {BLOCK_PROBE_CHARS}) : ''
+}};
+"""
+
+# Detail page fields collected in a single script call; returns null when the layout doesn't match
+REPLY_SELECTORS = [
+    "button.reply-button",
+    "button[data-href*='/reply/']",
+    "a.reply-button",
+    "a[href*='/reply/']"
+]
+DETAIL_SCRIPT = """
+var body = document.querySelector("#postingbody, section#postingbody, div[data-testid='postingbody']");
+if (!body) { return null; }
+var reply = null;
+var replySelectors = arguments[0];
+for (var i = 0; i < replySelectors.length; i++) {
+    var el = document.querySelector(replySelectors[i]);
+    if (el && !el.disabled && el.getClientRects().length) { reply = replySelectors[i]; break; }
+}
+return {description: body.innerText.trim(), reply: reply};
+"""
+# Listing description containers, and the print-only parts of them a browser hides
+DESCRIPTION_SELECTORS = "#postingbody, section#postingbody, div[data-testid='postingbody']"
+DESCRIPTION_HIDDEN_SELECTORS = ".print-information, .print-qrcode-container, .print-qrcode-label"
+EMAIL_CONTAINER_SELECTORS = [
+    "div.reply-content-email",
+    "div[class*='reply-email']",
+    "div.reply-info"
+]
+EMAIL_ANCHOR_SELECTORS = [
+    "div.reply-email-address a",
+    "a[href^='mailto:']",
+    "a[class*='email']"
+]
+EMAIL_SCRIPT = """
+var container = null;
+for (var i = 0; i < arguments[0].length && !container; i++) {
+    container = document.querySelector(arguments[0][i]);
+}
+if (!container) { return null; }
+var anchor = null;
+for (var j = 0; j < arguments[1].length && !anchor; j++) {
+    anchor = container.querySelector(arguments[1][j]);
+}
+var webmail = [];
+container.querySelectorAll("a[class*='webmail']").forEach(function (a) {
+    webmail.push({href: a.href, cls: a.className});
+});
+if (!anchor && !webmail.length) { return null; }
+return {
+    anchor: !!anchor,
+    email_text: anchor ? anchor.innerText.trim() : "",
+    email_href: anchor ? anchor.href : "",
+    webmail: webmail
+};
+"""
+
+# Column order of the results file
+RESULT_COLUMNS = [
+    "City", "Title", "Link", "Post Date", "Processed", "Description", "Remote",
+    "Email", "Default Mail", "Gmail", "Yahoo", "Outlook", "AOL"
+]
+
+# Path of the ChromeDriver binary, resolved on the first launch
+_driver_path = None
+
+def create_chrome_driver(use_headless=False):
+    """Start and return a Chrome WebDriver with its own debugging port."""
+    try:
+        chrome_options = Options()
+        if use_headless:
+            chrome_options.add_argument("--headless=new")  # Updated for newer Chrome versions
+    
+        # Add additional Chrome options for stability
+        chrome_options.add_argument("--window-size=1920,1080")
+        chrome_options.add_argument("--disable-notifications")
+        chrome_options.add_argument("--disable-infobars")
+        chrome_options.add_argument("--disable-extensions")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument(f"--remote-debugging-port={get_free_port()}")  # Unique port per browser
+        chrome_options.add_argument("--disable-blink-features=AutomationControlled")  # Hide automation
+    
+        # Add user agent
+        chrome_options.add_argument(f"user-agent={get_random_user_agent()}")
+    
+        logger.info("Setting up ChromeDriver...")
+    
+        # Use webdriver_manager with specific version
+        from webdriver_manager.chrome import ChromeDriverManager
+        from selenium.webdriver.chrome.service import Service
+    
+        # Get Chrome version
+        try:
+            import subprocess
+            chrome_version = subprocess.check_output(
+                ['reg', 'query', 'HKEY_CURRENT_USER\\Software\\Google\\Chrome\\BLBeacon', '/v', 'version'],
+                stderr=subprocess.DEVNULL,
+                stdin=subprocess.DEVNULL
+            ).decode('UTF-8').strip().split()[-1]
+            logger.info(f"Detected Chrome version: {chrome_version}")
+        except:
+            logger.info("Could not detect Chrome version, using default driver")
+            chrome_version = None
+    
+        # Install ChromeDriver once per process; resolving it on every launch costs seconds
+        global _driver_path
+        if _driver_path is None:
+            driver_manager = ChromeDriverManager()
+            _driver_path = driver_manager.install()
+            logger.info(f"ChromeDriver installed at: {_driver_path}")
+        driver_path = _driver_path
+    
+        service = Service(driver_path)
+    
+        # Create driver with increased timeout
+        driver = webdriver.Chrome(
+            service=service,
+            options=chrome_options
+        )
+    
+        # Set page load timeout
+        driver.set_page_load_timeout(30)
+        logger.info("Chrome WebDriver initialized successfully")
+        return driver
+    
+    except Exception as e:
+        logger.exception(f"Error setting up Chrome WebDriver: {str(e)}")
+        raise
 
 class CraigslistScraper:
-    def __init__(self):
+    def __init__(self, browser=None):
         self.use_headless = os.getenv('USE_HEADLESS', 'false').lower() == 'true'
-        self.driver = self._setup_driver()
+        self.replay = os.getenv('REPLAY_ARCHIVE', 'false').lower() == 'true'
+        self.archive = None
+        if self.replay or os.getenv('ARCHIVE_PAGES', 'false').lower() == 'true':
+            self.archive = get_page_archive()
+        # Phase 2 backend: "browser" loads every listing in Chrome; "http" fetches
+        # descriptions over keep-alive HTTP and uses the browser only for the reply step
+        self.detail_backend = os.getenv('DETAIL_BACKEND', 'browser').lower()
+        # A browser leased from a pool is handed back on close instead of quit
+        self.browser = None if self.replay else browser
+        if self.replay:
+            self.driver = ReplayDriver(self.archive)
+        elif browser is not None:
+            self.use_headless = browser.headless
+            self.driver = browser.driver
+        elif self.detail_backend == 'http':
+            # Started on first use, so description-only runs never launch Chrome
+            self.driver = None
+        else:
+            self.driver = self._setup_driver()
         self.links_file = os.getenv('LINKS_FILE', 'output/links.csv')
+        self.cleaned_file = os.getenv('CLEANED_LINKS_FILE', self.links_file)
         self.output_file = os.getenv('OUTPUT_FILE', 'output/results.csv')
         self.batch_size = int(os.getenv('BATCH_SIZE', 10))
         self.max_retries = int(os.getenv('MAX_RETRIES', 3))
+        self.max_pages = int(os.getenv('MAX_PAGES_PER_CITY', 5))
+        self.chunk_size = int(os.getenv('CHUNK_SIZE', 500))
+        # Listings older than this are skipped and end a city's pagination; 0 disables the cutoff
+        max_age_hours = float(os.getenv('MAX_AGE_HOURS', 0))
+        self.max_age = timedelta(hours=max_age_hours) if max_age_hours > 0 else None
+        # Replayed pages never touch the network, so they are not paced
+        self.pacer = HostPacer(min_interval=0, jitter=0) if self.replay else get_shared_pacer()
+        self.breaker = get_shared_breaker()
+        self.retry = RetryPolicy(max_attempts=self.max_retries, sleep=self._politeness_sleep)
+        self.last_load_error = None
+        # Set by the job runner; checked in the scraping loops to stop cleanly
+        self.cancel_token = None
+        self.discovery_backend = os.getenv('DISCOVERY_BACKEND', 'browser').lower()
+        # Picks category crawl or keyword searches per city; DISCOVERY_PLAN=crawl keeps the full crawl
+        self.planner = get_query_planner()
+        self.scrape_emails = os.getenv('SCRAPE_EMAILS', 'true').lower() == 'true'
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = get_random_user_agent()
+        
+        # Callbacks that receive every finished result record
+        self.result_hooks = []
+        if os.getenv('SEARCH_INDEX', 'true').lower() == 'true':
+            self.result_hooks.append(get_result_index().add)
         
+        # Callbacks that receive (phase, items, seconds) when a phase finishes
+        self.phase_hooks = []
+        if os.getenv('RESULT_STATS', 'true').lower() == 'true':
+            self.result_hooks.append(get_result_stats().add)
+            self.phase_hooks.append(get_result_stats().record_phase)
+        
+    @property
+    def driver(self):
+        """The browser, started on first use when it wasn't needed up front."""
+        if self._driver is None and not self._closed:
+            self._driver = self._setup_driver()
+        return self._driver
+    
+    @driver.setter
+    def driver(self, value):
+        self._driver = value
+        self._closed = False
+    
     def _setup_driver(self):
         """Set up and return a Chrome WebDriver instance."""
+        return create_chrome_driver(self.use_headless)
+    
+    def _renew_browser(self):
+        """Swap a leased browser over its page or memory limit for a fresh one before the next page."""
+        browser = self.browser.pool.renew(self.browser)
+        if browser is not self.browser:
+            self.browser = browser
+            self.driver = browser.driver
+    
+    def _politeness_delay(self, min_delay=None, max_delay=None):
+        """Sleep between requests, except when replaying archived pages."""
+        if self.replay:
+            return 0
+        return random_delay(min_delay, max_delay, sleep=self._politeness_sleep)
+
+    def _politeness_sleep(self, seconds):
+        """Sleep for a fixed time, except when replaying archived pages. Cancelling the job cuts it short."""
+        if self.replay or seconds <= 0:
+            return
+        if self.cancel_token is not None:
+            self.cancel_token.wait(seconds)
+        else:
+            time.sleep(seconds)
+
+    def _check_cancelled(self):
+        """Raise JobCancelled if the job was stopped or went over its budget."""
+        if self.cancel_token is not None:
+            self.cancel_token.check(retries=self.retry.stats["retries"])
+
+    def _batch_delay(self):
+        """Apply the longer delay between batches of listings."""
+        min_batch_delay = float(os.getenv('MIN_DELAY_BETWEEN_BATCHES', 15))
+        max_batch_delay = float(os.getenv('MAX_DELAY_BETWEEN_BATCHES', 30))
+        return self._politeness_delay(min_batch_delay, max_batch_delay)
+
+    def _load_page(self, url):
+        """Load a page once, raising a classified error if it can't be used."""
+        self._check_cancelled()
+        
+        # Skip hosts that recently blocked us; other hosts carry on
+        if self.breaker.is_open(url):
+            raise BlockedError(f"Host paused after blocking: {url}")
+        
+        # Only the outgoing request is paced, per host
+        self.pacer.wait(url)
+        counters = get_fetch_counters()
+        counters.incr("pages")
+        if self.browser is not None:
+            self._renew_browser()
+            self.browser.pages += 1
         try:
-            chrome_options = Options()
-            if self.use_headless:
-                chrome_options.add_argument("--headless=new")  # Updated for newer Chrome versions
-            
-            # Add additional Chrome options for stability
-            chrome_options.add_argument("--window-size=1920,1080")
-            chrome_options.add_argument("--disable-notifications")
-            chrome_options.add_argument("--disable-infobars")
-            chrome_options.add_argument("--disable-extensions")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--remote-debugging-port=9222")  # Add debugging port
-            chrome_options.add_argument("--disable-blink-features=AutomationControlled")  # Hide automation
-            
-            # Add user agent
-            chrome_options.add_argument(f"user-agent={get_random_user_agent()}")
-            
-            print("Setting up ChromeDriver...")
-            
-            # Use webdriver_manager with specific version
-            from webdriver_manager.chrome import ChromeDriverManager
-            from selenium.webdriver.chrome.service import Service
-            
-            # Get Chrome version
-            try:
-                import subprocess
-                chrome_version = subprocess.check_output(
-                    ['reg', 'query', 'HKEY_CURRENT_USER\\Software\\Google\\Chrome\\BLBeacon', '/v', 'version'],
-                    stderr=subprocess.DEVNULL,
-                    stdin=subprocess.DEVNULL
-                ).decode('UTF-8').strip().split()[-1]
-                print(f"Detected Chrome version: {chrome_version}")
-            except:
-                print("Could not detect Chrome version, using default driver")
-                chrome_version = None
-            
-            # Install ChromeDriver
-            driver_manager = ChromeDriverManager()
-            if chrome_version:
-                driver_path = driver_manager.install()
-                print(f"ChromeDriver installed at: {driver_path}")
-            else:
-                driver_path = driver_manager.install()
-                print(f"ChromeDriver installed at: {driver_path}")
-            
-            service = Service(driver_path)
-            
-            # Create driver with increased timeout
-            driver = webdriver.Chrome(
-                service=service,
-                options=chrome_options
+            self.driver.get(url)
+            # Wait for page to be loaded
+            WebDriverWait(self.driver, 10).until(
+                lambda driver: driver.execute_script("return document.readyState") == "complete"
             )
-            
-            # Set page load timeout
-            driver.set_page_load_timeout(30)
-            print("Chrome WebDriver initialized successfully")
-            return driver
-            
-        except Exception as e:
-            print(f"Error setting up Chrome WebDriver: {str(e)}")
-            print("Full error details:", traceback.format_exc())
+        except TimeoutException:
+            counters.incr("timeouts")
             raise
-    
-    def _load_page_with_retry(self, url, max_retries=3):
-        """Load a page with retries for reliability."""
-        for attempt in range(max_retries):
-            try:
-                self.driver.get(url)
-                # Wait for page to be loaded
-                WebDriverWait(self.driver, 10).until(
-                    lambda driver: driver.execute_script("return document.readyState") == "complete"
-                )
-                return True
-            except Exception:
-                if attempt < max_retries - 1:
-                    random_delay(3, 5)  # Longer delay between retries
         
-        return False
+        probe = self._probe_page()
+        
+        # Check if we're being blocked
+        reason = self._check_for_blocking(probe)
+        if reason:
+            self.breaker.record_block(url, reason)
+            raise BlockedError(reason)
+        self.breaker.record_success(url)
+        
+        # Deleted, expired and missing postings will never load
+        if self._check_for_removed(probe):
+            raise PermanentError(f"Posting removed: {url}")
+        
+        self._archive_page(url)
 
-    def _has_keyword(self, text):
-        """Check if the text contains any of the keywords defined in config.py."""
-        if not text:
+    def _load_page_with_retry(self, url, max_retries=None):
+        """Load a page through the shared retry policy. Returns True on success."""
+        if self.replay:
+            max_retries = 1
+        
+        try:
+            self.retry.run(self._load_page, url, max_attempts=max_retries)
+            self.last_load_error = None
+            return True
+        except Exception as e:
+            self.last_load_error = classify_error(e)
             return False
-            
-        text = text.lower()
-        for keyword in KEYWORDS:
-            if keyword.lower() in text:
-                return True
-        return False
+
+    def _fetch_listing_html(self, url):
+        """Fetch a listing page over HTTP once, raising a classified error if it can't be used."""
+        self._check_cancelled()
+        if self.replay:
+            content = self.archive.get(url)
+            if content is None:
+                raise KeyError(url)
+            return content
+        
+        if self.breaker.is_open(url):
+            raise BlockedError(f"Host paused after blocking: {url}")
+        
+        self.pacer.wait(url)
+        counters = get_fetch_counters()
+        counters.incr("pages")
+        try:
+            response = self.session.get(url, timeout=30)
+        except requests.exceptions.Timeout:
+            counters.incr("timeouts")
+            raise
+        if response.status_code in BLOCK_STATUS_CODES:
+            self.breaker.record_block(url, f"HTTP {response.status_code}")
+            raise BlockedError(f"HTTP {response.status_code}")
+        if response.status_code in (404, 410):
+            raise PermanentError(f"Posting removed: {url}")
+        response.raise_for_status()
+        
+        text = response.text.lower()
+        for indicator in BLOCK_INDICATORS:
+            if indicator in text:
+                self.breaker.record_block(url, indicator)
+                raise BlockedError(indicator)
+        self.breaker.record_success(url)
+        
+        if any(indicator in text for indicator in REMOVED_INDICATORS):
+            raise PermanentError(f"Posting removed: {url}")
         
+        self._archive_page(url, response.content)
+        return response.content
+
+    @staticmethod
+    def _parse_description(html):
+        """Return the description text of a listing page, or None if the page has none."""
+        soup = BeautifulSoup(html, 'lxml')
+        body = soup.select_one(DESCRIPTION_SELECTORS)
+        if body is None:
+            return None
+        for hidden in body.select(DESCRIPTION_HIDDEN_SELECTORS):
+            hidden.decompose()
+        for br in body.find_all('br'):
+            br.replace_with("\n")
+        return body.get_text().strip()
+
+    def _load_description(self, url):
+        """
+        Fetch a listing's description over HTTP through the shared retry policy.
+        
+        Returns the description, "Description Not Found" when the page has
+        none, or None when the page couldn't be loaded.
+        """
+        try:
+            html = self.retry.run(self._fetch_listing_html, url, max_attempts=1 if self.replay else None)
+            self.last_load_error = None
+        except Exception as e:
+            self.last_load_error = classify_error(e)
+            return None
+        description = self._parse_description(html)
+        return "Description Not Found" if description is None else description
+
+    def _archive_page(self, url, content=None):
+        """Store a fetched page in the archive, when archiving is enabled."""
+        if self.archive is None or self.replay:
+            return
+        try:
+            if content is None:
+                content = self.driver.page_source
+            self.archive.put(url, content)
+        except Exception:
+            pass
+
+    def _open_feed(self, url):
+        """Fetch a feed and return a readable stream of its body."""
+        self._check_cancelled()
+        if self.replay:
+            content = self.archive.get(url)
+            if content is None:
+                raise KeyError(url)
+            return io.BytesIO(content)
+        
+        return self.retry.run(self._fetch_feed, url)
+
+    def _fetch_feed(self, url):
+        """Fetch a feed once, raising a classified error if it can't be used."""
+        if self.breaker.is_open(url):
+            raise BlockedError(f"Host paused after blocking: {url}")
+        
+        self.pacer.wait(url)
+        counters = get_fetch_counters()
+        counters.incr("feeds")
+        try:
+            response = self.session.get(url, timeout=30, stream=True)
+        except requests.exceptions.Timeout:
+            counters.incr("timeouts")
+            raise
+        if response.status_code in BLOCK_STATUS_CODES:
+            response.close()
+            self.breaker.record_block(url, f"HTTP {response.status_code}")
+            raise BlockedError(f"HTTP {response.status_code}")
+        response.raise_for_status()
+        self.breaker.record_success(url)
+        
+        if self.archive is not None:
+            content = response.content
+            self._archive_page(url, content)
+            return io.BytesIO(content)
+        
+        response.raw.decode_content = True
+        return response.raw
+
     def _check_remote_status(self, text):
         """Check if the job is remote, non-remote, or not specified."""
         if not text:
@@ -138,10 +480,8 @@ class CraigslistScraper:
 
     def _notify_user_for_captcha(self):
         """Notify the user that CAPTCHA solving is needed."""
-        print("=" * 50)
-        print("CAPTCHA DETECTED! Please solve the CAPTCHA in the browser window.")
-        print("The script will continue automatically after CAPTCHA is solved.")
-        print("=" * 50)
+        logger.warning("CAPTCHA DETECTED! Please solve the CAPTCHA in the browser window. "
+                       "The script will continue automatically after CAPTCHA is solved.")
         
         # Try to make a sound alert
         try:
@@ -153,179 +493,436 @@ class CraigslistScraper:
             # For non-Windows systems, print bell character
             print("\a")
 
-    def _check_for_blocking(self):
-        """Check if Craigslist is blocking or throttling our requests."""
+    def _probe_page(self):
+        """
+        Return the navigation status and the start of the page text.
+        
+        Reads both in one script call instead of pulling the whole page source.
+        """
         try:
-            # Look for common block indicators
-            block_indicators = [
-                "IP has been automatically blocked",
-                "please solve the CAPTCHA below",
-                "your connection has been limited",
-                "detected unusual activity"
-            ]
-            
-            page_source = self.driver.page_source.lower()
+            probe = self.driver.execute_script(BLOCK_PROBE_SCRIPT)
+            if isinstance(probe, dict):
+                status = int(probe.get('status') or 0)
+                text = f"{probe.get('title') or ''} {probe.get('text') or ''}".lower()
+                return status, text
             
-            for indicator in block_indicators:
-                if indicator.lower() in page_source:
-                    time.sleep(120)
-                    return True
-                    
-            return False
+            # Drivers without script support (archive replay) expose the source locally
+            return 0, (self.driver.page_source or "")[:BLOCK_PROBE_CHARS].lower()
         except:
-            return False
+            return 0, ""
 
-    def scrape_listings(self, max_listings=None):
+    def _check_for_blocking(self, probe=None):
         """
-        PHASE 1: Scrape job listings from Craigslist.
+        Check if Craigslist is blocking or throttling our requests.
+        
+        Returns a short reason when the page looks blocked, otherwise None.
         """
-        all_listings = []
+        status, text = probe or self._probe_page()
         
-        for city in CRAIGSLIST_CITIES:
-            url = CRAIGSLIST_BASE_URL.format(city)
-            
-            if not self._load_page_with_retry(url):
-                continue
+        if status in BLOCK_STATUS_CODES:
+            return f"HTTP {status}"
+        
+        for indicator in BLOCK_INDICATORS:
+            if indicator in text:
+                return indicator
                 
-            # Check if we're being blocked
-            if self._check_for_blocking():
-                pass
-            
-            random_delay()
-            
-            # Wait for the results to load - try multiple possible class names
+        return None
+
+    def _check_for_removed(self, probe=None):
+        """Check if the page is a missing, deleted or expired posting."""
+        status, text = probe or self._probe_page()
+        
+        if status in (404, 410):
+            return True
+        
+        return any(indicator in text for indicator in REMOVED_INDICATORS)
+
+    def _find_listing_elements(self):
+        """Wait for the search results and return the listing elements on the page."""
+        # Wait for the results to load - try multiple possible class names
+        try:
+            WebDriverWait(self.driver, 10).until(
+                EC.presence_of_element_located((By.CLASS_NAME, "result-info"))
+            )
+        except:
+            # Try alternative class name if the first one fails
             try:
                 WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, "result-info"))
+                    EC.presence_of_element_located((By.CLASS_NAME, "cl-static-search-result"))
                 )
             except:
-                # Try alternative class name if the first one fails
-                try:
-                    WebDriverWait(self.driver, 10).until(
-                        EC.presence_of_element_located((By.CLASS_NAME, "cl-static-search-result"))
-                    )
-                except:
-                    pass
-            
-            # Try different ways to get listings
-            listing_elements = []
-            selectors_to_try = [
-                "div.result-info",
-                "li.cl-static-search-result",
-                "div.cl-search-result"
-            ]
-            
-            for selector in selectors_to_try:
-                elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                if elements:
-                    listing_elements = elements
+                pass
+        
+        # Try different ways to get listings
+        selectors_to_try = [
+            "div.result-info",
+            "li.cl-static-search-result",
+            "div.cl-search-result"
+        ]
+        
+        for selector in selectors_to_try:
+            elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+            if elements:
+                return elements
+        
+        return []
+
+    def _parse_listing_element(self, element, city):
+        """Extract title, link and post date from a search result element."""
+        # Try different ways to find title and link
+        title_element = None
+        title_selectors = [
+            "a.posting-title", 
+            "a.title", 
+            "a.cl-app-anchor",
+            "a[data-testid='listing-title']"
+        ]
+        
+        for selector in title_selectors:
+            try:
+                title_element = element.find_element(By.CSS_SELECTOR, selector)
+                if title_element:
                     break
-            
-            if not listing_elements:
+            except:
                 continue
-            
-            for element in listing_elements:
-                # Check if we've reached the max_listings limit
-                if max_listings is not None and len(all_listings) >= max_listings:
+        
+        if not title_element:
+            return None
+        
+        title = title_element.text.strip()
+        link = title_element.get_attribute("href")
+        
+        # Try different ways to find post date
+        date_element = None
+        date_selectors = [
+            "div.meta > span:first-child",
+            "time",
+            "span[data-testid='listing-date']",
+            "span.date"
+        ]
+        
+        for selector in date_selectors:
+            try:
+                date_element = element.find_element(By.CSS_SELECTOR, selector)
+                if date_element:
                     break
+            except:
+                continue
+        
+        post_date = "Unknown"
+        if date_element:
+            # The machine-readable attribute first, then the tooltip, then the visible text
+            post_date = (date_element.get_attribute("datetime") or date_element.get_attribute("title")
+                         or date_element.text.strip() or "Unknown")
+            post_date = normalize_post_date(post_date)
+        
+        return ListingRecord({
+            "City": city,
+            "Title": title,
+            "Link": link,
+            "Post Date": post_date,
+            "Processed": False
+        })
+
+    def _next_page_url(self, url, offset):
+        """Return the URL of the next search results page."""
+        # Prefer the page's own "next" link when there is one
+        for selector in ["a.button.next", "a.next", "link[rel='next']"]:
+            try:
+                href = self.driver.find_element(By.CSS_SELECTOR, selector).get_attribute("href")
+                if href and not href.endswith("#") and href != url:
+                    return href
+            except:
+                continue
+        
+        # Otherwise page through with the result offset parameter
+        return self._with_query(url, s=offset)
+
+    @staticmethod
+    def _with_query(url, **params):
+        """Return the URL with the given query parameters set."""
+        parts = urlparse(url)
+        query = dict(parse_qsl(parts.query))
+        query.update({key: str(value) for key, value in params.items()})
+        return urlunparse(parts._replace(query=urlencode(query), fragment=""))
+
+    def _matching_keywords(self, text):
+        """Return the keywords found in the text."""
+        if not text:
+            return []
+        text = text.lower()
+        return [keyword for keyword in KEYWORDS if keyword.lower() in text]
+
+    def _plan_city(self, city, max_pages, base_url=None):
+        """Return the search URLs to crawl for a city's category: all of it or server-side keyword queries."""
+        base_url = base_url or CRAIGSLIST_BASE_URL
+        if self.planner is None:
+            return "crawl", [base_url.format(city)]
+        plan = self.planner.plan(city, KEYWORDS, max_pages, base_url)
+        return plan["strategy"], plan["urls"]
+
+    def _record_city(self, city, strategy, pages, listings, keyword_hits, base_url=None, complete=True):
+        """Feed what a city's crawl of a category cost and found back into the query planner."""
+        if self.planner is None or not pages:
+            return
+        try:
+            self.planner.record(city, strategy, pages, listings, keyword_hits, base_url, complete=complete)
+        except Exception as e:
+            logger.warning(f"Could not record query plan history for {city}: {str(e)}")
+
+    def _crawl_targets(self, max_pages, cities=None):
+        """
+        Yield (city, category URL, strategy, start URLs) for the whole city x category matrix.
+        
+        Categories of a city are crawled back to back, so every request to a
+        city's host goes through the same pacer slot.
+        """
+        categories = category_urls()
+        for city in (CRAIGSLIST_CITIES if cities is None else cities):
+            for base_url in categories:
+                strategy, start_urls = self._plan_city(city, max_pages, base_url)
+                yield city, base_url, strategy, start_urls
+
+    def iter_feed_listings(self, max_listings=None, max_pages=None, cities=None):
+        """
+        PHASE 1 (feed backend): Yield keyword-matching listings from each city's RSS feed.
+        
+        Feeds are fetched over HTTP and parsed as a stream, no browser involved.
+        When the feed carries a description it is included, so Phase 2 can skip
+        the description lookup for that listing.
+        """
+        if max_pages is None:
+            max_pages = self.max_pages
+        
+        found = 0
+        now = datetime.now()
+        
+        # Shared by every query and category of a city, so overlaps yield each listing once
+        seen_links = set()
+        current_city = None
+        
+        for city, base_url, strategy, start_urls in self._crawl_targets(max_pages, cities):
+            if city != current_city:
+                current_city = city
+                seen_links = set()
+            # Listings this category returned, including ones another category already yielded
+            target_links = set()
+            keyword_hits = {}
+            pages = 0
+            # Whether every start URL was read to its last page
+            complete = True
+            
+            for start_url in start_urls:
+                offset = 0
+                ended = False
+                
+                for page in range(max_pages):
+                    url = self._with_query(start_url, format="rss")
+                    if offset:
+                        url = self._with_query(url, s=offset)
                     
-                try:
-                    # Try different ways to find title and link
-                    title_element = None
-                    title_selectors = [
-                        "a.posting-title", 
-                        "a.title", 
-                        "a.cl-app-anchor",
-                        "a[data-testid='listing-title']"
-                    ]
-                    
-                    for selector in title_selectors:
-                        try:
-                            title_element = element.find_element(By.CSS_SELECTOR, selector)
-                            if title_element:
-                                break
-                        except:
-                            continue
+                    try:
+                        stream = self._open_feed(url)
+                    except Exception:
+                        break
+                    pages += 1
                     
-                    if not title_element:
-                        continue
+                    items = 0
+                    new_links = 0
+                    page_ends_stale = False
+                    read_failed = False
+                    try:
+                        for item in iter_feed_items(stream):
+                            items += 1
+                            if not item['link'] or item['link'] in target_links:
+                                continue
+                            target_links.add(item['link'])
+                            new_links += 1
+                            
+                            page_ends_stale = is_stale(item['date'], self.max_age, now)
+                            if page_ends_stale or item['link'] in seen_links:
+                                continue
+                            seen_links.add(item['link'])
+                            
+                            matches = self._matching_keywords(item['title'])
+                            if not matches:
+                                continue
+                            for keyword in matches:
+                                keyword_hits[keyword] = keyword_hits.get(keyword, 0) + 1
+                            
+                            listing = ListingRecord({
+                                "City": city,
+                                "Title": item['title'],
+                                "Link": item['link'],
+                                "Post Date": normalize_post_date(item['date']) or "Unknown",
+                                "Processed": False
+                            })
+                            if item['description']:
+                                listing['Description'] = item['description']
+                            
+                            yield listing
+                            found += 1
+                            
+                            if max_listings is not None and found >= max_listings:
+                                return
+                    except Exception:
+                        read_failed = True
+                    finally:
+                        stream.close()
                     
-                    title = title_element.text.strip()
-                    link = title_element.get_attribute("href")
+                    if new_links == 0:
+                        ended = not read_failed
+                        break
+                    # Newest first: once a page ends past the cutoff, later pages are older still
+                    if page_ends_stale:
+                        break
+                    offset += items
+                complete = complete and ended
+            
+            # Only complete crawls say how big the category is; an early stop would understate it
+            self._record_city(city, strategy, pages, len(target_links), keyword_hits, base_url, complete)
+
+    def iter_listings(self, max_listings=None, max_pages=None, cities=None):
+        """
+        PHASE 1: Yield keyword-matching listings city by city, following pagination.
+        
+        Every configured category of a city is crawled with the plan the query
+        planner picks: the whole category, or server-side keyword searches. A
+        listing posted in several categories is yielded once. Fetching stops as soon as
+        ``max_listings`` listings have been yielded.
+        """
+        if self.discovery_backend == 'feed':
+            yield from self.iter_feed_listings(max_listings=max_listings, max_pages=max_pages, cities=cities)
+            return
+        
+        if max_pages is None:
+            max_pages = self.max_pages
+        
+        found = 0
+        now = datetime.now()
+        
+        # Shared by every query and category of a city, so overlaps yield each listing once
+        seen_links = set()
+        current_city = None
+        
+        for city, base_url, strategy, start_urls in self._crawl_targets(max_pages, cities):
+            if city != current_city:
+                current_city = city
+                seen_links = set()
+            # Listings this category returned, including ones another category already yielded
+            target_links = set()
+            keyword_hits = {}
+            pages = 0
+            # Whether every start URL was read to its last page
+            complete = True
+            
+            for url in start_urls:
+                offset = 0
+                ended = False
+                
+                for page in range(max_pages):
+                    if not self._load_page_with_retry(url):
+                        break
+                    pages += 1
                     
-                    # Try different ways to find post date
-                    date_element = None
-                    date_selectors = [
-                        "div.meta > span:first-child",
-                        "time",
-                        "span[data-testid='listing-date']",
-                        "span.date"
-                    ]
+                    listing_elements = self._find_listing_elements()
+                    if not listing_elements:
+                        ended = True
+                        break
                     
-                    for selector in date_selectors:
+                    new_links = 0
+                    page_ends_stale = False
+                    for element in listing_elements:
                         try:
-                            date_element = element.find_element(By.CSS_SELECTOR, selector)
-                            if date_element:
-                                break
-                        except:
+                            listing = self._parse_listing_element(element, city)
+                        except Exception:
                             continue
+                        
+                        if listing is None or listing['Link'] in target_links:
+                            continue
+                        target_links.add(listing['Link'])
+                        new_links += 1
+                        
+                        # Listings older than max_age never reach Phase 2
+                        page_ends_stale = is_stale(listing['Post Date'], self.max_age, now)
+                        if page_ends_stale or listing['Link'] in seen_links:
+                            continue
+                        seen_links.add(listing['Link'])
+                        
+                        # Check if the title contains any of our keywords
+                        matches = self._matching_keywords(listing['Title'])
+                        if matches:
+                            for keyword in matches:
+                                keyword_hits[keyword] = keyword_hits.get(keyword, 0) + 1
+                            yield listing
+                            found += 1
+                            
+                            # Stop fetching once we've reached the max_listings limit
+                            if max_listings is not None and found >= max_listings:
+                                return
                     
-                    post_date = "Unknown"
-                    if date_element:
-                        post_date = date_element.get_attribute("title") or date_element.text.strip()
+                    # A page with nothing new means we've run past the last page
+                    if new_links == 0:
+                        ended = True
+                        break
                     
-                    # Check if the title contains any of our keywords
-                    if self._has_keyword(title):
-                        all_listings.append({
-                            "City": city,
-                            "Title": title,
-                            "Link": link,
-                            "Post Date": post_date,
-                            "Processed": False
-                        })
-                except Exception:
-                    pass
-                
-                random_delay(0.5, 1.5)  # Short delay between processing each listing
-                
-            # Check if we've reached the max_listings limit
-            if max_listings is not None and len(all_listings) >= max_listings:
-                break
-                
-            # Random delay between cities
-            min_city_delay = float(os.getenv('MIN_DELAY_BETWEEN_CITIES', 5))
-            max_city_delay = float(os.getenv('MAX_DELAY_BETWEEN_CITIES', 10))
-            random_delay(min_city_delay, max_city_delay)
+                    # Results are newest first, so a page ending past the cutoff is the last useful one
+                    if page_ends_stale:
+                        break
+                    
+                    offset += len(listing_elements)
+                    url = self._next_page_url(url, offset)
+                complete = complete and ended
+            
+            # Only complete crawls say how big the category is; an early stop would understate it
+            self._record_city(city, strategy, pages, len(target_links), keyword_hits, base_url, complete)
+
+    def scrape_listings(self, max_listings=None, max_pages=None):
+        """
+        PHASE 1: Scrape job listings from Craigslist.
+        """
+        started = time.monotonic()
+        all_listings = []
+        try:
+            for listing in self.iter_listings(max_listings=max_listings, max_pages=max_pages):
+                all_listings.append(listing)
+        except JobCancelled:
+            # Keep what was found so far
+            if all_listings:
+                save_to_csv(records_to_dataframe(all_listings), self.links_file)
+            raise
+        self._report_phase("listings", len(all_listings), started)
         
         # Save the listings to CSV
         if all_listings:
-            df = save_to_csv(all_listings, self.links_file)
+            df = save_to_csv(records_to_dataframe(all_listings), self.links_file)
             return df
         else:
             return pd.DataFrame()
 
+    @staticmethod
+    def normalize_title(title):
+        """Normalize titles by removing emojis, extra spaces, and lowercasing"""
+        # Remove emojis and special characters
+        title = re.sub(r'[^\x00-\x7F]+', '', title)
+        # Remove extra spaces
+        title = re.sub(r'\s+', ' ', title)
+        # Lowercase
+        return title.lower().strip()
+
     def clean_listings(self, df=None):
         """
         PHASE 2 - STEP 1: Remove duplicate listings with the same title.
         """
+        started = time.monotonic()
         if df is None:
             df = load_from_csv(self.links_file)
             
         if df.empty:
             return df
         
-        # Clean up titles to improve duplicate detection
-        def normalize_title(title):
-            """Normalize titles by removing emojis, extra spaces, and lowercasing"""
-            # Remove emojis and special characters
-            title = re.sub(r'[^\x00-\x7F]+', '', title)
-            # Remove extra spaces
-            title = re.sub(r'\s+', ' ', title)
-            # Lowercase
-            return title.lower().strip()
-        
         # Add normalized title for comparison
-        df['NormalizedTitle'] = df['Title'].apply(normalize_title)
+        df['NormalizedTitle'] = df['Title'].apply(self.normalize_title)
         
         # Remove duplicates based on normalized title
         df = df.drop_duplicates(subset=['NormalizedTitle'])
@@ -333,8 +930,14 @@ class CraigslistScraper:
         # Drop the temporary column used for normalization
         df = df.drop(columns=['NormalizedTitle'])
         
+        # Listings can age past the cutoff between discovery and Phase 2
+        if self.max_age and 'Post Date' in df.columns:
+            now = datetime.now()
+            df = df[~df['Post Date'].apply(lambda value: is_stale(value, self.max_age, now))]
+        
         # Save the cleaned listings back to CSV
-        save_to_csv(df, self.links_file)
+        save_to_csv(df, self.cleaned_file)
+        self._report_phase("clean", len(df), started)
         
         return df
         
@@ -354,163 +957,252 @@ class CraigslistScraper:
         
         return df_copy
 
-    def scrape_details(self, df=None, start_index=0, max_listings=None):
-        """
-        PHASE 2 - STEP 2: Visit each listing and extract email, description, and remote status.
-        """
-        if df is None:
-            df = load_from_csv(self.links_file)
+    def _report_phase(self, phase, items, started):
+        """Pass a finished phase's item count and duration to every phase hook."""
+        elapsed = time.monotonic() - started
+        for hook in self.phase_hooks:
+            try:
+                hook(phase, items, elapsed)
+            except Exception as e:
+                logger.warning(f"Phase hook failed: {str(e)}")
+
+    def _emit_result(self, record):
+        """Pass a finished result record to every registered hook."""
+        for hook in self.result_hooks:
+            try:
+                hook(record)
+            except Exception as e:
+                logger.warning(f"Result hook failed: {str(e)}")
+
+    def _extract_detail_bundle(self):
+        """Return the description and clickable reply selector in one script call, or None."""
+        try:
+            bundle = self.driver.execute_script(DETAIL_SCRIPT, REPLY_SELECTORS)
+        except Exception:
+            return None
+        if isinstance(bundle, dict) and isinstance(bundle.get('description'), str):
+            return bundle
+        return None
+
+    def _extract_email_bundle(self, timeout=10):
+        """Wait for the reply email panel and read all its fields in one script call, or None."""
+        try:
+            bundle = WebDriverWait(self.driver, timeout).until(
+                lambda driver: driver.execute_script(EMAIL_SCRIPT, EMAIL_CONTAINER_SELECTORS, EMAIL_ANCHOR_SELECTORS)
+            )
+        except Exception:
+            return None
+        return bundle if isinstance(bundle, dict) else None
+
+    def _apply_email_bundle(self, listing_data, bundle):
+        """Map the reply email panel fields onto the listing."""
+        if bundle.get('anchor'):
+            # Try to get email from text first, then from the mailto: link
+            email = (bundle.get('email_text') or "").strip()
+            href = bundle.get('email_href') or ""
             
-        if df.empty:
-            return pd.DataFrame()
+            if href.startswith("mailto:"):
+                # Store the complete mailto: URL
+                listing_data['Default Mail'] = href
+                if not email or '@' not in email:
+                    email = href.replace("mailto:", "").split("?")[0]
             
-        results = []
-        total = len(df)
+            listing_data['Email'] = email
         
-        # Handle start_index and max_listings
-        if start_index > 0:
-            if start_index >= total:
-                return pd.DataFrame()
-            
-            # Keep the original dataframe reference for correct indexing
-            filtered_df = df.iloc[start_index:]
+        # Store each webmail link's complete href based on its class
+        for link in bundle.get('webmail') or []:
+            href = link.get('href')
+            class_attr = link.get('cls') or ""
+            if not href or not class_attr:
+                continue
+            if "gmail" in class_attr:
+                listing_data['Gmail'] = href
+            elif "yahoo" in class_attr:
+                listing_data['Yahoo'] = href
+            elif "outlook" in class_attr:
+                listing_data['Outlook'] = href
+            elif "aol" in class_attr:
+                listing_data['AOL'] = href
+
+    def _finish_without_email(self, listing_data):
+        """Complete a listing whose description is known, skipping the reply step."""
+        listing_data['Remote'] = self._check_remote_status(listing_data['Description'])
+        listing_data['Email'] = "Not Available"
+        listing_data['Default Mail'] = ""
+        listing_data['Gmail'] = ""
+        listing_data['Yahoo'] = ""
+        listing_data['Outlook'] = ""
+        listing_data['AOL'] = ""
+        listing_data['Processed'] = True
+        self._emit_result(listing_data)
+        return listing_data
+
+    def _load_failed(self, listing, listing_data):
+        """Return the result for a listing whose page couldn't be loaded."""
+        # Listings on a paused host stay unprocessed so a later pass picks them up
+        if self.breaker.is_open(listing['Link']):
+            return ListingRecord.from_mapping(listing)
+        if self.last_load_error == "permanent":
+            self._mark_failed(listing_data, "Error: Posting removed")
         else:
-            filtered_df = df
+            self._mark_failed(listing_data, "Error: Failed to load page")
+        self._emit_result(listing_data)
+        return listing_data
+
+    def _mark_failed(self, listing_data, message):
+        """Fill in the result fields for a listing whose page couldn't be scraped."""
+        listing_data['Description'] = message
+        listing_data['Remote'] = "Not Specified"
+        listing_data['Email'] = "Not Available"
+        listing_data['Default Mail'] = ""
+        listing_data['Gmail'] = ""
+        listing_data['Yahoo'] = ""
+        listing_data['Outlook'] = ""
+        listing_data['AOL'] = ""
+        listing_data['Processed'] = True
+
+    def scrape_listing(self, listing):
+        """Visit a single listing page and return it with description, remote status and email fields."""
+        self._check_cancelled()
+        listing_data = ListingRecord.from_mapping(listing)
+        prefilled = not is_empty(listing_data.get('Description'))
         
-        if max_listings is not None:
-            filtered_df = filtered_df.iloc[:max_listings]
+        # Feed listings already carry their description, so without the email
+        # step there is nothing left to fetch from the listing page
+        if prefilled and not self.scrape_emails:
+            return self._finish_without_email(listing_data)
         
-        # Add already processed listings to results
-        if start_index > 0:
-            already_processed_df = load_from_csv(self.output_file)
-            if not already_processed_df.empty:
-                for i in range(min(start_index, len(already_processed_df))):
-                    results.append(already_processed_df.iloc[i].to_dict())
+        # Listings on a paused host stay unprocessed so a later pass picks them up
+        if self.breaker.is_open(listing_data['Link']):
+            return listing_data
         
-        # Create a loop counter for the remaining items
-        remaining_total = len(filtered_df)
+        # The description is server-rendered, so the HTTP backend fetches it
+        # without the browser and leaves the browser only the reply step
+        fetched_over_http = False
+        if self.detail_backend == 'http' and not prefilled:
+            description = self._load_description(listing['Link'])
+            if description is None:
+                return self._load_failed(listing, listing_data)
+            listing_data['Description'] = description
+            prefilled = fetched_over_http = True
+            if not self.scrape_emails:
+                return self._finish_without_email(listing_data)
         
-        # Process each listing
-        for idx, (index, row) in enumerate(filtered_df.iterrows(), 1):
-            if row.get('Processed', False):
-                results.append(row.to_dict())
-                continue
-                
-            listing_data = row.to_dict()
+        # Visit the listing page; retries happen inside the shared retry policy
+        if not self._load_page_with_retry(listing['Link']):
+            # Keep the description already fetched; only the email is missing
+            if fetched_over_http and not self.breaker.is_open(listing['Link']):
+                return self._finish_without_email(listing_data)
+            return self._load_failed(listing, listing_data)
+        
+        try:
+            # Collect the page fields in one round trip when the layout matches
+            detail = self._extract_detail_bundle()
             
-            for attempt in range(self.max_retries):
+            # Extract the description, unless the feed already gave us one
+            if prefilled:
+                listing_data['Remote'] = self._check_remote_status(listing_data['Description'])
+            elif detail:
+                listing_data['Description'] = detail['description']
+                listing_data['Remote'] = self._check_remote_status(detail['description'])
+            else:
                 try:
-                    # Visit the listing page
-                    if not self._load_page_with_retry(row['Link']):
-                        if attempt == self.max_retries - 1:
-                            listing_data['Description'] = "Error: Failed to load page"
-                            listing_data['Remote'] = "Not Specified"
-                            listing_data['Email'] = "Not Available"
-                            listing_data['Default Mail'] = ""
-                            listing_data['Gmail'] = ""
-                            listing_data['Yahoo'] = ""
-                            listing_data['Outlook'] = ""
-                            listing_data['AOL'] = ""
-                            listing_data['Processed'] = True
-                            break
-                        continue
-                    
-                    # Check if we're being blocked
-                    if self._check_for_blocking():
-                        pass
+                    description_element = None
+                    desc_selectors = ["#postingbody", "section#postingbody", "div[data-testid='postingbody']"]
                     
-                    random_delay()
+                    for selector in desc_selectors:
+                        try:
+                            description_element = WebDriverWait(self.driver, 10).until(
+                                EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+                            )
+                            if description_element:
+                                break
+                        except:
+                            continue
                     
-                    # Extract the description
-                    try:
-                        description_element = None
-                        desc_selectors = ["#postingbody", "section#postingbody", "div[data-testid='postingbody']"]
-                        
-                        for selector in desc_selectors:
-                            try:
-                                description_element = WebDriverWait(self.driver, 10).until(
-                                    EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                                )
-                                if description_element:
-                                    break
-                            except:
-                                continue
+                    if description_element:
+                        description = description_element.text.strip()
+                        listing_data['Description'] = description
                         
-                        if description_element:
-                            description = description_element.text.strip()
-                            listing_data['Description'] = description
-                            
-                            # Determine if the job is remote
-                            remote_status = self._check_remote_status(description)
-                            listing_data['Remote'] = remote_status
-                        else:
-                            listing_data['Description'] = "Description Not Found"
-                            listing_data['Remote'] = "Not Specified"
-                    except Exception:
-                        listing_data['Description'] = ""
+                        # Determine if the job is remote
+                        remote_status = self._check_remote_status(description)
+                        listing_data['Remote'] = remote_status
+                    else:
+                        listing_data['Description'] = "Description Not Found"
                         listing_data['Remote'] = "Not Specified"
+                except Exception:
+                    listing_data['Description'] = ""
+                    listing_data['Remote'] = "Not Specified"
+            
+            # Initialize email fields
+            listing_data['Email'] = "Not Available"
+            listing_data['Default Mail'] = ""
+            listing_data['Gmail'] = ""
+            listing_data['Yahoo'] = ""
+            listing_data['Outlook'] = ""
+            listing_data['AOL'] = ""
+            
+            # Try to get email information. Archived pages can't be clicked, so replays skip it
+            if self.scrape_emails and not self.replay:
+                try:
+                    # Find and click the reply button - try multiple selectors
+                    reply_button = None
+                    reply_selectors = REPLY_SELECTORS
                     
-                    # Initialize email fields
-                    listing_data['Email'] = "Not Available"
-                    listing_data['Default Mail'] = ""
-                    listing_data['Gmail'] = ""
-                    listing_data['Yahoo'] = ""
-                    listing_data['Outlook'] = ""
-                    listing_data['AOL'] = ""
+                    if detail:
+                        # The bundle already told us which reply button (if any) is clickable
+                        reply_selectors = []
+                        if detail.get('reply'):
+                            reply_button = self.driver.find_element(By.CSS_SELECTOR, detail['reply'])
                     
-                    # Try to get email information
-                    try:
-                        # Find and click the reply button - try multiple selectors
-                        reply_button = None
-                        reply_selectors = [
-                            "button.reply-button",
-                            "button[data-href*='/reply/']",
-                            "a.reply-button",
-                            "a[href*='/reply/']"
-                        ]
+                    for selector in reply_selectors:
+                        try:
+                            reply_button = WebDriverWait(self.driver, 5).until(
+                                EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
+                            )
+                            if reply_button:
+                                break
+                        except:
+                            continue
+                    
+                    if not reply_button:
+                        pass
+                    else:
+                        reply_button.click()
+                        self._notify_user_for_captcha()
                         
-                        for selector in reply_selectors:
-                            try:
-                                reply_button = WebDriverWait(self.driver, 5).until(
-                                    EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
-                                )
-                                if reply_button:
-                                    break
-                            except:
-                                continue
+                        # Wait for the user to solve the CAPTCHA and the email button to appear
+                        email_found = False
+                        email_button_selectors = [
+                            "button.reply-option-header",
+                            "button[class*='reply-email']",
+                            "div[class*='reply-email']"
+                        ]
                         
-                        if not reply_button:
-                            pass
-                        else:
-                            reply_button.click()
-                            self._notify_user_for_captcha()
-                            
-                            # Wait for the user to solve the CAPTCHA and the email button to appear
-                            email_found = False
-                            email_button_selectors = [
-                                "button.reply-option-header",
-                                "button[class*='reply-email']",
-                                "div[class*='reply-email']"
-                            ]
-                            
-                            # Check periodically for 30 seconds
-                            for _ in range(15):  # 15 iterations × 2 seconds = 30 seconds total wait time
-                                for selector in email_button_selectors:
-                                    try:
-                                        email_button = WebDriverWait(self.driver, 2).until(
-                                            EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
-                                        )
-                                        email_button.click()
-                                        email_found = True
-                                        break
-                                    except:
-                                        continue
-                                
-                                if email_found:
+                        # Check periodically for 30 seconds
+                        for _ in range(15):  # 15 iterations × 2 seconds = 30 seconds total wait time
+                            # The longest wait in Phase 2, so a stop mustn't sit it out
+                            self._check_cancelled()
+                            for selector in email_button_selectors:
+                                try:
+                                    email_button = WebDriverWait(self.driver, 2).until(
+                                        EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
+                                    )
+                                    email_button.click()
+                                    email_found = True
                                     break
-                                time.sleep(2)
+                                except:
+                                    continue
                             
                             if email_found:
+                                break
+                            self._politeness_sleep(2)
+                        
+                        if email_found:
+                            bundle = self._extract_email_bundle()
+                            if bundle:
+                                self._apply_email_bundle(listing_data, bundle)
+                            else:
                                 try:
                                     # Wait for the email content to appear - try multiple selectors
                                     email_container = None
@@ -592,53 +1284,154 @@ class CraigslistScraper:
                                     
                                 except Exception:
                                     pass
-                                
-                    except Exception:
-                        pass
-                    
-                    # Mark as processed and break the retry loop
-                    listing_data['Processed'] = True
-                    break
-                    
+                            
                 except Exception:
-                    if attempt == self.max_retries - 1:
-                        listing_data['Description'] = "Error: Failed to load page"
-                        listing_data['Remote'] = "Not Specified"
-                        listing_data['Email'] = "Not Available"
-                        listing_data['Default Mail'] = ""
-                        listing_data['Gmail'] = ""
-                        listing_data['Yahoo'] = ""
-                        listing_data['Outlook'] = ""
-                        listing_data['AOL'] = ""
-                        listing_data['Processed'] = True
-                
-                # Delay between retries
-                random_delay()
+                    pass
+            
+            # Mark as processed
+            listing_data['Processed'] = True
+        except Exception:
+            self._mark_failed(listing_data, "Error: Failed to load page")
+        
+        self._emit_result(listing_data)
+        return listing_data
+
+    def scrape_details(self, df=None, start_index=0, max_listings=None):
+        """
+        PHASE 2 - STEP 2: Visit each listing and extract email, description, and remote status.
+        """
+        if df is None:
+            df = load_from_csv(self.cleaned_file)
             
-            results.append(listing_data)
+        if df.empty:
+            return pd.DataFrame()
+            
+        started = time.monotonic()
+        results = []
+        total = len(df)
+        
+        # Handle start_index and max_listings
+        if start_index > 0:
+            if start_index >= total:
+                return pd.DataFrame()
             
-            # Save progress after each batch
-            if idx % self.batch_size == 0 or idx == remaining_total:
-                progress_df = pd.DataFrame(results)
-                save_to_csv(progress_df, self.output_file)
+            # Keep the original dataframe reference for correct indexing
+            filtered_df = df.iloc[start_index:]
+        else:
+            filtered_df = df
+        
+        if max_listings is not None:
+            filtered_df = filtered_df.iloc[:max_listings]
+        
+        # Add already processed listings to results
+        if start_index > 0:
+            already_processed_df = load_from_csv(self.output_file)
+            if not already_processed_df.empty:
+                for i in range(min(start_index, len(already_processed_df))):
+                    results.append(already_processed_df.iloc[i].to_dict())
+        
+        # Create a loop counter for the remaining items
+        remaining_total = len(filtered_df)
+        
+        # Process each listing
+        try:
+            for idx, (index, row) in enumerate(filtered_df.iterrows(), 1):
+                if row.get('Processed', False):
+                    results.append(row.to_dict())
+                    continue
+                    
+                listing_data = self.scrape_listing(row.to_dict())
                 
-                # Apply a longer delay between batches
-                if idx < remaining_total:
-                    min_batch_delay = float(os.getenv('MIN_DELAY_BETWEEN_BATCHES', 15))
-                    max_batch_delay = float(os.getenv('MAX_DELAY_BETWEEN_BATCHES', 30))
-                    random_delay(min_batch_delay, max_batch_delay)
+                results.append(listing_data)
+                
+                # Save progress after each batch
+                if idx % self.batch_size == 0 or idx == remaining_total:
+                    progress_df = records_to_dataframe(results)
+                    save_to_csv(progress_df, self.output_file)
+                    
+                    # Apply a longer delay between batches
+                    if idx < remaining_total:
+                        self._batch_delay()
+        except JobCancelled:
+            # Flush the listings finished since the last batch save
+            if results:
+                save_to_csv(self._replace_empty_with_null(records_to_dataframe(results)), self.output_file)
+            raise
         
         # Final save to ensure all data is saved
-        final_df = pd.DataFrame(results)
+        final_df = records_to_dataframe(results)
         
         # Replace empty values with 'null' before saving
         final_df = self._replace_empty_with_null(final_df)
         
         save_to_csv(final_df, self.output_file)
+        self._report_phase("details", remaining_total, started)
         
         return final_df
         
+    def _processed_links(self):
+        """Return the links already written to the output file."""
+        done = set()
+        try:
+            for record in iter_csv_records(self.output_file, self.chunk_size, usecols=['Link']):
+                done.add(record['Link'])
+        except Exception:
+            pass
+        return done
+
+    def stream_details(self, links_file=None, max_listings=None, resume=True):
+        """
+        PHASE 2 - STEP 2 (streaming): Like scrape_details, in constant memory.
+        
+        Links are read in chunks and each finished record is appended to the
+        output file straight away. On resume, links already in the output file
+        are skipped by key instead of reloading earlier rows. Returns the number
+        of records written.
+        """
+        if links_file is None:
+            links_file = self.cleaned_file
+        
+        if resume:
+            done_links = self._processed_links()
+        else:
+            done_links = set()
+            if os.path.exists(self.output_file):
+                os.remove(self.output_file)
+        
+        started = time.monotonic()
+        written = 0
+        with CsvRecordWriter(self.output_file, RESULT_COLUMNS, flush_every=self.batch_size) as writer:
+            for row in iter_csv_records(links_file, self.chunk_size):
+                if max_listings is not None and written >= max_listings:
+                    break
+                if row.get('Link') in done_links:
+                    continue
+                
+                if str(row.get('Processed', False)).lower() == 'true':
+                    listing_data = row
+                else:
+                    listing_data = self.scrape_listing(row)
+                    # Deferred because the host is paused; resume will retry it
+                    if not listing_data.get('Processed'):
+                        continue
+                
+                writer.write(fill_empty(listing_data))
+                written += 1
+                
+                # Apply a longer delay between batches
+                if written % self.batch_size == 0:
+                    self._batch_delay()
+        
+        self._report_phase("details", written, started)
+        return written
+
     def close(self):
-        """Close the browser."""
-        if hasattr(self, 'driver') and self.driver:
-            self.driver.quit() 
\ No newline at end of file
+        """Close the browser, or return it to its pool if it was leased."""
+        driver = getattr(self, '_driver', None)
+        self._driver = None
+        self._closed = True
+        if getattr(self, 'browser', None) is not None:
+            browser, self.browser = self.browser, None
+            browser.release()
+        elif driver:
+            driver.quit() 
\ No newline at end of file
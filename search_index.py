@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from utils import is_empty, iter_csv_records, parse_post_date
+
+
+def _fts_query(text):
+    """Quote each search term so user input can't break the FTS5 query syntax."""
+    terms = [term.replace('"', '""') for term in text.split()]
+    return " ".join(f'"{term}"' for term in terms if term)
+
+
+class ResultIndex:
+    """
+    SQLite index over scraped results with FTS5 search on title and description.
+
+    Rows are upserted by link as results are produced. Searches return newest
+    rows first and page with an opaque cursor (the last row id seen).
+
+    Every insert or real change of a row gives it the next value of a
+    monotonic ``seq``, so consumers can sync with ``changes`` by asking for
+    everything after the last sequence they saw.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.getenv('RESULTS_DB', 'data/results.sqlite')
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock:
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    link TEXT NOT NULL UNIQUE,
+                    city TEXT,
+                    title TEXT,
+                    description TEXT,
+                    remote TEXT,
+                    post_date TEXT,
+                    posted_at TEXT,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    seq INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS results_city ON results (city);
+                CREATE INDEX IF NOT EXISTS results_posted_at ON results (posted_at);
+
+                CREATE VIRTUAL TABLE IF NOT EXISTS results_fts USING fts5(
+                    title, description, content='results', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS results_ai AFTER INSERT ON results BEGIN
+                    INSERT INTO results_fts (rowid, title, description)
+                    VALUES (new.id, new.title, new.description);
+                END;
+                CREATE TRIGGER IF NOT EXISTS results_ad AFTER DELETE ON results BEGIN
+                    INSERT INTO results_fts (results_fts, rowid, title, description)
+                    VALUES ('delete', old.id, old.title, old.description);
+                END;
+                CREATE TRIGGER IF NOT EXISTS results_au AFTER UPDATE OF title, description ON results BEGIN
+                    INSERT INTO results_fts (results_fts, rowid, title, description)
+                    VALUES ('delete', old.id, old.title, old.description);
+                    INSERT INTO results_fts (rowid, title, description)
+                    VALUES (new.id, new.title, new.description);
+                END;
+            """)
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(results)")}
+            if "seq" not in columns:
+                # The old update trigger re-indexed every updated row, and the backfill updates them all
+                self._db.executescript("""
+                    DROP TRIGGER IF EXISTS results_au;
+                    CREATE TRIGGER results_au AFTER UPDATE OF title, description ON results BEGIN
+                        INSERT INTO results_fts (results_fts, rowid, title, description)
+                        VALUES ('delete', old.id, old.title, old.description);
+                        INSERT INTO results_fts (rowid, title, description)
+                        VALUES (new.id, new.title, new.description);
+                    END;
+                """)
+                self._db.execute("ALTER TABLE results ADD COLUMN seq INTEGER")
+                # Rows indexed before sequences existed keep their insertion order
+                self._db.execute("UPDATE results SET seq = id")
+            self._db.execute("CREATE UNIQUE INDEX IF NOT EXISTS results_seq ON results (seq)")
+            self._db.commit()
+
+    def add(self, record):
+        """Insert or update a single result record, keyed by its link."""
+        record = {k: (None if is_empty(v) else v) for k, v in dict(record).items()}
+        link = record.get('Link')
+        if not link:
+            return
+
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT INTO results (link, city, title, description, remote, post_date, posted_at, data, updated_at, seq)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM results))
+                ON CONFLICT (link) DO UPDATE SET
+                    city = excluded.city, title = excluded.title, description = excluded.description,
+                    remote = excluded.remote, post_date = excluded.post_date, posted_at = excluded.posted_at,
+                    data = excluded.data, updated_at = excluded.updated_at, seq = excluded.seq
+                -- Re-adding an unchanged record keeps its sequence, so it isn't synced again
+                WHERE results.data IS NOT excluded.data
+                """,
+                (
+                    link,
+                    record.get('City'),
+                    record.get('Title'),
+                    record.get('Description'),
+                    record.get('Remote'),
+                    None if record.get('Post Date') is None else str(record.get('Post Date')),
+                    parse_post_date(record.get('Post Date')),
+                    json.dumps(record, default=str),
+                    time.time(),
+                )
+            )
+            self._db.commit()
+
+    def index_csv(self, filepath):
+        """Backfill the index from an existing results CSV. Returns the number of rows indexed."""
+        count = 0
+        for record in iter_csv_records(filepath):
+            self.add(record)
+            count += 1
+        return count
+
+    def search(self, query=None, city=None, remote=None, posted_after=None, posted_before=None,
+               limit=50, cursor=None):
+        """Search results, newest first. Returns the matching rows and the cursor for the next page."""
+        limit = max(1, min(int(limit), 500))
+        clauses = []
+        params = []
+
+        # Whitespace-only text quotes to nothing, and FTS5 rejects an empty MATCH
+        fts_query = _fts_query(query) if query else ""
+        if fts_query:
+            clauses.append("r.id IN (SELECT rowid FROM results_fts WHERE results_fts MATCH ?)")
+            params.append(fts_query)
+        if city:
+            clauses.append("r.city = ?")
+            params.append(city)
+        if remote:
+            clauses.append("r.remote = ?")
+            params.append(remote)
+        if posted_after:
+            clauses.append("r.posted_at >= ?")
+            params.append(parse_post_date(posted_after) or posted_after)
+        if posted_before:
+            clauses.append("r.posted_at <= ?")
+            params.append(parse_post_date(posted_before) or posted_before)
+        if cursor:
+            clauses.append("r.id < ?")
+            params.append(int(cursor))
+
+        sql = "SELECT r.id, r.data FROM results r"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY r.id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = str(rows[-1]['id'])
+
+        return {
+            "results": [json.loads(row['data']) for row in rows],
+            "next_cursor": next_cursor
+        }
+
+    def changes(self, since=0, limit=None, page_size=500):
+        """
+        Return the rows added or changed after sequence ``since``, oldest change first.
+
+        Returns ``cursor``, the sequence to pass as ``since`` next time,
+        ``has_more`` when ``limit`` cut the changes short, and ``records``, a
+        generator of (seq, record) read in pages so writers aren't held up.
+        Rows changed again while the generator runs move past the cursor and
+        come with the next call.
+        """
+        since = int(since or 0)
+        with self._lock:
+            if limit:
+                until = self._db.execute(
+                    "SELECT MAX(seq) FROM (SELECT seq FROM results WHERE seq > ? ORDER BY seq LIMIT ?)",
+                    (since, int(limit))
+                ).fetchone()[0]
+            else:
+                until = self._db.execute("SELECT MAX(seq) FROM results WHERE seq > ?", (since,)).fetchone()[0]
+            until = since if until is None else until
+            has_more = self._db.execute("SELECT 1 FROM results WHERE seq > ? LIMIT 1", (until,)).fetchone()
+
+        def records():
+            last = since
+            while last < until:
+                with self._lock:
+                    rows = self._db.execute(
+                        "SELECT seq, data FROM results WHERE seq > ? AND seq <= ? ORDER BY seq LIMIT ?",
+                        (last, until, page_size)
+                    ).fetchall()
+                if not rows:
+                    return
+                for row in rows:
+                    yield row['seq'], json.loads(row['data'])
+                last = rows[-1]['seq']
+
+        return {"cursor": until, "has_more": has_more is not None, "records": records()}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_shared_index = None
+_shared_lock = threading.Lock()
+
+
+def get_result_index():
+    """Return the process-wide result index."""
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            _shared_index = ResultIndex()
+        return _shared_index
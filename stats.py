@@ -0,0 +1,165 @@
+import os
+import json
+import sqlite3
+import threading
+import config
+from utils import is_empty, parse_post_date
+
+# Webmail columns counted for email availability
+EMAIL_COLUMNS = ["Default Mail", "Gmail", "Yahoo", "Outlook", "AOL"]
+
+
+def _stat_keys(record):
+    """Return the (dimension, key) counters a result record contributes to."""
+    keys = [("total", "results")]
+
+    city = record.get('City')
+    keys.append(("city", "Unknown" if is_empty(city) else str(city)))
+
+    remote = record.get('Remote')
+    keys.append(("remote", "Not Specified" if is_empty(remote) else str(remote)))
+
+    posted_at = parse_post_date(record.get('Post Date'))
+    keys.append(("day", posted_at[:10] if posted_at else "Unknown"))
+
+    title = str(record.get('Title') or "").lower()
+    for keyword in config.KEYWORDS:
+        if keyword.lower() in title:
+            keys.append(("keyword", keyword))
+
+    email = record.get('Email')
+    if not is_empty(email) and email not in ("Not Available", "null") and "@" in str(email):
+        keys.append(("email", "Email"))
+    for column in EMAIL_COLUMNS:
+        value = record.get(column)
+        if not is_empty(value) and value != "null":
+            keys.append(("email", column))
+
+    return keys
+
+
+class ResultStats:
+    """
+    Aggregate counters over scraped results, maintained as records are written.
+
+    Each link remembers which counters it contributed to, so a re-scraped
+    listing moves its counts instead of being counted twice.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.getenv('RESULTS_DB', 'data/results.sqlite')
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._lock:
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS stat_counts (
+                    dimension TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (dimension, key)
+                );
+                CREATE TABLE IF NOT EXISTS stat_links (
+                    link TEXT PRIMARY KEY,
+                    keys TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS phase_stats (
+                    phase TEXT PRIMARY KEY,
+                    runs INTEGER NOT NULL,
+                    items INTEGER NOT NULL,
+                    seconds REAL NOT NULL,
+                    last_items INTEGER NOT NULL,
+                    last_seconds REAL NOT NULL
+                );
+            """)
+            self._db.commit()
+
+    def _bump(self, keys, delta):
+        self._db.executemany(
+            "INSERT INTO stat_counts (dimension, key, count) VALUES (?, ?, ?) "
+            "ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count",
+            [(dimension, key, delta) for dimension, key in keys]
+        )
+
+    def add(self, record):
+        """Count a result record, replacing whatever the same link counted before."""
+        link = record.get('Link')
+        if is_empty(link):
+            return
+        new_keys = _stat_keys(record)
+
+        with self._lock:
+            row = self._db.execute("SELECT keys FROM stat_links WHERE link = ?", (link,)).fetchone()
+            if row:
+                self._bump([tuple(key) for key in json.loads(row[0])], -1)
+            self._bump(new_keys, 1)
+            self._db.execute(
+                "INSERT OR REPLACE INTO stat_links (link, keys) VALUES (?, ?)",
+                (link, json.dumps(new_keys))
+            )
+            self._db.commit()
+
+    def record_phase(self, phase, items, seconds):
+        """Add a finished phase's item count and duration to the throughput totals."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO phase_stats (phase, runs, items, seconds, last_items, last_seconds) "
+                "VALUES (?, 1, ?, ?, ?, ?) "
+                "ON CONFLICT (phase) DO UPDATE SET runs = runs + 1, items = items + excluded.items, "
+                "seconds = seconds + excluded.seconds, last_items = excluded.last_items, "
+                "last_seconds = excluded.last_seconds",
+                (phase, int(items), float(seconds), int(items), float(seconds))
+            )
+            self._db.commit()
+
+    def snapshot(self):
+        """Return the current aggregates."""
+        with self._lock:
+            counts = self._db.execute("SELECT dimension, key, count FROM stat_counts WHERE count > 0").fetchall()
+            phases = self._db.execute(
+                "SELECT phase, runs, items, seconds, last_items, last_seconds FROM phase_stats"
+            ).fetchall()
+
+        grouped = {}
+        for dimension, key, count in counts:
+            grouped.setdefault(dimension, {})[key] = count
+
+        total = grouped.pop("total", {}).get("results", 0)
+        email_counts = grouped.pop("email", {})
+
+        return {
+            "total_results": total,
+            "by_city": grouped.get("city", {}),
+            "by_keyword": grouped.get("keyword", {}),
+            "by_remote": grouped.get("remote", {}),
+            "by_day": dict(sorted(grouped.get("day", {}).items())),
+            "email_availability": {
+                column: {"count": count, "rate": round(count / total, 4) if total else 0.0}
+                for column, count in email_counts.items()
+            },
+            "phase_throughput": {
+                phase: {
+                    "runs": runs,
+                    "items": items,
+                    "seconds": round(seconds, 3),
+                    "items_per_second": round(items / seconds, 3) if seconds else None,
+                    "last_items_per_second": round(last_items / last_seconds, 3) if last_seconds else None
+                }
+                for phase, runs, items, seconds, last_items, last_seconds in phases
+            }
+        }
+
+
+_shared_stats = None
+_shared_lock = threading.Lock()
+
+
+def get_result_stats():
+    """Return the process-wide result statistics."""
+    global _shared_stats
+    with _shared_lock:
+        if _shared_stats is None:
+            _shared_stats = ResultStats()
+        return _shared_stats
@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_planner import QueryPlanner
+
+BASE_URL = "https://{}.craigslist.org/search/sof"
+KEYWORDS = ["python", "django", "flask"]
+
+
+def planner(tmp_path, **kwargs):
+    return QueryPlanner(path=str(tmp_path / "plan.sqlite"), mode="auto", batch_size=1, page_size=100, **kwargs)
+
+
+def test_never_crawled_category_is_crawled_first(tmp_path):
+    plan = planner(tmp_path).plan("albany", KEYWORDS, 5, BASE_URL)
+    assert plan["strategy"] == "crawl"
+    assert plan["estimate"]["crawl"] == 1
+
+
+def test_large_category_flips_to_queries_once_measured(tmp_path):
+    p = planner(tmp_path)
+    p.record("albany", "crawl", 5, 480, {"python": 2}, BASE_URL, complete=True)
+    plan = p.plan("albany", KEYWORDS, 5, BASE_URL)
+    assert plan["estimate"] == {"crawl": 5, "query": 3}
+    assert plan["strategy"] == "query"
+    assert len(plan["urls"]) == 3
+
+
+def test_small_category_stays_on_one_crawl_page(tmp_path):
+    p = planner(tmp_path)
+    p.record("albany", "crawl", 1, 40, {"python": 2}, BASE_URL, complete=True)
+    assert p.plan("albany", KEYWORDS, 5, BASE_URL)["strategy"] == "crawl"
+
+
+def test_incomplete_crawl_keeps_volume_but_counts_its_pages(tmp_path):
+    p = planner(tmp_path)
+    p.record("albany", "crawl", 5, 480, {"python": 2}, BASE_URL, complete=False)
+    history = p._history(p.target("albany", BASE_URL))
+    assert history["volume"] is None
+    assert p.estimate("albany", KEYWORDS, 5, BASE_URL)["crawl"] == 5
+    assert p.plan("albany", KEYWORDS, 5, BASE_URL)["strategy"] == "query"
+
+
+def test_queries_are_rechecked_with_a_crawl(tmp_path):
+    p = planner(tmp_path, recrawl_hours=1)
+    p.record("albany", "crawl", 5, 480, {"python": 2}, BASE_URL, complete=True)
+    assert p.plan("albany", KEYWORDS, 5, BASE_URL)["strategy"] == "query"
+
+    with p._lock:
+        p._db.execute("UPDATE query_plan_history SET crawled_at = ?", (time.time() - 7200,))
+        p._db.commit()
+    assert p.plan("albany", KEYWORDS, 5, BASE_URL)["strategy"] == "crawl"
@@ -1,6 +1,10 @@
 import os
 import time
 import random
+import socket
+import re
+import csv
+from datetime import datetime, timedelta
 import pandas as pd
 from dotenv import load_dotenv
 
@@ -23,7 +27,7 @@ def get_random_user_agent():
     """Return a random user agent from the list."""
     return random.choice(USER_AGENTS)
 
-def random_delay(min_delay=None, max_delay=None):
+def random_delay(min_delay=None, max_delay=None, sleep=time.sleep):
     """Apply a random delay within the specified range."""
     if min_delay is None:
         min_delay = float(os.getenv('MIN_DELAY_BETWEEN_ACTIONS', 2))
@@ -31,7 +35,7 @@ def random_delay(min_delay=None, max_delay=None):
         max_delay = float(os.getenv('MAX_DELAY_BETWEEN_ACTIONS', 5))
     
     delay = random.uniform(min_delay, max_delay)
-    time.sleep(delay)
+    sleep(delay)
     return delay
 
 def save_to_csv(data, filepath):
@@ -40,6 +44,13 @@ def save_to_csv(data, filepath):
     df.to_csv(filepath, index=False)
     return df
 
+def append_to_csv(data, filepath):
+    """Append rows to a CSV file, writing the header if the file is new."""
+    df = pd.DataFrame(data)
+    write_header = not os.path.exists(filepath) or os.path.getsize(filepath) == 0
+    df.to_csv(filepath, mode='a', header=write_header, index=False)
+    return df
+
 def load_from_csv(filepath):
     """Load data from a CSV file."""
     if os.path.exists(filepath):
@@ -47,11 +58,156 @@ def load_from_csv(filepath):
         return df
     return pd.DataFrame()
 
+def iter_csv_records(filepath, chunksize=500, usecols=None):
+    """Yield rows of a CSV file as dicts, reading it in chunks."""
+    if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
+        return
+    for chunk in pd.read_csv(filepath, chunksize=chunksize, usecols=usecols):
+        for record in chunk.to_dict('records'):
+            yield record
+
+class CsvRecordWriter:
+    """Append dict records to a CSV file one at a time, keeping the file open."""
+    
+    def __init__(self, filepath, fieldnames, flush_every=1):
+        exists = os.path.exists(filepath) and os.path.getsize(filepath) > 0
+        if exists:
+            # Keep the column order of the file we are appending to
+            with open(filepath, newline='', encoding='utf-8') as f:
+                header = next(csv.reader(f), None)
+            if header:
+                fieldnames = header
+        
+        self.fieldnames = list(fieldnames)
+        self.flush_every = max(int(flush_every), 1)
+        self.count = 0
+        self._file = open(filepath, 'a', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+        if not exists:
+            self._writer.writeheader()
+    
+    def write(self, record):
+        self._writer.writerow(record)
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self._file.flush()
+    
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
 def remove_duplicates(df, column_name):
     """Remove duplicate rows based on a specific column."""
     df = df.drop_duplicates(subset=[column_name])
     return df
 
+def is_empty(value):
+    """Return True for None, NaN and empty strings."""
+    return value is None or value == "" or (isinstance(value, float) and value != value)
+
+# Card and title formats Craigslist has used for post dates
+POST_DATE_FORMATS = (
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d",
+    "%a %d %b %I:%M:%S %p",
+    "%a %b %d %Y %H:%M:%S GMT%z",
+)
+RELATIVE_DATE = re.compile(r"^(\d+)\s*(m|min|mins|minutes?|h|hrs?|hours?|d|days?)\s+ago$", re.IGNORECASE)
+MONTH_DAY = re.compile(r"^(\d{1,2})/(\d{1,2})$")
+
+def parse_post_datetime(value, now=None):
+    """
+    Return a datetime for a post date, or None if it can't be parsed.
+    
+    Accepts ISO timestamps, the listing's ``datetime``/``title`` attribute
+    formats and the short card texts ("3h ago", "1/15"). Dates without a
+    year are placed in the last twelve months.
+    """
+    if is_empty(value) or value == "Unknown":
+        return None
+    if isinstance(value, datetime):
+        return value
+    value = str(value).strip()
+    if now is None:
+        now = datetime.now()
+    
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        pass
+    
+    match = RELATIVE_DATE.match(value)
+    if match:
+        amount, unit = int(match.group(1)), match.group(2).lower()
+        if unit.startswith("m"):
+            return now - timedelta(minutes=amount)
+        if unit.startswith("h"):
+            return now - timedelta(hours=amount)
+        return now - timedelta(days=amount)
+    
+    match = MONTH_DAY.match(value)
+    if match:
+        try:
+            parsed = datetime(now.year, int(match.group(1)), int(match.group(2)))
+        except ValueError:
+            return None
+        return parsed if parsed <= now else parsed.replace(year=now.year - 1)
+    
+    # Browsers append the zone name, e.g. "GMT-0500 (Eastern Standard Time)"
+    value = re.sub(r"\s*\([^)]*\)$", "", value)
+    for fmt in POST_DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if "%Y" not in fmt:
+            parsed = parsed.replace(year=now.year)
+            if parsed > now:
+                parsed = parsed.replace(year=now.year - 1)
+        return parsed
+    return None
+
+def parse_post_date(value):
+    """Return an ISO timestamp for a post date string, or None if it can't be parsed."""
+    parsed = parse_post_datetime(value)
+    return None if parsed is None else parsed.isoformat()
+
+def normalize_post_date(value):
+    """Return the post date as an ISO timestamp, or unchanged if it can't be parsed."""
+    return parse_post_date(value) or value
+
+def _local_naive(value):
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
+def is_stale(value, max_age, now=None):
+    """Return True if a post date is older than ``max_age`` (a timedelta). Unparseable dates are never stale."""
+    if not max_age:
+        return False
+    now = datetime.now() if now is None else _local_naive(now)
+    parsed = parse_post_datetime(value, now)
+    if parsed is None:
+        return False
+    return now - _local_naive(parsed) > max_age
+
+def fill_empty(record, value="null"):
+    """Replace empty values in a single record, mirroring the final results cleanup."""
+    if all(is_empty(v) for v in record.values()):
+        return record
+    return {k: (value if is_empty(v) else v) for k, v in record.items()}
+
+def get_free_port():
+    """Return a free local TCP port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
 def save_screenshot(driver, filename_prefix):
     """Save a screenshot for debugging purposes."""
     try:
@@ -64,18 +220,14 @@ def save_screenshot(driver, filename_prefix):
     except Exception:
         return None
 
-def save_html(driver, filename_prefix):
-    """Save page HTML for debugging purposes."""
+def save_html(driver, filename_prefix, archive=None):
+    """Save page HTML to the page archive for debugging purposes. Returns the content digest."""
     try:
-        html_dir = "html_dumps"
-        os.makedirs(html_dir, exist_ok=True)
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
-        filename = f"{html_dir}/{filename_prefix}_{timestamp}.html"
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(driver.page_source)
-            
-        return filename
+        if archive is None:
+            from archive import get_page_archive
+            archive = get_page_archive()
+        url = getattr(driver, 'current_url', None) or filename_prefix
+        return archive.put(url, driver.page_source)
     except Exception:
         return None
 
@@ -0,0 +1,354 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from config import CRAIGSLIST_CITIES
+from records import ListingRecord
+from scraper import CraigslistScraper, RESULT_COLUMNS
+from utils import CsvRecordWriter, fill_empty
+from logs import get_logger, log_context
+from budget import JobCancelled
+
+logger = get_logger("work_queue")
+
+
+class WorkQueue:
+    """
+    Shared work queue with time-limited leases, stored in SQLite.
+
+    Tasks are unique by (kind, key), so publishing the same city or link twice
+    is a no-op, which is what dedupes detail links across workers. A worker
+    claims a task for ``lease_seconds``; if it dies without finishing, the
+    lease expires and the task is handed to the next worker that asks. Put the
+    database on storage every worker can reach.
+    """
+
+    def __init__(self, path=None, lease_seconds=None, max_attempts=None):
+        if path is None:
+            path = os.getenv('WORK_QUEUE_DB', 'data/work_queue.sqlite')
+        if lease_seconds is None:
+            lease_seconds = float(os.getenv('LEASE_SECONDS', 300))
+        if max_attempts is None:
+            max_attempts = int(os.getenv('TASK_MAX_ATTEMPTS', 3))
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.lease_seconds = max(float(lease_seconds), 1.0)
+        self.max_attempts = max(int(max_attempts), 1)
+        self._lock = threading.Lock()
+        # Autocommit, so claims can take the write lock with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                lease_owner TEXT,
+                lease_expires REAL,
+                available_at REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                UNIQUE (kind, key)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (kind, status, available_at);
+        """)
+
+    def publish(self, kind, key, payload):
+        """Add a task unless one with the same kind and key exists. Returns True if it was added."""
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO tasks (kind, key, payload, updated_at) VALUES (?, ?, ?, ?)",
+                (kind, key, json.dumps(dict(payload), default=str), time.time())
+            )
+        return cursor.rowcount > 0
+
+    def claim(self, worker_id, kinds=("detail", "city")):
+        """
+        Lease the next available task of the given kinds, in order of preference.
+
+        Pending tasks and tasks whose lease has expired are both claimable.
+        An expired task that has used up its attempts (its worker crashed or
+        hung every time) is failed instead. Returns a dict with id, kind, key
+        and payload, or None.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._fail_exhausted(now)
+                row = None
+                for kind in kinds:
+                    row = self._db.execute(
+                        "SELECT id, kind, key, payload FROM tasks WHERE kind = ? AND available_at <= ? AND "
+                        "(status = 'pending' OR (status = 'leased' AND lease_expires < ? AND attempts < ?)) "
+                        "ORDER BY id LIMIT 1",
+                        (kind, now, now, self.max_attempts)
+                    ).fetchone()
+                    if row:
+                        break
+                if row:
+                    self._db.execute(
+                        "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                        "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        (worker_id, now + self.lease_seconds, now, row[0])
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+        if not row:
+            return None
+        return {"id": row[0], "kind": row[1], "key": row[2], "payload": json.loads(row[3])}
+
+    def _fail_exhausted(self, now):
+        """Fail expired leases that have no attempts left. Call with the lock held."""
+        return self._db.execute(
+            "UPDATE tasks SET status = 'failed', lease_owner = NULL, lease_expires = NULL, "
+            "error = COALESCE(error, 'Lease expired'), updated_at = ? "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (now, now, self.max_attempts)
+        ).rowcount
+
+    def _update_leased(self, task_id, worker_id, sql, params):
+        """Apply an update only while the worker still holds the lease. Returns True if it did."""
+        with self._lock:
+            cursor = self._db.execute(
+                sql + " WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                tuple(params) + (task_id, worker_id)
+            )
+        return cursor.rowcount > 0
+
+    def renew(self, task_id, worker_id):
+        """Extend a lease. Returns False if the lease was lost to another worker."""
+        now = time.time()
+        return self._update_leased(
+            task_id, worker_id,
+            "UPDATE tasks SET lease_expires = ?, updated_at = ?",
+            (now + self.lease_seconds, now)
+        )
+
+    def complete(self, task_id, worker_id, result=None):
+        """Mark a leased task done and store its result."""
+        return self._update_leased(
+            task_id, worker_id,
+            "UPDATE tasks SET status = 'done', result = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?",
+            (None if result is None else json.dumps(dict(result), default=str), time.time())
+        )
+
+    def release(self, task_id, worker_id, delay=0):
+        """Hand a leased task back without counting the attempt, available again after ``delay`` seconds."""
+        now = time.time()
+        return self._update_leased(
+            task_id, worker_id,
+            "UPDATE tasks SET status = 'pending', lease_owner = NULL, lease_expires = NULL, "
+            "attempts = MAX(attempts - 1, 0), available_at = ?, updated_at = ?",
+            (now + delay, now)
+        )
+
+    def fail(self, task_id, worker_id, error):
+        """Record a failed attempt; the task is retried until it runs out of attempts."""
+        return self._update_leased(
+            task_id, worker_id,
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_owner = NULL, lease_expires = NULL, error = ?, updated_at = ?",
+            (self.max_attempts, str(error), time.time())
+        )
+
+    def reclaim_expired(self):
+        """
+        Return tasks with expired leases to pending. Returns how many were reclaimed.
+
+        Tasks that have used up their attempts are failed instead.
+        """
+        now = time.time()
+        with self._lock:
+            self._fail_exhausted(now)
+            cursor = self._db.execute(
+                "UPDATE tasks SET status = 'pending', lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE status = 'leased' AND lease_expires < ?",
+                (now, now)
+            )
+        return cursor.rowcount
+
+    def counts(self):
+        """Return task counts per kind and status."""
+        with self._lock:
+            rows = self._db.execute("SELECT kind, status, COUNT(*) FROM tasks GROUP BY kind, status").fetchall()
+        counts = {}
+        for kind, status, count in rows:
+            counts.setdefault(kind, {})[status] = count
+        return counts
+
+    def is_drained(self):
+        """Return True when no task is pending or leased."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'leased')"
+            ).fetchone()
+        return row[0] == 0
+
+    def iter_results(self, kind="detail"):
+        """Yield the stored results of finished tasks, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT result FROM tasks WHERE kind = ? AND status = 'done' AND result IS NOT NULL ORDER BY id",
+                (kind,)
+            ).fetchall()
+        for (result,) in rows:
+            yield json.loads(result)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def seed_cities(work_queue, cities=None):
+    """Publish one discovery task per city. Returns the number of new tasks."""
+    added = 0
+    for city in (CRAIGSLIST_CITIES if cities is None else cities):
+        if work_queue.publish("city", city, {"city": city}):
+            added += 1
+    return added
+
+
+def default_worker_id():
+    """Return an id that is unique per process across nodes."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class QueueWorker:
+    """
+    Claim tasks from a WorkQueue and run them with one scraper.
+
+    City tasks discover listings and publish a detail task per listing, keyed
+    by normalized title so duplicates found by different workers collapse into
+    one. Detail tasks scrape the listing; the finished record is stored on the
+    task and also passes through the scraper's result hooks.
+    """
+
+    def __init__(self, work_queue, scraper=None, worker_id=None, max_listings=None, idle_timeout=None,
+                 cancel_token=None):
+        if idle_timeout is None:
+            idle_timeout = float(os.getenv('WORKER_IDLE_TIMEOUT', 30))
+
+        self.queue = work_queue
+        self.worker_id = worker_id or default_worker_id()
+        self.max_listings = max_listings
+        self.idle_timeout = idle_timeout
+        self._owns_scraper = scraper is None
+        self.scraper = scraper or CraigslistScraper()
+        if cancel_token is not None:
+            self.scraper.cancel_token = cancel_token
+        self.counts = {"city": 0, "detail": 0, "published": 0, "failed": 0, "released": 0}
+
+    @contextmanager
+    def _keep_leased(self, task):
+        """
+        Renew a task's lease from a timer while the block runs.
+
+        Yields an event that is set if the lease was lost to another worker.
+        Renewing per listing isn't enough: a city without matches yields
+        nothing while its pages, retries and category URLs run past the lease.
+        """
+        done = threading.Event()
+        lost = threading.Event()
+
+        def renew():
+            while not done.wait(self.queue.lease_seconds / 3):
+                try:
+                    if not self.queue.renew(task["id"], self.worker_id):
+                        lost.set()
+                        return
+                except Exception as e:
+                    logger.warning(f"Could not renew lease on {task['kind']}:{task['key']}: {str(e)}")
+
+        thread = threading.Thread(target=renew, daemon=True)
+        thread.start()
+        try:
+            yield lost
+        finally:
+            done.set()
+            thread.join()
+
+    def _run_city(self, task):
+        city = task["payload"]["city"]
+        with self._keep_leased(task) as lost:
+            for listing in self.scraper.iter_listings(max_listings=self.max_listings, cities=[city]):
+                if lost.is_set():
+                    logger.warning(f"Lost lease on city {city}; another worker has taken it over")
+                    return False
+                key = self.scraper.normalize_title(listing['Title'])
+                if self.queue.publish("detail", key, listing.to_dict()):
+                    self.counts["published"] += 1
+        return self.queue.complete(task["id"], self.worker_id)
+
+    def _run_detail(self, task):
+        with self._keep_leased(task):
+            listing_data = self.scraper.scrape_listing(ListingRecord.from_mapping(task["payload"]))
+        if not listing_data.get('Processed'):
+            # The host is paused; hand the link back until the pause is likely over
+            self.counts["released"] += 1
+            return self.queue.release(task["id"], self.worker_id, delay=self.scraper.breaker.base_backoff)
+        return self.queue.complete(task["id"], self.worker_id, fill_empty(listing_data.to_dict()))
+
+    def run(self):
+        """Work until the queue stays empty for ``idle_timeout`` seconds. Returns the task counts."""
+        idle_since = None
+        while True:
+            self.scraper._check_cancelled()
+            task = self.queue.claim(self.worker_id)
+            if task is None:
+                if self.queue.is_drained():
+                    break
+                # Other workers still hold leases that may publish or expire
+                idle_since = idle_since or time.monotonic()
+                if time.monotonic() - idle_since > self.idle_timeout:
+                    break
+                time.sleep(1)
+                continue
+            idle_since = None
+
+            try:
+                with log_context(worker_id=self.worker_id, task=f"{task['kind']}:{task['key']}"):
+                    if task["kind"] == "city":
+                        self._run_city(task)
+                    else:
+                        self._run_detail(task)
+                self.counts[task["kind"]] += 1
+            except JobCancelled:
+                # Hand the task straight back instead of waiting for the lease to expire
+                self.queue.release(task["id"], self.worker_id)
+                raise
+            except Exception as e:
+                logger.warning(f"Task {task['kind']}:{task['key']} failed: {str(e)}")
+                self.counts["failed"] += 1
+                self.queue.fail(task["id"], self.worker_id, e)
+
+        return self.counts
+
+    def close(self):
+        if self._owns_scraper:
+            self.scraper.close()
+
+
+def merge_results(work_queue, output_file=None):
+    """Write every finished detail record in the queue to one results CSV. Returns the row count."""
+    if output_file is None:
+        output_file = os.getenv('OUTPUT_FILE', 'output/results.csv')
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    if os.path.exists(output_file):
+        os.remove(output_file)
+
+    with CsvRecordWriter(output_file, RESULT_COLUMNS) as writer:
+        for record in work_queue.iter_results("detail"):
+            writer.write(record)
+    return writer.count